@@ -0,0 +1,270 @@
+"""batch.py -- Solves many puzzles at once with a pool of worker processes
+
+Puzzles are sent to the workers in chunks, as (packed state, board width)
+pairs rather than pickled `Puzzle` objects. The tables of the heuristic are
+built (and saved) once before the workers start, and every worker loads them
+once. Results come back in the order of the input puzzles, with the solution
+as a list of moves:
+
+    {"status": "solved", "moves": [...], "depth": 20, "cost": 1234,
+     "time": 0.05}
+
+The status is "solved", "unsolvable", "timeout", "limit" or "invalid" (moves,
+depth and cost are None unless solved). Searches stopped by a node limit also
+have the name of the limit and the statistics of the search so far (see
+`solver.SearchLimitExceeded`). Puzzles are invalid if they could not be read,
+or if the heuristic cannot be built for their board (with the reason under
+"error").
+
+`solve_many` solves a list at once; `solve_stream` solves an iterable of any
+length lazily, keeping a bounded number of puzzles in flight.
+
+Author: Álex Filipe Santos
+Date: 19 July 2020
+"""
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from puzzle import Puzzle
+from solver import PuzzleSolver, SearchLimitExceeded
+from heuristics import HEURISTICS, get_heuristic
+from state import get_board, state_to_str, decode_moves
+
+# Largest number of puzzles sent to a worker at once.
+MAX_CHUNK_SIZE = 64
+
+# Number of chunks per worker, so that slow chunks can be balanced.
+CHUNKS_PER_WORKER = 4
+
+# Number of puzzles sent to a worker at once by `solve_stream`.
+STREAM_CHUNK_SIZE = 8
+
+
+def solve_state(state, width, heuristic=2, timeout=None, max_expansions=None,
+                max_frontier=None):
+    """Solves a packed state in the current process.
+
+    Timeouts are the time limit of the search (see `PuzzleSolver`), checked
+    every few hundred expansions, so they work in any thread and on any
+    platform.
+
+    Args:
+        state (int): the packed state (see `state.py`).
+        width (int): the width of the board.
+        heuristic (int): the search heuristic to use.
+        timeout (float): seconds allowed for the search (None for no limit).
+        max_expansions (int): nodes the search may expand (None for no
+            limit).
+        max_frontier (int): nodes the frontier may hold (None for no limit).
+    Returns:
+        dict: the result (see the module documentation).
+    """
+    result = {"status": "unsolvable", "moves": None, "depth": None,
+              "cost": None, "time": 0.0}
+    puzzle = Puzzle.from_state(state, width=width)
+
+    if not puzzle.is_solvable():
+        return result
+
+    # Built before the search starts, as it may build the heuristic tables.
+    # Some heuristics cannot be built for every board.
+    try:
+        solver = PuzzleSolver(puzzle, heuristic=heuristic,
+                              max_expansions=max_expansions,
+                              max_seconds=timeout, max_frontier=max_frontier)
+
+    except ValueError as exception:
+        result["status"] = "invalid"
+        result["error"] = str(exception)
+        return result
+    start_time = time.perf_counter()
+
+    try:
+        solution = solver.find_solution()
+        result["status"] = "solved"
+        result["moves"] = decode_moves(solution["moves"])
+        result["depth"] = solution["depth"]
+        result["cost"] = solution["cost"]
+
+    except SearchLimitExceeded as exception:
+        if exception.limit == "max_seconds":
+            result["status"] = "timeout"
+        else:
+            result["status"] = "limit"
+            result["limit"] = exception.limit
+            result["stats"] = exception.stats
+
+    result["time"] = time.perf_counter() - start_time
+    return result
+
+
+def _solve_chunk(chunk, heuristic, timeout):
+    """Solves a chunk of (state, width) pairs in a worker."""
+    return [solve_state(state, width, heuristic, timeout)
+            for state, width in chunk]
+
+def _solve_indexed_chunk(chunk, heuristic, timeout):
+    """Solves a chunk of (index, state, width) tuples in a worker, adding the
+    index and the puzzle string to every result (a None state is invalid).
+    """
+    results = []
+
+    for index, state, width in chunk:
+        if state is None:
+            result = {"status": "invalid", "moves": None, "depth": None,
+                      "cost": None, "time": 0.0, "puzzle": None}
+        else:
+            result = solve_state(state, width, heuristic, timeout)
+            result["puzzle"] = state_to_str(state, get_board(width))
+
+        result["index"] = index
+        results.append(result)
+
+    return results
+
+def _build_tables(heuristic, widths):
+    """Builds (or loads) the heuristic tables of a process before it solves
+    anything: the parent builds and saves them before starting the workers,
+    which then load them."""
+    for width in widths:
+        # The puzzles of a board without tables are reported as invalid
+        try:
+            get_heuristic(heuristic, get_board(width))
+        except ValueError:
+            pass
+
+
+def solve_many(puzzles, heuristic=2, workers=None, chunk_size=None,
+               timeout=None):
+    """Solves a list of puzzles in parallel.
+
+    Args:
+        puzzles (list of obj:`Puzzle`): the puzzles to solve.
+        heuristic (int): the number of the search heuristic to use.
+        workers (int): the number of worker processes (the number of CPUs by
+            default). With 1 worker, puzzles are solved in this process.
+        chunk_size (int): the number of puzzles sent to a worker at once (by
+            default, enough chunks to give every worker several of them).
+        timeout (float): seconds allowed for each puzzle (None for no limit).
+    Returns:
+        list of dict: the result of every puzzle, in the order of the input.
+    """
+    if heuristic not in HEURISTICS:
+        raise ValueError("Unknown heuristic: {}".format(heuristic))
+
+    tasks = [(puzzle.state, puzzle.width) for puzzle in puzzles]
+    workers = workers or os.cpu_count() or 1
+
+    if workers == 1 or len(tasks) <= 1:
+        return _solve_chunk(tasks, heuristic, timeout)
+
+    if chunk_size is None:
+        chunk_size = -(-len(tasks) // (workers * CHUNKS_PER_WORKER))
+        chunk_size = max(1, min(MAX_CHUNK_SIZE, chunk_size))
+
+    chunks = [tasks[i:i + chunk_size]
+              for i in range(0, len(tasks), chunk_size)]
+    widths = sorted(set(width for _, width in tasks))
+    results = []
+
+    # Built (and saved) once here, so that the workers only load the tables
+    _build_tables(heuristic, widths)
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_build_tables,
+                             initargs=(heuristic, widths)) as executor:
+        futures = [executor.submit(_solve_chunk, chunk, heuristic, timeout)
+                   for chunk in chunks]
+
+        for future in futures:
+            results += future.result()
+
+    return results
+
+
+def _indexed_chunks(puzzles, chunk_size):
+    """Yields chunks of (index, state, width) tuples from an iterable of
+    puzzles, reading it lazily."""
+    chunk = []
+
+    for index, puzzle in enumerate(puzzles):
+        if puzzle is None:
+            chunk.append((index, None, None))
+        else:
+            chunk.append((index, puzzle.state, puzzle.width))
+
+        if len(chunk) == chunk_size:
+            yield chunk
+            chunk = []
+
+    if chunk:
+        yield chunk
+
+def solve_stream(puzzles, heuristic=2, workers=None, ordered=False,
+                 timeout=None, chunk_size=STREAM_CHUNK_SIZE, max_pending=None):
+    """Solves an iterable of puzzles of any length, yielding the results as
+    they complete.
+
+    The iterable is read lazily and at most max_pending chunks are being
+    solved or waiting to be consumed at any time, so memory use does not grow
+    with the input, and a slow consumer holds back the reading of new
+    puzzles.
+
+    Args:
+        puzzles (iterable of obj:`Puzzle`): the puzzles to solve (None for
+            inputs that could not be read, which get an "invalid" result).
+        heuristic (int): the number of the search heuristic to use.
+        workers (int): the number of worker processes (the number of CPUs by
+            default). With 1 worker, puzzles are solved in this process.
+        ordered (bool): whether to yield the results in the input order
+            (otherwise, in the order they complete).
+        timeout (float): seconds allowed for each puzzle (None for no limit).
+        chunk_size (int): the number of puzzles sent to a worker at once.
+        max_pending (int): the largest number of chunks in flight (by
+            default, two per worker).
+    Yields:
+        dict: the result of every puzzle, with its index in the input and its
+            string.
+    """
+    if heuristic not in HEURISTICS:
+        raise ValueError("Unknown heuristic: {}".format(heuristic))
+
+    workers = workers or os.cpu_count() or 1
+    max_pending = max_pending or 2 * workers
+    chunks = _indexed_chunks(puzzles, chunk_size)
+
+    if workers == 1:
+        for chunk in chunks:
+            yield from _solve_indexed_chunk(chunk, heuristic, timeout)
+        return
+
+    # Built (and saved) once here, so that the workers only load the tables
+    _build_tables(heuristic, [3])
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_build_tables,
+                             initargs=(heuristic, [3])) as executor:
+        # Chunks in flight, in input order
+        pending = deque()
+
+        for chunk in chunks:
+            pending.append(executor.submit(_solve_indexed_chunk, chunk,
+                                           heuristic, timeout))
+
+            # Wait for results before reading more of the input
+            while len(pending) >= max_pending:
+                yield from _next_results(pending, ordered)
+
+        while pending:
+            yield from _next_results(pending, ordered)
+
+def _next_results(pending, ordered):
+    """Removes a completed chunk from the chunks in flight and returns its
+    results (the oldest chunk, if ordered)."""
+    if ordered:
+        future = pending.popleft()
+    else:
+        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+        future = next(iter(done))
+        pending.remove(future)
+
+    return future.result()
@@ -0,0 +1,259 @@
+"""benchmark.py -- micro-benchmarks for the solver internals
+
+Author: Álex Filipe Santos
+Date: 19 July 2020
+"""
+import sys
+import time
+import random
+import subprocess
+from batch import solve_many
+from frontier import FRONTIERS, make_frontier
+from solver import PuzzleSolver
+from report import file_to_puzzle_list
+from table import DistanceTable, DEFAULT_TABLE_PATH
+from state import GOAL_STATE
+
+
+class BenchNode:
+    """Minimal stand-in for a `PuzzleNode`, as seen by a frontier."""
+    __slots__ = ("evaluation", "h")
+
+    def __init__(self, evaluation, h):
+        self.evaluation = evaluation
+        self.h = h
+
+    def __lt__(self, other):
+        return self.evaluation < other.evaluation
+
+
+def benchmark_frontier(operations=200000, seed=0):
+    """Times the frontiers alone on a stream of pushes and pops with small
+    integer evaluations, similar to an A* run.
+
+    Args:
+        operations (int): number of nodes pushed (and popped).
+        seed (int): random seed for the evaluations.
+    Returns:
+        dict: seconds taken for each frontier name.
+    """
+    rng = random.Random(seed)
+    nodes = []
+    f = 10
+
+    # f-values slowly increase, as they do while A* runs
+    for _ in range(operations):
+        f = max(0, f + rng.choice([-1, 0, 0, 1, 2]))
+        h = rng.randint(0, f)
+        nodes.append(BenchNode(f, h))
+
+    results = {}
+
+    for name in FRONTIERS:
+        frontier = make_frontier(name)
+
+        start_time = time.perf_counter()
+        for i, node in enumerate(nodes):
+            frontier.push(node)
+            # Pop one node for every three pushed (a node has ~3 children)
+            if i % 3 == 0:
+                frontier.pop()
+        while frontier:
+            frontier.pop()
+        end_time = time.perf_counter()
+
+        results[name] = end_time - start_time
+
+    return results
+
+def benchmark_frontier_search(filepaths, heuristic=2):
+    """Times full searches on sample cases with each frontier.
+
+    Args:
+        filepaths (list of str): test files with sample cases.
+        heuristic (int): the search heuristic to use.
+    Returns:
+        dict: seconds taken for each frontier name.
+    """
+    puzzles = []
+    for filepath in filepaths:
+        puzzles += [p for p in file_to_puzzle_list(filepath)
+                    if p.is_solvable()]
+
+    results = {}
+
+    for name in FRONTIERS:
+        start_time = time.perf_counter()
+        for puzzle in puzzles:
+            PuzzleSolver(puzzle, heuristic=heuristic,
+                         frontier=name).find_solution()
+        end_time = time.perf_counter()
+
+        results[name] = end_time - start_time
+
+    return results
+
+def benchmark_bidirectional(filepaths, heuristics=(1, 2)):
+    """Compares forward and bidirectional A* on sample cases.
+
+    Args:
+        filepaths (list of str): test files with sample cases.
+        heuristics (list of int): the search heuristics to use.
+    Returns:
+        dict: total nodes generated and seconds taken, by heuristic and
+            search direction.
+    """
+    puzzles = []
+    for filepath in filepaths:
+        puzzles += [p for p in file_to_puzzle_list(filepath)
+                    if p.is_solvable()]
+
+    results = {}
+
+    for heuristic in heuristics:
+        for name, bidirectional in [("forward", False),
+                                    ("bidirectional", True)]:
+            cost = 0
+            start_time = time.perf_counter()
+            for puzzle in puzzles:
+                solver = PuzzleSolver(puzzle, heuristic=heuristic,
+                                      bidirectional=bidirectional)
+                cost += solver.find_solution()["cost"]
+            end_time = time.perf_counter()
+
+            results["h{} {}".format(heuristic, name)] = {
+                "nodes": cost,
+                "seconds": end_time - start_time
+            }
+
+    return results
+
+def benchmark_table_load(filepath=DEFAULT_TABLE_PATH, repeat=20):
+    """Times loading the distance table file (and one lookup), read into
+    memory or memory-mapped.
+
+    Args:
+        filepath (str): the distance table file (built if missing).
+        repeat (int): number of loads timed.
+    Returns:
+        dict: average seconds per load for each loading mode.
+    """
+    DistanceTable.load_or_build(filepath)
+    results = {}
+
+    for name, mapped in [("read", False), ("mmap", True)]:
+        start_time = time.perf_counter()
+        for _ in range(repeat):
+            DistanceTable.load(filepath, mapped=mapped).distance(GOAL_STATE)
+        end_time = time.perf_counter()
+
+        results[name] = (end_time - start_time) / repeat
+
+    return results
+
+def benchmark_table_startup(filepath=DEFAULT_TABLE_PATH, repeat=5):
+    """Times the cold start of a worker process that loads the distance table
+    and does one lookup.
+
+    Returns:
+        dict: average seconds per process for each loading mode, including
+            the "none" baseline of a process that does not load the table.
+    """
+    DistanceTable.load_or_build(filepath)
+    code = ("from table import DistanceTable; from state import GOAL_STATE; "
+            "{}")
+    results = {}
+
+    for name, statement in [
+            ("none", "pass"),
+            ("read", "DistanceTable.load({!r}, mapped=False)"
+                     ".distance(GOAL_STATE)".format(filepath)),
+            ("mmap", "DistanceTable.load({!r}, mapped=True)"
+                     ".distance(GOAL_STATE)".format(filepath))]:
+        start_time = time.perf_counter()
+        for _ in range(repeat):
+            subprocess.run([sys.executable, "-c", code.format(statement)],
+                           check=True)
+        end_time = time.perf_counter()
+
+        results[name] = (end_time - start_time) / repeat
+
+    return results
+
+
+def benchmark_batch(filepaths, heuristic=2, workers=(1, 2, 4), repeat=4):
+    """Times `solve_many` on sample cases with different numbers of worker
+    processes.
+
+    Args:
+        filepaths (list of str): test files with sample cases.
+        heuristic (int): the search heuristic to use.
+        workers (list of int): the numbers of workers to try.
+        repeat (int): number of copies of the sample cases solved.
+    Returns:
+        dict: seconds taken for each number of workers.
+    """
+    puzzles = []
+    for filepath in filepaths:
+        puzzles += [p for p in file_to_puzzle_list(filepath)
+                    if p.is_solvable()]
+    puzzles *= repeat
+
+    results = {}
+
+    for count in workers:
+        start_time = time.perf_counter()
+        solve_many(puzzles, heuristic, workers=count)
+        end_time = time.perf_counter()
+
+        results["{} workers".format(count)] = end_time - start_time
+
+    return results
+
+
+def print_results(title, results, baseline="queue"):
+    """Prints benchmark results, relative to a baseline result if present
+    (the original queue frontier by default).
+    """
+    print(title)
+    baseline = results.get(baseline)
+
+    for name, seconds in results.items():
+        line = "  {:<8} {:.6f} s".format(name, seconds)
+        if baseline:
+            line += "  ({:.2f}x)".format(baseline / seconds)
+        print(line)
+
+
+if __name__ == '__main__':
+    if len(sys.argv) != 2:
+        print("USAGE: python benchmark.py [benchmark]")
+        print("Benchmarks: frontier, table, bidirectional, batch")
+
+    elif sys.argv[1] == "frontier":
+        print_results("Frontier push/pop:", benchmark_frontier())
+        print_results("A* search (h2) on Length16/Length20:",
+                      benchmark_frontier_search(["test/Length16.txt",
+                                                 "test/Length20.txt"]))
+
+    elif sys.argv[1] == "table":
+        print_results("Distance table load:", benchmark_table_load(),
+                      baseline="read")
+        print_results("Worker start with distance table:",
+                      benchmark_table_startup(), baseline="read")
+
+    elif sys.argv[1] == "bidirectional":
+        for path in ["test/Length16.txt", "test/Length20.txt"]:
+            print("Forward vs bidirectional A* on {}:".format(path))
+            for name, result in benchmark_bidirectional([path]).items():
+                print("  {:<18} {:>7} nodes {:.4f} s".format(
+                    name, result["nodes"], result["seconds"]))
+
+    elif sys.argv[1] == "batch":
+        print_results("solve_many (h2) on Length16/Length20:",
+                      benchmark_batch(["test/Length16.txt",
+                                       "test/Length20.txt"]),
+                      baseline="1 workers")
+
+    else:
+        print("Unknown benchmark: {}".format(sys.argv[1]))
@@ -0,0 +1,140 @@
+"""cache.py -- LRU cache of optimal solutions, in front of the solvers
+
+Every state along an optimal solution path is solved optimally by the rest of
+that path, so once a puzzle is solved, all the states of its solution are
+cached with the moves from them to the goal. The moves of a path are stored
+once and shared by its states, as an offset into them.
+
+States are cached under their canonical puzzle (see `symmetry.py`), so a
+puzzle and its transposed puzzle share an entry.
+
+Author: Álex Filipe Santos
+Date: 19 July 2020
+"""
+from collections import OrderedDict
+from puzzle import SolutionSteps
+from solver import PuzzleSolver
+from stats import SearchStats
+from state import path_states, state_to_str, encode_moves, decode_moves
+from symmetry import canonical_state, transpose_moves
+
+# Default number of cached states.
+DEFAULT_CACHE_SIZE = 100000
+
+
+class SolutionCache:
+    """Least recently used cache of optimal solutions, keyed by the string of
+    the canonical puzzle.
+    """
+    def __init__(self, max_size=DEFAULT_CACHE_SIZE):
+        if max_size < 1:
+            raise ValueError("Cache size must be positive")
+
+        # Largest number of cached states
+        self.max_size = max_size
+
+        # Cached states, least recently used first: every canonical puzzle
+        # string maps to the (moves, offset) of the rest of its solution, and
+        # whether those moves solve the transposed puzzle
+        self.entries = OrderedDict()
+
+        # Number of lookups answered from the cache, and not
+        self.hits = 0
+        self.misses = 0
+
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, puzzle):
+        """Returns the cached moves that solve a puzzle, or None.
+
+        Returns:
+            list of str: the moves from the puzzle to the goal.
+        """
+        key, transposed = self._key(puzzle.state, puzzle.board)
+        entry = self.entries.get(key)
+
+        if entry is None:
+            self.misses += 1
+            return None
+
+        self.entries.move_to_end(key)
+        self.hits += 1
+
+        moves, offset, moves_transposed = entry
+        moves = list(moves[offset:])
+
+        if transposed != moves_transposed:
+            moves = transpose_moves(moves)
+
+        return moves
+
+    def put(self, puzzle, moves):
+        """Caches an optimal solution of a puzzle, and the rest of it for
+        every state along the way.
+
+        Args:
+            puzzle (obj:`Puzzle`): the puzzle.
+            moves (list of str): the moves of an optimal solution.
+        """
+        moves = tuple(moves)
+        states = [puzzle.state]
+        states += path_states(puzzle.state, moves[:-1], puzzle.board)
+
+        # The initial state is cached last, as the most recently used
+        for offset in reversed(range(len(states))):
+            key, transposed = self._key(states[offset], puzzle.board)
+            self.entries[key] = (moves, offset, transposed)
+            self.entries.move_to_end(key)
+
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+
+    def _key(self, state, board):
+        """Returns the key of a state, and whether it is transposed."""
+        state, transposed = canonical_state(state, board)
+        return state_to_str(state, board), transposed
+
+    def clear(self):
+        """Removes every cached state and resets the counters."""
+        self.entries.clear()
+        self.hits = 0
+        self.misses = 0
+
+
+    def find_solution(self, puzzle, heuristic=1, **options):
+        """Solves a puzzle with `PuzzleSolver`, unless its solution is cached.
+
+        Args:
+            puzzle (obj:`Puzzle`): the puzzle.
+            heuristic (int): the search heuristic used on a cache miss.
+            options: other options of `PuzzleSolver`.
+        Returns:
+            dict: the solution, as returned by `PuzzleSolver.find_solution`,
+                and whether it was cached (a cached solution costs 0 nodes,
+                and has empty search statistics).
+        """
+        if options.get("weight", 1) != 1:
+            raise ValueError("Only optimal solutions can be cached")
+
+        moves = self.get(puzzle)
+
+        if moves is None:
+            solution = PuzzleSolver(puzzle, heuristic=heuristic,
+                                    **options).find_solution()
+            self.put(puzzle, decode_moves(solution["moves"]))
+            solution["cached"] = False
+            return solution
+
+        moves = encode_moves(moves)
+
+        return {
+            "steps": SolutionSteps(puzzle.state, moves, puzzle.width),
+            "moves": moves,
+            "depth": len(moves),
+            "cost": 0,
+            "duplicates": 0,
+            "stats": SearchStats(),
+            "cached": True
+        }
@@ -0,0 +1,141 @@
+"""frontier.py -- Open lists (frontiers) for the A* search.
+
+All frontiers hold `PuzzleNode` objects and pop the node of lowest evaluation
+first. They are chosen by name with the `frontier=` parameter of
+`PuzzleSolver`:
+
+    "heap"   = a plain heapq of (f, h, tiebreak, node) tuples
+    "bucket" = an array of LIFO lists indexed by f
+    "queue"  = the thread-safe queue.PriorityQueue (for comparison)
+
+Author: Álex Filipe Santos
+Date: 19 July 2020
+"""
+from heapq import heappush, heappop
+from queue import PriorityQueue
+
+
+class Frontier:
+    """Interface of an open list of search nodes."""
+
+    def push(self, node):
+        """Adds a node to the frontier."""
+        raise NotImplementedError
+
+    def pop(self):
+        """Removes and returns the node of lowest evaluation."""
+        raise NotImplementedError
+
+    def min_evaluation(self):
+        """Returns the lowest evaluation in the (non-empty) frontier."""
+        raise NotImplementedError
+
+    def __len__(self):
+        raise NotImplementedError
+
+
+class HeapFrontier(Frontier):
+    """Binary heap of tuples, so that ordering never calls back into Python
+    code. Ties on f are broken by lowest h (the node closest to the goal), then
+    by insertion order.
+    """
+    def __init__(self):
+        self.heap = []
+        self.counter = 0
+
+    def push(self, node):
+        self.counter += 1
+        heappush(self.heap, (node.evaluation, node.h, self.counter, node))
+
+    def pop(self):
+        return heappop(self.heap)[3]
+
+    def min_evaluation(self):
+        return self.heap[0][0]
+
+    def __len__(self):
+        return len(self.heap)
+
+
+class BucketFrontier(Frontier):
+    """Bucket queue: f-values are small integers, so nodes are kept in one
+    LIFO list per f-value and push/pop take constant time.
+    """
+    def __init__(self):
+        self.buckets = []
+        self.min_f = 0
+        self.size = 0
+
+    def push(self, node):
+        f = node.evaluation
+
+        while f >= len(self.buckets):
+            self.buckets.append([])
+
+        self.buckets[f].append(node)
+        self.size += 1
+
+        if f < self.min_f:
+            self.min_f = f
+
+    def pop(self):
+        self.min_evaluation()
+        self.size -= 1
+        return self.buckets[self.min_f].pop()
+
+    def min_evaluation(self):
+        if self.size == 0:
+            raise IndexError("empty frontier")
+
+        # Skip to the lowest non-empty bucket
+        while not self.buckets[self.min_f]:
+            self.min_f += 1
+
+        return self.min_f
+
+    def __len__(self):
+        return self.size
+
+
+class QueueFrontier(Frontier):
+    """The original queue.PriorityQueue frontier, ordered with the rich
+    comparison operators of `PuzzleNode`. It takes a lock on every operation.
+    """
+    def __init__(self):
+        self.queue = PriorityQueue()
+
+    def push(self, node):
+        self.queue.put(node)
+
+    def pop(self):
+        return self.queue.get()
+
+    def min_evaluation(self):
+        # The queue keeps its items in a heap
+        with self.queue.mutex:
+            return self.queue.queue[0].evaluation
+
+    def __len__(self):
+        return self.queue.qsize()
+
+
+# Frontier implementations by name.
+FRONTIERS = {
+    "heap": HeapFrontier,
+    "bucket": BucketFrontier,
+    "queue": QueueFrontier
+}
+
+
+def make_frontier(name):
+    """Creates an empty frontier.
+
+    Args:
+        name (str): the name of the frontier (see `FRONTIERS`).
+    Returns:
+        obj:`Frontier`: the frontier.
+    """
+    if name not in FRONTIERS:
+        raise ValueError("Unknown frontier: {}".format(name))
+
+    return FRONTIERS[name]()
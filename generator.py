@@ -0,0 +1,195 @@
+"""generator.py -- Random solvable puzzles, in bulk and at exact depths
+
+Exactly half of the permutations of the tiles are solvable, and swapping two
+numbered tiles changes the parity of a permutation without moving the empty
+tile. Random boards are therefore made solvable by swapping their first two
+numbered tiles when they are not, instead of being drawn again: every
+solvable board is reached from two permutations (itself and its swapped
+board), so the solvable boards are still uniformly distributed.
+
+Boards are generated in bulk with NumPy, as (N, size) arrays of tiles (see
+`vectorized.py`), and from a seedable random generator. 3x3 boards can also be
+sampled uniformly among the boards of a given optimal solution depth, from the
+distance table (see `table.py`).
+
+    python generator.py [depth] [count] [output-file] [seed]
+
+writes a set of test cases in the format of the files in test/ (e.g.
+`python generator.py 20 10 test/Length20.txt`).
+
+Author: Álex Filipe Santos
+Date: 19 July 2020
+"""
+import sys
+import random
+from puzzle import Puzzle, tiles_to_str
+from state import TILE_CHARS, get_board
+from table import DistanceTable, index_boards
+from vectorized import np, require_numpy, solvable
+
+# Number of boards generated at once by `stream_solvable_puzzles`.
+STREAM_BATCH_SIZE = 4096
+
+# Separator line between the puzzles of a test case file.
+CASE_SEPARATOR = "/" * 53
+
+
+def _swap_positions(zero):
+    """Returns the positions of the first two numbered tiles of a board whose
+    empty tile is at index zero."""
+    return [index for index in range(3) if index != zero][:2]
+
+def fix_parity(tiles):
+    """Makes a board solvable, swapping its first two numbered tiles if it is
+    not (in place).
+
+    Args:
+        tiles (list of int): the tiles of the board.
+    Returns:
+        list of int: the tiles.
+    """
+    if not Puzzle(puzzle_str=tiles_to_str(tiles)).is_solvable():
+        first, second = _swap_positions(tiles.index(0))
+        tiles[first], tiles[second] = tiles[second], tiles[first]
+
+    return tiles
+
+
+def random_solvable_boards(count, width=3, rng=None):
+    """Draws uniformly distributed solvable boards.
+
+    Args:
+        count (int): the number of boards.
+        width (int): the width of the boards.
+        rng (obj:`numpy.random.Generator`): the random generator (a new
+            unseeded one by default).
+    Returns:
+        obj:`numpy.ndarray`: the (count, size) uint8 array of boards.
+    """
+    require_numpy()
+    rng = rng or np.random.default_rng()
+    size = get_board(width).size
+
+    boards = np.tile(np.arange(size, dtype=np.uint8), (count, 1))
+    boards = rng.permuted(boards, axis=1)
+
+    # Swap the first two numbered tiles of the unsolvable boards
+    rows = np.nonzero(~solvable(boards))[0]
+    zero = np.argmin(boards[rows], axis=1)
+    first = (zero == 0).astype(np.int64)
+    second = np.where(zero <= 1, 2, 1)
+    boards[rows, first], boards[rows, second] = \
+        boards[rows, second], boards[rows, first]
+
+    return boards
+
+def boards_to_puzzles(boards):
+    """Returns the puzzles of an array of boards."""
+    return [Puzzle(puzzle_str="".join(TILE_CHARS[tile] for tile in tiles))
+            for tiles in boards.tolist()]
+
+def generate_puzzles(count, width=3, seed=None):
+    """Generates solvable random puzzles (with NumPy if it is installed).
+
+    Args:
+        count (int): the number of puzzles.
+        width (int): the width of the puzzles.
+        seed (int): the seed of the random generator (None for a random
+            seed).
+    Returns:
+        list of obj:`Puzzle`: the puzzles.
+    """
+    if np is not None:
+        rng = np.random.default_rng(seed)
+        return boards_to_puzzles(random_solvable_boards(count, width, rng))
+
+    rng = random.Random(seed)
+    puzzles = []
+
+    for _ in range(count):
+        tiles = list(range(width * width))
+        rng.shuffle(tiles)
+        puzzles.append(Puzzle(puzzle_str=tiles_to_str(fix_parity(tiles))))
+
+    return puzzles
+
+def stream_solvable_puzzles(width=3, seed=None,
+                            batch_size=STREAM_BATCH_SIZE):
+    """Yields solvable random puzzles forever, generated in batches from a
+    single seeded generator.
+
+    Args:
+        width (int): the width of the puzzles.
+        seed (int): the seed of the random generator (None for a random
+            seed).
+        batch_size (int): the number of boards generated at once.
+    Yields:
+        obj:`Puzzle`: solvable puzzles.
+    """
+    require_numpy()
+    rng = np.random.default_rng(seed)
+
+    while True:
+        yield from boards_to_puzzles(
+            random_solvable_boards(batch_size, width, rng))
+
+
+def boards_at_depth(count, depth, rng=None, table=None):
+    """Samples 3x3 boards uniformly among the boards whose optimal solution
+    has a given depth (without repeating boards, unless there are fewer than
+    count of them).
+
+    Args:
+        count (int): the number of boards.
+        depth (int): the optimal solution depth (0 to 31).
+        rng (obj:`numpy.random.Generator`): the random generator (a new
+            unseeded one by default).
+        table (obj:`DistanceTable`): the distance table (loaded or built on
+            first use by default).
+    Returns:
+        obj:`numpy.ndarray`: the (count, 9) uint8 array of boards.
+    """
+    require_numpy()
+    rng = rng or np.random.default_rng()
+    table = table or DistanceTable.load_or_build()
+
+    distances = np.frombuffer(table.data, dtype=np.uint8)
+    indices = np.flatnonzero(distances == depth)
+
+    if not len(indices):
+        raise ValueError("No 3x3 puzzle has an optimal depth of {}"
+                         .format(depth))
+
+    indices = rng.choice(indices, count, replace=count > len(indices))
+    return index_boards(indices)
+
+def generate_puzzles_at_depth(count, depth, seed=None, table=None):
+    """Generates 3x3 puzzles of a given optimal solution depth (see
+    `boards_at_depth`).
+
+    Returns:
+        list of obj:`Puzzle`: the puzzles.
+    """
+    rng = np.random.default_rng(seed) if np is not None else None
+    return boards_to_puzzles(boards_at_depth(count, depth, rng, table))
+
+def write_cases(filepath, puzzles):
+    """Writes puzzles in the format of the test case files (see
+    `report.file_to_puzzle_list`).
+    """
+    with open(filepath, "w") as output:
+        for puzzle in puzzles:
+            output.write(CASE_SEPARATOR + "\n")
+            output.write(str(puzzle) + "\n")
+
+
+if __name__ == '__main__':
+    if len(sys.argv) not in [4, 5]:
+        print("USAGE: python generator.py [depth] [count] [output-file] "
+              "[seed]")
+
+    else:
+        case_seed = int(sys.argv[4]) if len(sys.argv) == 5 else None
+        cases = generate_puzzles_at_depth(int(sys.argv[2]),
+                                          int(sys.argv[1]), case_seed)
+        write_cases(sys.argv[3], cases)
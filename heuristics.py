@@ -0,0 +1,522 @@
+"""heuristics.py -- Pluggable search heuristics on packed puzzle states.
+
+Heuristics are registered by number (as chosen in the CLI):
+
+    h1 = Number of Misplaced Tiles
+    h2 = Manhattan Distance
+    h3 = Manhattan Distance + Linear Conflict
+    h4 = Walking Distance
+    h5 = Max of Linear Conflict and Walking Distance
+    h6 = Additive Pattern Database (1-2-3-4, 5-6-7-8)
+
+All of them are admissible and backed by precomputed lookup tables, built for
+the board (3x3, 4x4...) they are used on. Besides computing a value from
+scratch (`evaluate`), every heuristic has an `update` hook that derives the
+value of a child from the value of its parent after a single tile slides into
+the empty space.
+
+Author: Álex Filipe Santos
+Date: 19 July 2020
+"""
+from collections import deque
+from state import BOARD, decode
+
+
+def _tile_table(cost, board=BOARD, goal_indices=None):
+    """Builds a [tile][index] cost table.
+
+    Args:
+        cost (function): cost(goal, index, width) of a tile being at index,
+            when its goal is at index goal. The empty tile (0) always costs
+            nothing.
+        board (obj:`Board`): the board of the puzzle.
+        goal_indices (list of int): the goal index of every tile (by default
+            the puzzle goal, where tile i is at index i).
+    Returns:
+        tuple of tuple: the cost table.
+    """
+    if goal_indices is None:
+        goal_indices = range(board.size)
+
+    return tuple(
+        tuple(0 if tile == 0 else cost(goal_indices[tile], index, board.width)
+              for index in range(board.size))
+        for tile in range(board.size)
+    )
+
+def _misplaced(goal, index, width):
+    """The tile is in the correct place if it is at its goal index."""
+    return int(goal != index)
+
+def _manhattan(goal, index, width):
+    """The Manhattan distance from index to the goal index of the tile."""
+    i1, j1 = divmod(index, width)
+    i2, j2 = divmod(goal, width)
+    return abs(i1 - i2) + abs(j1 - j2)
+
+# Number of misplaced tiles (h1) on the 3x3 board.
+MISPLACED_TABLE = _tile_table(_misplaced)
+
+# Manhattan distance (h2) on the 3x3 board.
+MANHATTAN_TABLE = _tile_table(_manhattan)
+
+
+def heuristic_value(state, table, board=BOARD):
+    """Computes a heuristic from scratch for a packed state.
+
+    Args:
+        state (int): the packed state.
+        table (tuple of tuple): the [tile][index] cost table.
+        board (obj:`Board`): the board of the puzzle.
+    Returns:
+        int: the heuristic value.
+    """
+    h = 0
+    mask = board.tile_mask
+
+    for index, shift in enumerate(board.shifts):
+        h += table[(state >> shift) & mask][index]
+
+    return h
+
+
+class Heuristic:
+    """Interface of a search heuristic."""
+
+    # Short name and description, as displayed in the CLI and reports
+    name = None
+    description = None
+
+    # Board the heuristic (and its tables) is built for
+    board = BOARD
+
+    # [tile][index] cost table, for heuristics that are a sum of tile costs.
+    # The solvers inline the update of these heuristics.
+    table = None
+
+    def evaluate(self, state):
+        """Computes the heuristic from scratch for a packed state."""
+        raise NotImplementedError
+
+    def update(self, h, state, child, tile, zero, target):
+        """Computes the heuristic of a child from the heuristic of its parent.
+
+        Args:
+            h (int): the heuristic of the parent.
+            state (int): the packed state of the parent.
+            child (int): the packed state of the child.
+            tile (int): the tile that moved.
+            zero (int): the index of the empty tile of the parent (where the
+                tile moved to).
+            target (int): the index the tile moved from.
+        Returns:
+            int: the heuristic of the child.
+        """
+        return self.evaluate(child)
+
+    def toward(self, goal_state):
+        """Returns a heuristic estimating the distance to another state than
+        the puzzle goal (used by backward searches).
+
+        Heuristics that cannot be retargeted fall back to the Manhattan
+        distance, which is admissible toward any state.
+
+        Args:
+            goal_state (int): the packed state to estimate the distance to.
+        Returns:
+            obj:`Heuristic`: the heuristic.
+        """
+        return get_heuristic(2, self.board).toward(goal_state)
+
+
+class TileHeuristic(Heuristic):
+    """Heuristic that sums a cost for every tile, depending only on where the
+    tile is. A move changes the cost of a single tile.
+    """
+    def __init__(self, name, description, cost, board=BOARD,
+                 goal_indices=None):
+        self.name = name
+        self.description = description
+        self.cost = cost
+        self.board = board
+        self.table = _tile_table(cost, board, goal_indices)
+
+    def evaluate(self, state):
+        return heuristic_value(state, self.table, self.board)
+
+    def update(self, h, state, child, tile, zero, target):
+        tile_costs = self.table[tile]
+        return h + tile_costs[zero] - tile_costs[target]
+
+    def toward(self, goal_state):
+        goal_indices = [0] * self.board.size
+        for index, tile in enumerate(decode(goal_state, self.board)):
+            goal_indices[tile] = index
+
+        return TileHeuristic(self.name, self.description, self.cost,
+                             self.board, goal_indices)
+
+
+def _longest_increasing(values):
+    """Returns the length of the longest increasing subsequence of values."""
+    lengths = []
+
+    for i, value in enumerate(values):
+        lengths.append(1 + max([lengths[j] for j in range(i)
+                                if values[j] < value], default=0))
+
+    return max(lengths, default=0)
+
+class LinearConflictHeuristic(Heuristic):
+    """Manhattan distance plus linear conflicts: two tiles in their goal line
+    (row or column) but in reversed order must leave the line for one of them
+    to pass, which costs 2 moves beyond their Manhattan distances. For every
+    line, the tiles to move out are the ones outside of the longest run of
+    tiles already in order.
+
+    Only the tiles whose goal is in a line matter for its conflicts, so every
+    tile has a code per line (1 + its goal position in the line, or 0 if its
+    goal is in another line). The conflicts are looked up in a table indexed
+    by the codes of the tiles of a line, read as a number in base width + 1.
+    """
+    name = "h3"
+    description = "Manhattan Distance + Linear Conflict"
+
+    def __init__(self, board=BOARD):
+        self.board = board
+        self.manhattan = get_heuristic(2, board)
+        width = board.width
+        base = width + 1
+
+        # Number of tiles in conflict, by key of the codes of a line
+        self.conflicts = []
+        for key in range(base ** width):
+            codes = [(key // base ** k) % base for k in range(width)]
+            in_line = [code for code in codes if code > 0]
+            self.conflicts.append(len(in_line) - _longest_increasing(in_line))
+
+        # For every line (rows, then columns): the shifts of its indices in
+        # the state, and for every position the [tile] codes multiplied by
+        # the weight of the position in the key
+        self.lines = []
+        for number in range(2 * width):
+            line, axis = number % width, number // width
+
+            if axis == 0:
+                indices = [line * width + j for j in range(width)]
+            else:
+                indices = [i * width + line for i in range(width)]
+
+            codes = []
+            for tile in range(board.size):
+                goal = divmod(tile, width)[::1 if axis == 0 else -1]
+                codes.append(goal[1] + 1 if tile and goal[0] == line else 0)
+
+            self.lines.append((
+                tuple(board.shifts[i] for i in indices),
+                tuple(tuple(code * base ** k for code in codes)
+                      for k in range(width))
+            ))
+
+        # Lines (rows and columns) through every index
+        self.lines_at = tuple(
+            (index // width, width + index % width)
+            for index in range(board.size)
+        )
+
+    def _conflicts(self, state, line):
+        """Returns the number of tiles in conflict in a line of a state."""
+        shifts, weighted_codes = self.lines[line]
+        mask = self.board.tile_mask
+        key = 0
+
+        for shift, codes in zip(shifts, weighted_codes):
+            key += codes[(state >> shift) & mask]
+
+        return self.conflicts[key]
+
+    def evaluate(self, state):
+        conflicts = sum(self._conflicts(state, line)
+                        for line in range(len(self.lines)))
+        return self.manhattan.evaluate(state) + 2 * conflicts
+
+    def update(self, h, state, child, tile, zero, target):
+        tile_costs = self.manhattan.table[tile]
+        h += tile_costs[zero] - tile_costs[target]
+
+        # Only the lines through both indices change
+        for line in set(self.lines_at[zero] + self.lines_at[target]):
+            h += 2 * (self._conflicts(child, line)
+                      - self._conflicts(state, line))
+
+        return h
+
+
+class _WalkingValue(int):
+    """Walking distance of a state, carrying the keys of its simplified boards
+    (rows and columns) so that its children update them."""
+    pass
+
+def _walking_value(h, keys):
+    """Returns a walking distance with the keys of its simplified boards."""
+    value = _WalkingValue(h)
+    value.keys = keys
+    return value
+
+class WalkingDistanceHeuristic(Heuristic):
+    """Walking distance: the tiles are only told apart by their goal row, and
+    the number of vertical moves to bring every tile to its goal row is looked
+    up in a table built by a breadth-first search over those simplified
+    boards. The same is done for columns, and the two are added (a move is
+    either vertical or horizontal).
+
+    A simplified board is keyed by the number of tiles of every goal row in
+    every row and the row of the empty tile. The values carry the keys of
+    their state, so a move only updates the two counts and the row of the
+    empty tile it changes (see `_WalkingValue`).
+    """
+    name = "h4"
+    description = "Walking Distance"
+
+    def __init__(self, board=BOARD):
+        self.board = board
+
+        # Bits used to store each count (up to the width) in a key
+        self.count_bits = board.width.bit_length()
+        self.blank_shift = self.count_bits * board.size
+
+        self.distances = self._build_table()
+
+    def _count_shift(self, line, goal):
+        """Shift of the count of tiles of goal line in line, in a key."""
+        return self.count_bits * (line * self.board.width + goal)
+
+    def _key(self, state, axis):
+        """Returns the key of a simplified board.
+
+        Args:
+            state (int): the packed state.
+            axis (int): 0 for rows (vertical moves), 1 for columns.
+        """
+        width = self.board.width
+        mask = self.board.tile_mask
+        key = 0
+
+        for index, shift in enumerate(self.board.shifts):
+            tile = (state >> shift) & mask
+            line = divmod(index, width)[axis]
+
+            if tile == 0:
+                key |= line << self.blank_shift
+            else:
+                key += 1 << self._count_shift(line, divmod(tile, width)[axis])
+
+        return key
+
+    def _build_table(self):
+        """Runs a breadth-first search from the goal over simplified boards.
+
+        Returns:
+            dict: the number of moves to the goal of every key.
+        """
+        width = self.board.width
+
+        # The goal is the same for rows and for columns
+        goal = 0
+        for tile in range(1, self.board.size):
+            line = tile // width
+            goal += 1 << self._count_shift(line, line)
+
+        distances = {goal: 0}
+        queue = deque([goal])
+        count_mask = (1 << self.count_bits) - 1
+
+        while queue:
+            key = queue.popleft()
+            blank = key >> self.blank_shift
+
+            for line in [blank - 1, blank + 1]:
+                if not 0 <= line < width:
+                    continue
+
+                # Move a tile of any goal line from line into the blank line
+                for goal_line in range(width):
+                    if (key >> self._count_shift(line, goal_line)) \
+                            & count_mask == 0:
+                        continue
+
+                    child = key \
+                        - (1 << self._count_shift(line, goal_line)) \
+                        + (1 << self._count_shift(blank, goal_line)) \
+                        + ((line - blank) << self.blank_shift)
+
+                    if child not in distances:
+                        distances[child] = distances[key] + 1
+                        queue.append(child)
+
+        return distances
+
+    def evaluate(self, state):
+        keys = (self._key(state, 0), self._key(state, 1))
+        return _walking_value(self.distances[keys[0]] +
+                              self.distances[keys[1]], keys)
+
+    def update(self, h, state, child, tile, zero, target):
+        # Values computed elsewhere (e.g. a plain int) have no keys
+        keys = getattr(h, "keys", None)
+        if keys is None:
+            keys = (self._key(state, 0), self._key(state, 1))
+
+        # Only the axis of the move changes; its key is updated by moving
+        # the tile to the line of the empty tile.
+        width = self.board.width
+        axis = 0 if abs(zero - target) == width else 1
+        key = keys[axis]
+
+        line_zero = divmod(zero, width)[axis]
+        line_target = divmod(target, width)[axis]
+        goal_line = divmod(tile, width)[axis]
+
+        child_key = key \
+            - (1 << self._count_shift(line_target, goal_line)) \
+            + (1 << self._count_shift(line_zero, goal_line)) \
+            + ((line_target - line_zero) << self.blank_shift)
+
+        h = h - self.distances[key] + self.distances[child_key]
+        if axis == 0:
+            return _walking_value(h, (child_key, keys[1]))
+
+        return _walking_value(h, (keys[0], child_key))
+
+
+class _MaxValue(int):
+    """Maximum of several heuristics, carrying the value of every heuristic
+    so that its children update them."""
+    pass
+
+def _max_value(parts):
+    """Returns the maximum of heuristic values, with the values."""
+    value = _MaxValue(max(parts))
+    value.parts = parts
+    return value
+
+class MaxHeuristic(Heuristic):
+    """The maximum of several admissible heuristics (also admissible). Its
+    values carry the value of every heuristic, which children update with the
+    `update` of each heuristic.
+    """
+    def __init__(self, name, description, heuristics):
+        self.name = name
+        self.description = description
+        self.heuristics = heuristics
+        self.board = heuristics[0].board
+
+    def evaluate(self, state):
+        return _max_value(tuple(h.evaluate(state) for h in self.heuristics))
+
+    def update(self, h, state, child, tile, zero, target):
+        # Values computed elsewhere (e.g. a plain int) have no parts
+        parts = getattr(h, "parts", None)
+        if parts is None:
+            parts = tuple(heuristic.evaluate(state)
+                          for heuristic in self.heuristics)
+
+        return _max_value(tuple(
+            heuristic.update(part, state, child, tile, zero, target)
+            for heuristic, part in zip(self.heuristics, parts)))
+
+
+def _pattern_database(board):
+    """Creates the default additive pattern database heuristic of a board."""
+    # Imported here, as pattern_db.py builds on this module
+    from pattern_db import pattern_heuristic
+    return pattern_heuristic(board=board)
+
+
+# Name and description of every heuristic by number, known without building
+# the heuristic (and its tables), e.g. to list them in the CLI.
+HEURISTIC_NAMES = {
+    1: ("h1", "Number of Misplaced Tiles"),
+    2: ("h2", "Manhattan Distance"),
+    3: (LinearConflictHeuristic.name, LinearConflictHeuristic.description),
+    4: (WalkingDistanceHeuristic.name, WalkingDistanceHeuristic.description),
+    5: ("h5", "Max of Linear Conflict and Walking Distance"),
+    6: ("h6", "Additive Pattern Database")
+}
+
+# Heuristic factories by number, called with the board to build the heuristic
+# for. Instances (and their tables) are created on first use by
+# `get_heuristic`.
+HEURISTICS = {
+    1: lambda board: TileHeuristic(*HEURISTIC_NAMES[1], _misplaced, board),
+    2: lambda board: TileHeuristic(*HEURISTIC_NAMES[2], _manhattan, board),
+    3: LinearConflictHeuristic,
+    4: WalkingDistanceHeuristic,
+    5: lambda board: MaxHeuristic(
+        *HEURISTIC_NAMES[5],
+        [get_heuristic(3, board), get_heuristic(4, board)]),
+    6: _pattern_database
+}
+
+# Heuristic instances created so far, by (number, board width).
+_instances = {}
+
+
+def register_heuristic(number, factory, name=None, description=None):
+    """Registers a new heuristic.
+
+    Args:
+        number (int): the number of the heuristic.
+        factory (function): factory(board) creates the `Heuristic` for a
+            board (called on first use).
+        name (str): its short name (by default, "h" and its number).
+        description (str): its description (by default, the description of
+            the heuristic, which is built to read it).
+    """
+    HEURISTICS[number] = factory
+
+    if description is None:
+        HEURISTIC_NAMES.pop(number, None)
+    else:
+        HEURISTIC_NAMES[number] = (name or "h{}".format(number), description)
+
+    for key in [key for key in _instances if key[0] == number]:
+        del _instances[key]
+
+def describe_heuristic(number):
+    """Returns the name and description of a registered heuristic, building
+    it only if they were not registered.
+
+    Returns:
+        tuple of str: the name and the description.
+    """
+    if number not in HEURISTIC_NAMES:
+        heuristic = get_heuristic(number)
+        return heuristic.name, heuristic.description
+
+    return HEURISTIC_NAMES[number]
+
+def get_heuristic(heuristic, board=BOARD):
+    """Returns a heuristic by number.
+
+    Args:
+        heuristic (int or obj:`Heuristic`): the number of a registered
+            heuristic (or a heuristic, which is returned as is).
+        board (obj:`Board`): the board of the puzzle.
+    Returns:
+        obj:`Heuristic`: the heuristic.
+    """
+    if isinstance(heuristic, Heuristic):
+        if heuristic.board is not board:
+            raise ValueError("Heuristic {} is for a {}x{} board".format(
+                heuristic.name, heuristic.board.width, heuristic.board.width))
+        return heuristic
+
+    if heuristic not in HEURISTICS:
+        raise ValueError("Unknown heuristic: {}".format(heuristic))
+
+    key = (heuristic, board.width)
+    if key not in _instances:
+        _instances[key] = HEURISTICS[heuristic](board)
+
+    return _instances[key]
@@ -0,0 +1,317 @@
+"""idastar.py -- Iterative-deepening A* search for 8-puzzle solution
+
+IDA* runs depth-first searches bounded by the evaluation f = g + h, raising
+the bound to the smallest evaluation that exceeded it until the goal is found.
+It only keeps the current path in memory, so memory use is O(depth) instead of
+growing with the frontier and explored set of A*.
+
+With several workers, the tree below the initial state is split into subtrees
+a few moves deep, and every threshold iteration searches the subtrees in
+parallel worker processes. The solution of the first subtree (in depth-first
+order) that reaches the goal is kept, which is the one a single process finds.
+
+Author: Álex Filipe Santos
+Date: 19 July 2020
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+from puzzle import SolutionSteps, NotSolvableException
+from state import INVERSE_MOVE, get_board, zero_index, encode_moves
+from heuristics import Heuristic, get_heuristic
+from solver import STANDARD_COST
+
+# Returned by the depth-first search once the goal is found.
+FOUND = -1
+
+# Number of subtrees searched per worker, so that uneven subtrees can be
+# balanced between the workers.
+SUBTREES_PER_WORKER = 8
+
+
+def bounded_search(board, heuristic, state, zero, g, h, bound, last_move,
+                   path):
+    """Depth-first search below a node, bounded by an evaluation.
+
+    Args:
+        board (obj:`Board`): the board of the puzzle.
+        heuristic (obj:`Heuristic`): the heuristic of the search.
+        state (int): the packed state of the node.
+        zero (int): the index of its empty tile.
+        g (int): the cost of reaching the node.
+        h (int): the heuristic value of the node.
+        bound (int): the largest evaluation searched.
+        last_move (str): the move that reached the node (never undone).
+        path (list of str): moves are made and unmade in place at the end of
+            this list; once the goal is found, it ends with the moves from the
+            node to the goal.
+    Returns:
+        int: FOUND if the goal was reached, otherwise the smallest evaluation
+            that exceeded the bound.
+        int: the number of nodes generated.
+    """
+    table = heuristic.table
+    shifts, tile_mask = board.shifts, board.tile_mask
+    move_table, goal_state = board.move_table, board.goal_state
+
+    # Number of nodes generated
+    search_cost = 0
+
+    def search(state, zero, g, h, last_move):
+        nonlocal search_cost
+
+        f = g + h
+        if f > bound:
+            return f
+
+        if state == goal_state:
+            return FOUND
+
+        minimum = float("inf")
+        zero_shift = shifts[zero]
+        backtrack = INVERSE_MOVE.get(last_move)
+
+        for move, target in move_table[zero]:
+            # Never undo the last move
+            if move == backtrack:
+                continue
+
+            # Make the move
+            shift = shifts[target]
+            tile = (state >> shift) & tile_mask
+            child = state + (tile << zero_shift) - (tile << shift)
+            path.append(move)
+            search_cost += 1
+
+            if table is not None:
+                tile_costs = table[tile]
+                child_h = h + tile_costs[zero] - tile_costs[target]
+            else:
+                child_h = heuristic.update(h, state, child,
+                                           tile, zero, target)
+
+            result = search(child, target, g + STANDARD_COST, child_h, move)
+
+            if result == FOUND:
+                return FOUND
+
+            # Unmake the move
+            path.pop()
+
+            if result < minimum:
+                minimum = result
+
+        return minimum
+
+    return search(state, zero, g, h, last_move), search_cost
+
+
+def _search_subtree(heuristic, width, subtree, bound):
+    """Runs a bounded search below a subtree root in a worker process.
+
+    Returns:
+        int: FOUND or the smallest evaluation that exceeded the bound.
+        int: the number of nodes generated.
+        list of str: the moves from the subtree root to the goal, if found.
+        int: the process id of the worker.
+    """
+    board = get_board(width)
+    state, zero, g, h, moves = subtree
+    path = []
+    last_move = moves[-1] if moves else None
+
+    result, cost = bounded_search(board, get_heuristic(heuristic, board),
+                                  state, zero, g, h, bound, last_move, path)
+    return result, cost, path, os.getpid()
+
+
+class IDAStarSolver:
+    """Memory-bounded solver with the same interface as `PuzzleSolver`.
+    """
+    def __init__(self, puzzle, heuristic=1, workers=1):
+        if not puzzle.is_solvable():
+            raise NotSolvableException("The puzzle provided is not solvable.")
+
+        if workers > 1 and isinstance(heuristic, Heuristic):
+            raise ValueError("Parallel search needs a heuristic number")
+
+        # Initial state of the puzzle
+        self.puzzle = puzzle
+
+        # Board of the puzzle (see `state.py`)
+        self.board = puzzle.board
+
+        # Heuristic used in the search (see `heuristics.py`), and its number
+        # for the worker processes
+        self.heuristic = get_heuristic(heuristic, self.board)
+        self.heuristic_number = heuristic
+
+        # Number of worker processes (1 searches in this process)
+        self.workers = workers
+
+        # Number of threshold iterations run in the last search
+        self.iterations = 0
+
+        # Nodes generated by each worker process in the last search
+        self.worker_costs = []
+
+
+    def find_solution(self):
+        """Returns a list of steps to reach the solution, including some
+        statistics (depth of solution and cost of solution - number of nodes
+        generated).
+
+        Returns:
+            dict: statistics (including the nodes generated by each worker
+                process, in a parallel search)
+        """
+        if self.workers > 1:
+            moves, cost = self.search_parallel()
+        else:
+            moves, cost = self.search_solution()
+
+        if moves is None:
+            raise NotSolvableException("Failed to find a solution.")
+
+        moves = encode_moves(moves)
+
+        return {
+            "steps": SolutionSteps(self.puzzle.state, moves, self.board.width),
+            "moves": moves,
+            "depth": len(moves),
+            "cost": cost,
+            "worker_costs": self.worker_costs
+        }
+
+
+    def search_solution(self):
+        """Runs the IDA* search algorithm to find a solution.
+
+        Returns:
+            list of str: the moves that solve the puzzle.
+            int: the total cost to reach the solution (nodes generated).
+        """
+        board = self.board
+        state = self.puzzle.state
+        zero = zero_index(state, board)
+        h = self.heuristic.evaluate(state)
+        bound = h
+
+        # Moves of the current path, made and unmade in place
+        path = []
+
+        # Number of nodes generated
+        search_cost = 1
+        self.iterations = 0
+
+        while True:
+            self.iterations += 1
+            result, cost = bounded_search(board, self.heuristic, state, zero,
+                                          0, h, bound, None, path)
+            search_cost += cost
+            self.worker_costs = [search_cost]
+
+            if result == FOUND:
+                return path, search_cost
+
+            # Failed to find a solution
+            if result == float("inf"):
+                return None, search_cost
+
+            bound = result
+
+    def split(self, count):
+        """Expands the tree below the initial state breadth-first, until
+        there are at least count subtrees.
+
+        Returns:
+            list of tuple: the (state, zero, g, h, moves) of every subtree
+                root, in depth-first order; or a single root if it is the
+                goal (the shallowest one, so the solution is optimal).
+            int: the number of nodes generated.
+        """
+        board = self.board
+        heuristic = self.heuristic
+        state = self.puzzle.state
+        roots = [(state, zero_index(state, board), 0,
+                  heuristic.evaluate(state), [])]
+        search_cost = 1
+
+        while len(roots) < count:
+            children = []
+
+            for state, zero, g, h, moves in roots:
+                if state == board.goal_state:
+                    return [(state, zero, g, h, moves)], search_cost
+
+                backtrack = INVERSE_MOVE.get(moves[-1] if moves else None)
+
+                for move, target in board.move_table[zero]:
+                    if move == backtrack:
+                        continue
+
+                    shift = board.shifts[target]
+                    tile = (state >> shift) & board.tile_mask
+                    child = state + (tile << board.shifts[zero]) - \
+                        (tile << shift)
+                    child_h = heuristic.update(h, state, child,
+                                               tile, zero, target)
+                    children.append((child, target, g + STANDARD_COST,
+                                     child_h, moves + [move]))
+                    search_cost += 1
+
+            roots = children
+
+        return roots, search_cost
+
+    def search_parallel(self):
+        """Runs the IDA* search algorithm, searching the subtrees of every
+        threshold iteration in parallel worker processes.
+
+        Returns:
+            list of str: the moves that solve the puzzle.
+            int: the total cost to reach the solution (nodes generated).
+        """
+        subtrees, search_cost = self.split(self.workers * SUBTREES_PER_WORKER)
+        width = self.board.width
+        bound = min(g + h for _, _, g, h, _ in subtrees)
+
+        # Nodes generated by each worker, by process id
+        worker_costs = {}
+        self.iterations = 0
+
+        with ProcessPoolExecutor(max_workers=self.workers) as executor:
+            while True:
+                self.iterations += 1
+                futures = [executor.submit(_search_subtree,
+                                           self.heuristic_number, width,
+                                           subtree, bound)
+                           for subtree in subtrees]
+                minimum = float("inf")
+                solution = None
+
+                # Results are read in depth-first order of the subtrees
+                for subtree, future in zip(subtrees, futures):
+                    if solution is not None:
+                        future.cancel()
+                        if future.cancelled():
+                            continue
+
+                    result, cost, path, pid = future.result()
+                    search_cost += cost
+                    worker_costs[pid] = worker_costs.get(pid, 0) + cost
+
+                    if result == FOUND and solution is None:
+                        solution = subtree[4] + path
+                    elif result != FOUND and result < minimum:
+                        minimum = result
+
+                self.worker_costs = list(worker_costs.values())
+
+                if solution is not None:
+                    return solution, search_cost
+
+                # Failed to find a solution
+                if minimum == float("inf"):
+                    return None, search_cost
+
+                bound = minimum
@@ -0,0 +1,422 @@
+"""layered.py -- Layer-synchronous searches over NumPy arrays of packed states
+
+Instead of expanding one `PuzzleNode` at a time, these searches expand a
+whole layer of states (all the states g moves away from the start) at once.
+States are packed as in `state.py`, in an array of uint64 (so boards up to
+4x4), and every step is an array operation:
+
+    - the children of a layer come from the move table, as index arithmetic
+      on the packed states (one pass per move direction);
+    - duplicates are removed with `np.unique`, and the children already in
+      the previous layer with a binary search in it (the moves of a sliding
+      puzzle flip the parity of the empty tile, so a state is never next to
+      a state of its own layer when the search starts from a single state,
+      and searching the previous and current layers is enough otherwise);
+    - heuristics are computed for the whole layer (see `vectorized.py`).
+
+`bfs_layers` enumerates the state space from some states (the distance table
+of `table.py` is built with it), and `solve_layered` solves a puzzle with a
+breadth-first search bounded by f = g + h, raising the bound like IDA* until
+the goal is found. A single puzzle does not have enough states per layer to
+pay for the array operations, so `solve_layered` is slower than
+`PuzzleSolver`. `solve_layered_batch` searches many puzzles in the same
+layers, and is faster than `PuzzleSolver` on large batches.
+
+NumPy is required (see `vectorized.HAVE_NUMPY`).
+
+Author: Álex Filipe Santos
+Date: 19 July 2020
+"""
+from puzzle import SolutionSteps, NotSolvableException
+from state import BOARD, encode_moves
+from vectorized import np, require_numpy, tile_heuristic, linear_conflict
+
+# Move directions, by number in the arrays of moves.
+MOVES = ("up", "right", "down", "left")
+
+# Heuristics that can be computed for a whole layer.
+LAYER_HEURISTICS = (1, 2, 3)
+
+# Target index of every move for every index of the empty tile (-1 if the
+# move is not allowed), by board width.
+_targets = {}
+
+
+def _move_targets(board):
+    """Returns the (size, 4) array of target indices of the moves."""
+    if board.width not in _targets:
+        targets = np.full((board.size, len(MOVES)), -1, dtype=np.int64)
+
+        for zero, moves in enumerate(board.move_table):
+            for move, target in moves:
+                targets[zero, MOVES.index(move)] = target
+
+        _targets[board.width] = targets
+
+    return _targets[board.width]
+
+def _check_board(board):
+    require_numpy()
+
+    if board.size * board.tile_bits > 64:
+        raise ValueError("Layered searches only pack boards up to 4x4")
+
+
+def unpack(states, board=BOARD):
+    """Returns the tiles of packed states.
+
+    Args:
+        states (obj:`numpy.ndarray`): N packed states (uint64).
+        board (obj:`Board`): the board of the puzzles.
+    Returns:
+        obj:`numpy.ndarray`: the (N, size) uint8 array of their tiles.
+    """
+    shifts = np.array(board.shifts, dtype=np.uint64)
+    tiles = (states[:, None] >> shifts) & np.uint64(board.tile_mask)
+    return tiles.astype(np.uint8)
+
+def _contains(layer, states):
+    """Returns whether every state is in a sorted layer."""
+    positions = np.searchsorted(layer, states)
+    found = np.zeros(len(states), dtype=bool)
+    inside = positions < len(layer)
+    found[inside] = layer[positions[inside]] == states[inside]
+    return found
+
+def expand(states, board=BOARD):
+    """Generates the children of every state.
+
+    Args:
+        states (obj:`numpy.ndarray`): N packed states (uint64).
+        board (obj:`Board`): the board of the puzzles.
+    Returns:
+        obj:`numpy.ndarray`: the packed children.
+        obj:`numpy.ndarray`: the index of the parent of every child.
+        obj:`numpy.ndarray`: the move (index in MOVES) of every child.
+    """
+    shifts = np.array(board.shifts, dtype=np.uint64)
+    mask = np.uint64(board.tile_mask)
+    zeros = np.argmin(unpack(states, board), axis=1)
+    targets = _move_targets(board)[zeros]
+    children, parents, moves = [], [], []
+
+    for move in range(len(MOVES)):
+        valid = np.nonzero(targets[:, move] >= 0)[0]
+        parent_states = states[valid]
+        target_shifts = shifts[targets[valid, move]]
+        zero_shifts = shifts[zeros[valid]]
+
+        # Slide the tile at target into the empty space
+        tiles = (parent_states >> target_shifts) & mask
+        children.append(parent_states - (tiles << target_shifts)
+                        + (tiles << zero_shifts))
+        parents.append(valid)
+        moves.append(np.full(len(valid), move, dtype=np.uint8))
+
+    return np.concatenate(children), np.concatenate(parents), \
+        np.concatenate(moves)
+
+def layer_heuristic(states, heuristic=2, board=BOARD):
+    """Returns the heuristic value of every packed state.
+
+    Args:
+        states (obj:`numpy.ndarray`): N packed states (uint64).
+        heuristic (int): the number of the heuristic (see LAYER_HEURISTICS).
+        board (obj:`Board`): the board of the puzzles.
+    Returns:
+        obj:`numpy.ndarray`: N values.
+    """
+    if heuristic not in LAYER_HEURISTICS:
+        raise ValueError("Layered searches support heuristics {}"
+                         .format(", ".join(map(str, LAYER_HEURISTICS))))
+
+    boards = unpack(states, board)
+
+    if heuristic == 3:
+        return linear_conflict(boards)
+
+    return tile_heuristic(boards, heuristic)
+
+
+def bfs_layers(states, board=BOARD):
+    """Runs a breadth-first search from some states, a layer at a time.
+
+    Args:
+        states (list of int): the packed start states.
+        board (obj:`Board`): the board of the puzzles.
+    Yields:
+        obj:`numpy.ndarray`: the sorted states of every layer, i.e. the
+            states d moves away from the nearest start state, for d = 0, 1...
+    """
+    _check_board(board)
+    layer = np.unique(np.array(states, dtype=np.uint64))
+    previous = np.zeros(0, dtype=np.uint64)
+
+    while len(layer):
+        yield layer
+
+        children = np.unique(expand(layer, board)[0])
+        children = children[~_contains(previous, children)]
+        children = children[~_contains(layer, children)]
+        previous, layer = layer, children
+
+
+def solve_layered(puzzle, heuristic=2):
+    """Solves a puzzle with a layer-synchronous A*: a breadth-first search
+    that prunes the children of evaluation f = g + h over a bound, raising the
+    bound to the lowest evaluation pruned until the goal is found. With a
+    consistent heuristic, a state pruned at its shortest depth is pruned at
+    any other depth, so the solution is optimal.
+
+    Args:
+        puzzle (obj:`Puzzle`): the puzzle.
+        heuristic (int): the number of the heuristic (see LAYER_HEURISTICS).
+    Returns:
+        dict: the solution, as returned by `PuzzleSolver.find_solution`, with
+            the number of bounds searched ("iterations").
+    """
+    if not puzzle.is_solvable():
+        raise NotSolvableException("The puzzle provided is not solvable.")
+
+    board = puzzle.board
+    _check_board(board)
+    root = np.array([puzzle.state], dtype=np.uint64)
+    goal_state = np.uint64(board.goal_state)
+    bound = int(layer_heuristic(root, heuristic, board)[0])
+
+    # Number of states kept in the layers, and of bounds searched
+    search_cost = 1
+    iterations = 0
+
+    while True:
+        iterations += 1
+
+        # States of every layer, and the parent index and move of each state
+        layers = [root]
+        parents = [None]
+        moves = [None]
+
+        # Lowest evaluation over the bound
+        minimum = float("inf")
+        found = None
+        g = 0
+
+        while len(layers[-1]):
+            layer = layers[-1]
+            goal = np.nonzero(layer == goal_state)[0]
+
+            if len(goal):
+                found = int(goal[0])
+                break
+
+            children, child_parents, child_moves = expand(layer, board)
+            g += 1
+
+            # Prune the children over the bound
+            f = g + layer_heuristic(children, heuristic, board)
+            over = f > bound
+            if over.any():
+                minimum = min(minimum, int(f[over].min()))
+
+            keep = np.nonzero(~over)[0]
+            if len(layers) > 1:
+                keep = keep[~_contains(layers[-2], children[keep])]
+
+            # Keep one parent of every new state
+            children, first = np.unique(children[keep], return_index=True)
+            layers.append(children)
+            parents.append(child_parents[keep][first])
+            moves.append(child_moves[keep][first])
+            search_cost += len(children)
+
+        if found is not None:
+            break
+
+        # Failed to find a solution
+        if minimum == float("inf"):
+            raise NotSolvableException("Failed to find a solution.")
+
+        bound = minimum
+
+    # Follow the parents back from the goal
+    path = []
+    index = found
+    for depth in range(len(layers) - 1, 0, -1):
+        path.append(MOVES[moves[depth][index]])
+        index = parents[depth][index]
+
+    path.reverse()
+    steps = SolutionSteps(puzzle.state, encode_moves(path), board.width)
+
+    return {
+        "steps": steps,
+        "moves": steps.moves,
+        "depth": len(path),
+        "cost": search_cost,
+        "iterations": iterations
+    }
+
+
+def _trace_path(layers, parents, moves, depth, index):
+    """Returns the moves to the state at an index of a layer, following its
+    parents back to the start."""
+    path = []
+
+    for layer in range(depth, 0, -1):
+        path.append(MOVES[moves[layer][index]])
+        index = parents[layer][index]
+
+    path.reverse()
+    return path
+
+def _solve_roots(puzzles, heuristic, board):
+    """Solves puzzles whose root number fits in the bits above their packed
+    states (see `solve_layered_batch`)."""
+    state_bits = np.uint64(board.size * board.tile_bits)
+    state_mask = np.uint64((1 << int(state_bits)) - 1)
+    goal_state = np.uint64(board.goal_state)
+    count = len(puzzles)
+
+    # Search keys of the roots: the root number above the packed state
+    roots = np.array([puzzle.state for puzzle in puzzles], dtype=np.uint64)
+    root_keys = (np.arange(count, dtype=np.uint64) << state_bits) | roots
+
+    # Bound of every root, states kept in its layers and bounds searched
+    bounds = layer_heuristic(roots, heuristic, board).astype(np.int64)
+    costs = np.ones(count, dtype=np.int64)
+    iterations = np.zeros(count, dtype=np.int64)
+
+    solutions = [None] * count
+    pending = np.arange(count)
+
+    while len(pending):
+        iterations[pending] += 1
+
+        # Roots still searching with their bound
+        searching = np.zeros(count, dtype=bool)
+        searching[pending] = True
+
+        # States of every layer, and the parent index and move of each state
+        layers = [np.sort(root_keys[pending])]
+        parents = [None]
+        moves = [None]
+
+        # Lowest evaluation over the bound of every root
+        minimum = np.full(count, np.iinfo(np.int64).max)
+        g = 0
+
+        while len(layers[-1]):
+            layer = layers[-1]
+            layer_roots = (layer >> state_bits).astype(np.int64)
+            found = np.nonzero((layer & state_mask) == goal_state)[0]
+
+            if len(found):
+                for index in found:
+                    root = layer_roots[index]
+                    solutions[root] = _trace_path(layers, parents, moves, g,
+                                                  index)
+                    searching[root] = False
+
+                # Stop expanding the solved roots
+                keep = searching[layer_roots]
+                layer = layers[-1] = layer[keep]
+                if g:
+                    parents[-1] = parents[-1][keep]
+                    moves[-1] = moves[-1][keep]
+
+            children, child_parents, child_moves = expand(layer, board)
+            child_roots = (children >> state_bits).astype(np.int64)
+            g += 1
+
+            # Prune the children over the bound of their root
+            f = g + layer_heuristic(children, heuristic, board)
+            over = f > bounds[child_roots]
+            over_f, over_roots = f[over], child_roots[over]
+
+            # Only a few evaluations are over the bounds at any depth
+            for value in np.unique(over_f).tolist():
+                hit = over_roots[over_f == value]
+                minimum[hit] = np.minimum(minimum[hit], value)
+
+            keep = np.nonzero(~over)[0]
+            if len(layers) > 1:
+                keep = keep[~_contains(layers[-2], children[keep])]
+
+            # Keep one parent of every new state of every root
+            children, first = np.unique(children[keep], return_index=True)
+            layers.append(children)
+            parents.append(child_parents[keep][first])
+            moves.append(child_moves[keep][first])
+            costs += np.bincount((children >> state_bits).astype(np.int64),
+                                 minlength=count)
+
+        # Raise the bound of the roots not solved
+        pending = np.nonzero(searching)[0]
+        if (minimum[pending] == np.iinfo(np.int64).max).any():
+            raise NotSolvableException("Failed to find a solution.")
+
+        bounds[pending] = minimum[pending]
+
+    results = []
+
+    for puzzle, path, cost, iteration in zip(puzzles, solutions,
+                                             costs.tolist(),
+                                             iterations.tolist()):
+        steps = SolutionSteps(puzzle.state, encode_moves(path), board.width)
+        results.append({
+            "steps": steps,
+            "moves": steps.moves,
+            "depth": len(path),
+            "cost": cost,
+            "iterations": iteration
+        })
+
+    return results
+
+def solve_layered_batch(puzzles, heuristic=2):
+    """Solves many puzzles with one layer-synchronous search (see
+    `solve_layered`): the layers of all the puzzles are expanded together,
+    every state tagged with the number of its puzzle in the bits above it,
+    so the cost of every array operation is shared by the whole batch. Each
+    puzzle keeps its own bound, and leaves the search once solved.
+
+    The tags need spare bits, so 4x4 boards (which take all 64 bits) are
+    solved one at a time, with `solve_layered`.
+
+    Args:
+        puzzles (list of obj:`Puzzle`): the puzzles, all of the same width.
+        heuristic (int): the number of the heuristic (see LAYER_HEURISTICS).
+    Returns:
+        list of dict: the solution of every puzzle (as returned by
+            `solve_layered`), or None for the unsolvable ones.
+    """
+    results = [None] * len(puzzles)
+    solvable = [index for index, puzzle in enumerate(puzzles)
+                if puzzle.is_solvable()]
+
+    if not solvable:
+        return results
+
+    board = puzzles[solvable[0]].board
+    _check_board(board)
+
+    if any(puzzles[index].board is not board for index in solvable):
+        raise ValueError("The puzzles of a batch must have the same width")
+
+    # Number of puzzles that can be tagged at once
+    batch_size = 1 << (64 - board.size * board.tile_bits)
+
+    if batch_size == 1:
+        for index in solvable:
+            results[index] = solve_layered(puzzles[index], heuristic)
+        return results
+
+    for start in range(0, len(solvable), batch_size):
+        indices = solvable[start:start + batch_size]
+        solutions = _solve_roots([puzzles[index] for index in indices],
+                                 heuristic, board)
+
+        for index, solution in zip(indices, solutions):
+            results[index] = solution
+
+    return results
@@ -0,0 +1,112 @@
+"""loadgen.py -- Load generator for the solving service
+
+Sends solve requests to the service (see `service.py`) from several
+concurrent connections, each waiting for a response before sending its next
+request, and reports the latency percentiles of the responses.
+
+    python loadgen.py [requests] [concurrency] [host:port]
+
+Without an address, a service is started on a local loopback port.
+
+Author: Álex Filipe Santos
+Date: 19 July 2020
+"""
+import sys
+import json
+import time
+import random
+import asyncio
+from stats import percentile
+from service import SolverService
+from solve_puzzle import generate_solvable_puzzles
+
+
+async def _client(host, port, requests, latencies, statuses):
+    """Sends requests from a queue over one connection, one at a time."""
+    reader, writer = await asyncio.open_connection(host, port)
+
+    try:
+        while not requests.empty():
+            request = requests.get_nowait()
+
+            start_time = time.perf_counter()
+            writer.write((json.dumps(request) + "\n").encode())
+            await writer.drain()
+            response = json.loads(await reader.readline())
+            end_time = time.perf_counter()
+
+            latencies.append(end_time - start_time)
+            statuses[response["status"]] = \
+                statuses.get(response["status"], 0) + 1
+
+    finally:
+        writer.close()
+        await writer.wait_closed()
+
+async def run_load(host, port, puzzles, concurrency=8, deadline=None):
+    """Solves puzzles through the service from concurrent connections.
+
+    Args:
+        host (str): the address of the service.
+        port (int): the port of the service.
+        puzzles (list of obj:`Puzzle`): the puzzles to request.
+        concurrency (int): the number of connections.
+        deadline (float): the deadline of every request, in seconds.
+    Returns:
+        dict: the latencies of the responses (seconds), the count of every
+            response status and the total seconds taken.
+    """
+    requests = asyncio.Queue()
+    for i, puzzle in enumerate(puzzles):
+        requests.put_nowait({"id": i, "puzzle": puzzle.string,
+                             "deadline": deadline})
+
+    latencies = []
+    statuses = {}
+
+    start_time = time.perf_counter()
+    await asyncio.gather(*[_client(host, port, requests, latencies, statuses)
+                           for _ in range(concurrency)])
+    end_time = time.perf_counter()
+
+    return {"latencies": latencies, "statuses": statuses,
+            "seconds": end_time - start_time}
+
+async def _main(count, concurrency, address):
+    random.seed(0)
+    puzzles = generate_solvable_puzzles(count)
+    service = None
+
+    if address is None:
+        service = SolverService()
+        server = await service.serve(port=0)
+        host, port = server.sockets[0].getsockname()[:2]
+    else:
+        host, port = address.rsplit(":", 1)
+
+    try:
+        results = await run_load(host, int(port), puzzles, concurrency)
+    finally:
+        if service is not None:
+            server.close()
+            await server.wait_closed()
+            service.close()
+
+    latencies = results["latencies"]
+    print("{} requests from {} connections in {:.3f} s ({:.1f} requests/s)"
+          .format(len(latencies), concurrency, results["seconds"],
+                  len(latencies) / results["seconds"]))
+    print("Statuses: {}".format(results["statuses"]))
+    print("Latency p50: {:.2f} ms, p99: {:.2f} ms".format(
+        1000 * percentile(latencies, 50), 1000 * percentile(latencies, 99)))
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 4:
+        print("USAGE: python loadgen.py [requests] [concurrency] [host:port]")
+
+    else:
+        load_count = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+        load_concurrency = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+        load_address = sys.argv[3] if len(sys.argv) > 3 else None
+        asyncio.run(_main(load_count, load_concurrency, load_address))
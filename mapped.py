@@ -0,0 +1,56 @@
+"""mapped.py -- Zero-copy loading of table files through mmap
+
+Table files (such as the distance table in `table.py`) are mapped read-only
+into memory instead of being read into Python objects: loading takes constant
+time, pages are only read from disk when they are first looked up, and
+processes forked after loading (or mapping the same file) share the pages.
+
+Table files are written atomically (`write_file`), so that a process mapping a
+table never sees it half-written, even while other processes write it.
+
+Author: Álex Filipe Santos
+Date: 19 July 2020
+"""
+import os
+import mmap
+import tempfile
+
+
+def map_file(filepath):
+    """Maps a table file into memory, read-only.
+
+    Args:
+        filepath (str): the path of the table file.
+    Returns:
+        memoryview: a zero-copy view of the bytes of the file. The view keeps
+            the mapping alive (the file itself can be closed).
+    """
+    with open(filepath, "rb") as fp:
+        mapping = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+
+    return memoryview(mapping)
+
+
+def write_file(filepath, data):
+    """Writes a table file atomically: the bytes go to a temporary file in the
+    same directory, which then replaces the file.
+
+    Args:
+        filepath (str): the path of the table file.
+        data (bytes-like): the bytes of the table.
+    """
+    directory = os.path.dirname(filepath)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    fd, temporary = tempfile.mkstemp(dir=directory or ".",
+                                     prefix=os.path.basename(filepath) + ".",
+                                     suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as fp:
+            fp.write(data)
+        os.replace(temporary, filepath)
+
+    except BaseException:
+        os.unlink(temporary)
+        raise
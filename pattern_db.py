@@ -0,0 +1,268 @@
+"""pattern_db.py -- Additive pattern database heuristics
+
+A pattern database stores, for every placement of a subset of the tiles (the
+pattern), the least number of moves of those tiles needed to bring them to
+their goal positions, whatever the other tiles are. When the patterns are
+disjoint and only the moves of pattern tiles are counted, the values of
+several databases can be added and the sum is still admissible (e.g. tiles
+1-4 and tiles 5-8 of the 8-puzzle).
+
+Databases are built with a retrograde breadth-first search from the goal and
+stored as byte arrays, one byte per placement of the pattern tiles, indexed by
+the rank of the partial permutation of their positions. Each database is built
+for one board size; the 15-puzzle uses three patterns of five tiles.
+
+Author: Álex Filipe Santos
+Date: 19 July 2020
+"""
+import os
+import sys
+from collections import deque
+from mapped import map_file, write_file
+from heuristics import Heuristic
+from state import BOARD, get_board, apply_move, zero_index
+
+# Distance stored for placements that were not reached.
+UNKNOWN_DISTANCE = 0xFF
+
+# Default directory of the pattern database files.
+DEFAULT_TABLE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                 "tables")
+
+# Default disjoint patterns, by board width.
+DEFAULT_PATTERNS = {
+    3: ((1, 2, 3, 4), (5, 6, 7, 8)),
+    4: ((1, 2, 3, 4, 5), (6, 7, 8, 9, 10), (11, 12, 13, 14, 15))
+}
+
+
+def placement_index(positions, board=BOARD):
+    """Returns the index of a placement of pattern tiles.
+
+    Args:
+        positions (list of int): the index of every pattern tile, in the order
+            of the pattern.
+        board (obj:`Board`): the board of the puzzle.
+    Returns:
+        int: the rank of the partial permutation of the positions.
+    """
+    index = 0
+    size = board.size
+
+    for i, position in enumerate(positions):
+        smaller = 0
+        for other in positions[:i]:
+            if other < position:
+                smaller += 1
+        index = index * (size - i) + position - smaller
+
+    return index
+
+def placement_count(pattern, board=BOARD):
+    """Returns the number of placements of a pattern (size! / (size - k)!)."""
+    count = 1
+
+    for i in range(len(pattern)):
+        count *= board.size - i
+
+    return count
+
+def pattern_filepath(pattern, directory=DEFAULT_TABLE_DIR, board=BOARD):
+    """Returns the path of the file of a pattern database."""
+    name = "-".join(str(tile) for tile in pattern)
+    return os.path.join(directory, "pdb-{0}x{0}-{1}.bin".format(board.width,
+                                                                name))
+
+def _other_tile(pattern, board):
+    """Returns the label standing for every tile outside of the pattern while
+    building (any tile that is not in the pattern)."""
+    for tile in range(1, board.size):
+        if tile not in pattern:
+            return tile
+
+    return board.tile_mask
+
+
+class PatternDatabase:
+    """Moves of the pattern tiles needed to reach the goal, for every
+    placement of the pattern tiles.
+    """
+    def __init__(self, pattern, data, board=BOARD):
+        if len(data) != placement_count(pattern, board):
+            raise ValueError("Pattern database must have {} entries"
+                             .format(placement_count(pattern, board)))
+
+        # Board the database is built for
+        self.board = board
+
+        # Tiles of the pattern
+        self.pattern = tuple(pattern)
+
+        # One byte per placement, indexed by `placement_index` (bytes,
+        # bytearray or a memoryview of a mapped file)
+        self.data = data
+
+
+    @classmethod
+    def build(cls, pattern, board=BOARD):
+        """Builds the database with a retrograde breadth-first search from the
+        goal. The other tiles are all replaced by a single label; moving them
+        costs nothing, so they are explored first (0-1 BFS).
+
+        Returns:
+            obj:`PatternDatabase`: the database.
+        """
+        pattern = tuple(pattern)
+        shifts, tile_mask = board.shifts, board.tile_mask
+        other_tile = _other_tile(pattern, board)
+
+        abstract_goal = 0
+        for shift in shifts:
+            tile = (board.goal_state >> shift) & tile_mask
+            if tile != 0 and tile not in pattern:
+                tile = other_tile
+            abstract_goal |= tile << shift
+
+        data = bytearray([UNKNOWN_DISTANCE]) * placement_count(pattern, board)
+        distances = {abstract_goal: 0}
+        queue = deque([(abstract_goal, zero_index(abstract_goal, board), 0)])
+
+        while queue:
+            state, zero, distance = queue.popleft()
+
+            # Already settled with a lower distance
+            if distances[state] < distance:
+                continue
+
+            index = placement_index(_positions(state, pattern, board), board)
+            if data[index] == UNKNOWN_DISTANCE:
+                data[index] = distance
+
+            for _, target in board.move_table[zero]:
+                tile = (state >> shifts[target]) & tile_mask
+                cost = 0 if tile == other_tile else 1
+                child = apply_move(state, zero, target, board)
+
+                if distance + cost < distances.get(child, UNKNOWN_DISTANCE):
+                    distances[child] = distance + cost
+                    if cost == 0:
+                        queue.appendleft((child, target, distance))
+                    else:
+                        queue.append((child, target, distance + 1))
+
+        return cls(pattern, data, board)
+
+    @classmethod
+    def load(cls, pattern, filepath=None, board=BOARD):
+        """Memory-maps a database written by `save`."""
+        filepath = filepath or pattern_filepath(pattern, board=board)
+        return cls(pattern, map_file(filepath), board)
+
+    @classmethod
+    def load_or_build(cls, pattern, directory=DEFAULT_TABLE_DIR, board=BOARD):
+        """Loads the database file, building and saving it on first use."""
+        filepath = pattern_filepath(pattern, directory, board)
+
+        if os.path.exists(filepath):
+            return cls.load(pattern, filepath, board)
+
+        database = cls.build(pattern, board)
+        database.save(filepath)
+        return database
+
+    def save(self, filepath=None):
+        """Writes the database as a raw byte file (atomically, see
+        `mapped.write_file`)."""
+        filepath = filepath or pattern_filepath(self.pattern, board=self.board)
+        write_file(filepath, self.data)
+
+
+    def distance(self, state):
+        """Returns the moves of the pattern tiles needed to solve a state."""
+        positions = _positions(state, self.pattern, self.board)
+        return self.data[placement_index(positions, self.board)]
+
+
+def _positions(state, pattern, board=BOARD):
+    """Returns the index of every tile of a pattern in a packed state."""
+    tile_bits, tile_mask = board.tile_bits, board.tile_mask
+    where = [0] * (tile_mask + 1)
+
+    for index in range(board.size):
+        where[state & tile_mask] = index
+        state >>= tile_bits
+
+    return [where[tile] for tile in pattern]
+
+
+class PatternDatabaseHeuristic(Heuristic):
+    """Sum of disjoint additive pattern databases. A move only changes the
+    database of the pattern of the tile that moved.
+    """
+    def __init__(self, name, description, databases):
+        self.name = name
+        self.description = description
+        self.databases = databases
+        self.board = databases[0].board
+
+        # Database of every tile
+        self.database_of = {}
+        for database in databases:
+            for tile in database.pattern:
+                self.database_of[tile] = database
+
+    def evaluate(self, state):
+        return sum(database.distance(state) for database in self.databases)
+
+    def update(self, h, state, child, tile, zero, target):
+        database = self.database_of.get(tile)
+
+        if database is None:
+            return h
+
+        return h - database.distance(state) + database.distance(child)
+
+
+def pattern_heuristic(patterns=None, name="h6", board=BOARD):
+    """Creates an additive pattern database heuristic, loading (or building)
+    the database files.
+
+    Args:
+        patterns (list of tuple): disjoint lists of tiles (by default, the
+            `DEFAULT_PATTERNS` of the board).
+        name (str): the name of the heuristic.
+        board (obj:`Board`): the board of the puzzle.
+    Returns:
+        obj:`PatternDatabaseHeuristic`: the heuristic.
+    """
+    if patterns is None:
+        if board.width not in DEFAULT_PATTERNS:
+            raise ValueError("No default patterns for a {0}x{0} board"
+                             .format(board.width))
+        patterns = DEFAULT_PATTERNS[board.width]
+
+    description = "Additive Pattern Database ({})".format(
+        ", ".join("-".join(str(t) for t in pattern) for pattern in patterns))
+
+    return PatternDatabaseHeuristic(
+        name, description,
+        [PatternDatabase.load_or_build(pattern, board=board)
+         for pattern in patterns])
+
+
+if __name__ == '__main__':
+    if len(sys.argv) not in [2, 3, 4] or sys.argv[1] != "build":
+        print("USAGE: python pattern_db.py build [width] "
+              "[patterns, e.g. 1-2-3-4,5-6-7-8]")
+
+    else:
+        board = get_board(int(sys.argv[2]) if len(sys.argv) > 2 else 3)
+        patterns = DEFAULT_PATTERNS[board.width]
+        if len(sys.argv) == 4:
+            patterns = [tuple(int(t) for t in pattern.split("-"))
+                        for pattern in sys.argv[3].split(",")]
+
+        for pattern in patterns:
+            filepath = pattern_filepath(pattern, board=board)
+            PatternDatabase.build(pattern, board).save(filepath)
+            print("Pattern database written to {}".format(filepath))
@@ -1,8 +1,12 @@
-"""puzzle.py -- Contains methods and classes to represent a 8-puzzle.
+"""puzzle.py -- Contains methods and classes to represent a 8-puzzle (and
+other N x N sliding puzzles).
 
 Author: Álex Filipe Santos
 Date: 19 July 2020
 """
+from collections.abc import Sequence
+from state import (TILE_CHARS, str_to_state, state_to_str, get_board,
+                   board_for_size, path_states, decode_moves)
 
 # The solved puzzle goal, represented as a string.
 PUZZLE_GOAL_STR = "012345678"
@@ -32,32 +36,45 @@ def str_to_matrix(puzzle_str):
 
     Args:
         puzzle_str (str): The string representation of the puzzle, for
-        example "012345678", filling a 3x3 matrix left to right.
+        example "012345678", filling a square matrix left to right. Tiles
+        above 9 are written as letters (A = 10, B = 11, ...).
     Returns:
-        list of list: The 3x3 matrix representation of the puzzle.
+        list of list: The matrix representation of the puzzle.
     """
-    if len(puzzle_str) != 9:
-        raise ValueError("Puzzle not valid")
+    width = board_for_size(len(puzzle_str)).width
 
     return [
-        list(int(s) for s in puzzle_str[0:3]),
-        list(int(s) for s in puzzle_str[3:6]),
-        list(int(s) for s in puzzle_str[6:9])
+        list(int(s, 36) for s in puzzle_str[i:i + width])
+        for i in range(0, len(puzzle_str), width)
     ]
 
 def matrix_to_str(matrix):
     """Transforms a matrix representation of a puzzle into a string.
 
     Args:
-        matrix (list of list): The 3x3 matrix representation of the puzzle.
+        matrix (list of list): The matrix representation of the puzzle.
     Returns:
         str: The string representation of the puzzle.
     """
     return "".join(
-        "".join(str(c) for c in r)
+        "".join(TILE_CHARS[c] for c in r)
         for r in matrix
     )
 
+def tiles_to_str(tiles):
+    """Transforms a list of tiles (read left to right, top to bottom) into
+    the string representation of a puzzle.
+
+    Args:
+        tiles (list of int): The tiles of the puzzle.
+    Returns:
+        str: The string representation of the puzzle.
+    """
+    if any(not 0 <= t < len(TILE_CHARS) for t in tiles):
+        raise ValueError("Puzzle not valid")
+
+    return "".join(TILE_CHARS[t] for t in tiles)
+
 
 class NotSolvableException(Exception):
     """Puzzle not solvable."""
@@ -67,7 +84,8 @@ class IllegalMoveException(Exception):
 
 
 class Puzzle:
-    """Represents an 8-puzzle."""
+    """Represents an 8-puzzle (or, more generally, an N x N sliding puzzle,
+    such as the 15-puzzle)."""
 
     def __init__(self,
                  puzzle_matrix=PUZZLE_GOAL,
@@ -83,14 +101,44 @@ class Puzzle:
         if puzzle_str:
             self.matrix = str_to_matrix(puzzle_str)
 
+        # Width of the puzzle (3 for the 8-puzzle, 4 for the 15-puzzle...)
+        # and the geometry of its board (see `state.py`)
+        self.width = len(self.matrix)
+        self.board = get_board(self.width)
+
+        if any(len(r) != self.width for r in self.matrix):
+            raise ValueError("Puzzle not valid")
+
         self.__update_state()
 
+    @classmethod
+    def from_state(cls, state, last_move=None, width=3):
+        """Builds a puzzle from a packed state (see `state.py`), as used by
+        the solver.
+
+        Args:
+            state (int): the packed state.
+            last_move (str): the last move made to reach this state.
+            width (int): the width of the puzzle.
+        Returns:
+            obj:`Puzzle`: the puzzle.
+        """
+        return cls(puzzle_str=state_to_str(state, get_board(width)),
+                   last_move=last_move)
+
+    @classmethod
+    def goal(cls, width=3):
+        """Returns the solved puzzle of a given width.
+        """
+        return cls(puzzle_str=get_board(width).goal_str)
+
 
     def __update_state(self):
         """Refreshes the state of the puzzle after updating its matrix
         (allowed moves, string representation, zero index, etc.)
         """
         self.string = matrix_to_str(self.matrix)
+        self.state = str_to_state(self.string, self.board)
         self.zero_index = self.__zero_index()
         self.allowed_moves = self.__allowed_moves()
 
@@ -98,8 +146,10 @@ class Puzzle:
     def __str__(self):
         """Pretty-print representation of the puzzle.
         """
+        digits = len(str(self.board.size - 1))
+
         return "\n".join(
-            " ".join(str(s) for s in r)
+            " ".join(str(s).rjust(digits) for s in r)
             for r in self.matrix
         )
 
@@ -120,24 +170,31 @@ class Puzzle:
     def is_solved(self):
         """Returns True if this puzzle is solved.
         """
-        return self.string == PUZZLE_GOAL_STR
+        return self.string == self.board.goal_str
 
     def is_solvable(self):
         """Returns True if the current puzzle is solvable.
         """
         inversions = 0
+        size = self.board.size
 
         # Counts the number of inversions (the number of times that a tile with
         # higher value comes before a tile with lower value).
-        for i in range(8):
-            for j in range(i + 1, 9):
-                fst = int(self.string[i])
-                snd = int(self.string[j])
+        for i in range(size - 1):
+            for j in range(i + 1, size):
+                fst = int(self.string[i], 36)
+                snd = int(self.string[j], 36)
 
                 if fst > 0 and snd > 0 and fst > snd:
                     inversions += 1
 
-        return inversions % 2 == 0
+        # Every move flips the parity of the permutation and of the distance
+        # of the empty tile to its goal (the top-left corner). A vertical move
+        # also changes the inversions by width - 1, so on boards of even width
+        # the row of the empty tile is taken into account.
+        i, _ = self.zero_index
+
+        return (inversions + i * (self.width - 1)) % 2 == 0
 
     def misplaced_heuristic(self):
         """Calculates the heuristic for number of misplaced tiles (the total for
@@ -148,7 +205,7 @@ class Puzzle:
         misplaced = 0
 
         for i, s in enumerate(self.string):
-            s = int(s)
+            s = int(s, 36)
             if s != 0 and i != s:
                 misplaced += 1
 
@@ -160,8 +217,8 @@ class Puzzle:
         """
         total_distance = 0
 
-        for i1 in range(3):
-            for j1 in range(3):
+        for i1 in range(self.width):
+            for j1 in range(self.width):
                 # The Manhattan distance is |i1 - i2| + |j1 - j2|
                 # for two points (i1, i2) <-> (j1, j2)
 
@@ -170,7 +227,7 @@ class Puzzle:
 
                 if n != 0:
                     # Where the number is supposed to be
-                    i2, j2 = PUZZLE_POSITIONS[n]
+                    i2, j2 = divmod(n, self.width)
 
                     # Distance
                     dist = abs(i1 - i2) + abs(j1 - j2)
@@ -183,17 +240,7 @@ class Puzzle:
     def __zero_index(self):
         """Returns (i, j) representing the index of the zero element.
         """
-        i, j = 0, 0
-
-        while i < 3 and j < 3 and self.matrix[i][j] != 0:
-            if i < 2:
-                i += 1
-
-            elif i == 2:
-                i = 0
-                j += 1
-
-        return i, j
+        return divmod(self.string.index("0"), self.width)
 
     def __allowed_moves(self):
         """Returns a set of allowed moves for the current puzzle.
@@ -203,11 +250,11 @@ class Puzzle:
 
         if i == 0:
             moves.remove("down")
-        if i == 2:
+        if i == self.width - 1:
             moves.remove("up")
         if j == 0:
             moves.remove("right")
-        if j == 2:
+        if j == self.width - 1:
             moves.remove("left")
 
         return moves
@@ -254,3 +301,62 @@ class Puzzle:
     def __move_left(self, i, j):
         self.matrix[i][j] = self.matrix[i][j+1]
         self.matrix[i][j+1] = 0
+
+
+class SolutionSteps(Sequence):
+    """The puzzles along a solution, from the initial puzzle to the goal.
+
+    A solution only keeps its initial state and its moves as a byte string
+    (see `state.encode_moves`). The states along the way are replayed the
+    first time a step is read, and every step is a new `Puzzle` built on
+    demand, so unread steps cost nothing.
+    """
+    def __init__(self, state, moves, width=3):
+        # Packed initial state, and the board of the puzzle
+        self.state = state
+        self.board = get_board(width)
+
+        # Moves of the solution, one byte each
+        self.moves = moves
+
+        # Packed state of every step, replayed on first use
+        self._states = None
+
+
+    def __len__(self):
+        return len(self.moves) + 1
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+
+        if index < 0:
+            index += len(self)
+
+        if not 0 <= index < len(self):
+            raise IndexError("step index out of range")
+
+        if self._states is None:
+            self._states = [self.state]
+            self._states += path_states(self.state, self.moves, self.board)
+
+        last_move = decode_moves(self.moves[index - 1:index])[0] \
+            if index else None
+        return Puzzle.from_state(self._states[index], last_move=last_move,
+                                 width=self.board.width)
+
+    def __eq__(self, other):
+        """Compares the steps with another solution, or with any sequence of
+        puzzles (e.g. the list of steps solutions used to be)."""
+        if isinstance(other, SolutionSteps):
+            return (self.state, self.moves, self.board) == \
+                (other.state, other.moves, other.board)
+
+        if not isinstance(other, Sequence) or isinstance(other, str):
+            return NotImplemented
+
+        return len(self) == len(other) and \
+            all(step == puzzle for step, puzzle in zip(self, other))
+
+    # Mutable-looking sequences are not hashable (like lists)
+    __hash__ = None
@@ -1,14 +1,65 @@
 """report.py -- generates a runtime report from different test cases
 
+Report modes 1 (the sample cases in test/) and 2 (seeded random cases) run a
+benchmark: every case is solved after warmup runs, several times, timed with
+`time.perf_counter_ns` and with the garbage collector paused. Results are
+grouped by optimal depth, engine and heuristic, with the median, p95 and p99
+times, the nodes expanded per second and the peak memory of the process.
+Report mode 3 compares the average cost and time of heuristics on the sample
+cases.
+
+    python report.py [1|2|3] [output-file] [heuristics, e.g. 1,2,3]
+                     [--engines astar,idastar] [--repeat N] [--warmup N]
+                     [--count N] [--seed N]
+    python report.py compare [baseline-file] [results-file] [--threshold F]
+
+The compare mode lists the changes between two benchmark result files, and
+exits with status 1 if any result got slower than the threshold (10% by
+default) or expands more nodes.
+
 Author: Álex Filipe Santos
 Date: 19 July 2020
 """
+import gc
 import sys
-import time
 import json
+import time
+import argparse
+import platform
+import statistics
 from puzzle import Puzzle
+from batch import solve_many
 from solver import PuzzleSolver
-from solve_puzzle import generate_solvable_puzzle, input_to_puzzle
+from idastar import IDAStarSolver
+from layered import LAYER_HEURISTICS, solve_layered
+from table import DistanceTable
+from generator import generate_puzzles
+from stats import percentile
+from solve_puzzle import input_to_puzzle
+from vectorized import HAVE_NUMPY, solvable_puzzles
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+# Solvers benchmarked, by name: engine(puzzle, heuristic) returns a solution
+# (see `PuzzleSolver.find_solution`).
+ENGINES = {
+    "astar": lambda puzzle, heuristic:
+        PuzzleSolver(puzzle, heuristic).find_solution(),
+    "bidirectional": lambda puzzle, heuristic:
+        PuzzleSolver(puzzle, heuristic, bidirectional=True).find_solution(),
+    "idastar": lambda puzzle, heuristic:
+        IDAStarSolver(puzzle, heuristic).find_solution(),
+    "layered": solve_layered
+}
+
+# Depths of the sample cases (test/LengthN.txt).
+SAMPLE_DEPTHS = (4, 8, 12, 16, 20)
+
+# Slowdown of the median time (as a fraction) reported as a regression.
+REGRESSION_THRESHOLD = 0.10
 
 
 def file_to_puzzle_list(filepath):
@@ -41,76 +92,289 @@ def file_to_puzzle_list(filepath):
     return puzzles
 
 
-def report(cases):
+def report(cases, heuristics=(1, 2), workers=1):
     """Generates a statistical report based on an arbitrary list of input
     cases.
 
     Args:
         cases (list of obj:`Puzzle`): list of puzzles to be solved.
+        heuristics (list of int): the heuristics to solve the puzzles with
+            (see `heuristics.py`).
+        workers (int): the number of worker processes solving the puzzles
+            (see `batch.py`).
     """
 
     # Filters only solvable puzzles
-    filtered_cases = []
-    for puzzle in cases:
-        if puzzle.is_solvable():
-            filtered_cases.append(puzzle)
+    filtered_cases = solvable_puzzles(cases)
 
-    total_cost_h1 = 0
-    total_cost_h2 = 0
+    total_cases = len(filtered_cases)
+    stats = {"cases_tested": total_cases}
 
-    total_time_h1 = 0
-    total_time_h2 = 0
+    # Solver for each heuristic
+    for heuristic in heuristics:
+        total_cost = 0
+        total_time = 0
 
-    total_cases = len(filtered_cases)
+        for result in solve_many(filtered_cases, heuristic, workers=workers):
+            total_cost += result["cost"]
+            total_time += result["time"]
+
+        stats["total_cost_h{}".format(heuristic)] = total_cost
+        stats["average_cost_h{}".format(heuristic)] = total_cost / total_cases
+        stats["total_time_h{}".format(heuristic)] = total_time
+        stats["average_time_h{}".format(heuristic)] = total_time / total_cases
+
+    return stats
+
+
+def compare_heuristics(stats, heuristics, baseline=2):
+    """Adds to a report the reduction of the average cost and time of every
+    heuristic against a baseline heuristic (Manhattan distance by default),
+    as a factor (e.g. 2.0 = half the nodes of the baseline).
+
+    Args:
+        stats (dict): the report, as returned by `report`.
+        heuristics (list of int): the heuristics of the report.
+        baseline (int): the heuristic to compare against.
+    """
+    for heuristic in heuristics:
+        if heuristic == baseline:
+            continue
+
+        for measure in ["cost", "time"]:
+            base = stats["average_{}_h{}".format(measure, baseline)]
+            value = stats["average_{}_h{}".format(measure, heuristic)]
+
+            stats["{}_reduction_h{}".format(measure, heuristic)] = \
+                base / value if value else None
+
+
+def peak_rss_kb():
+    """Returns the peak resident memory of this process in KiB, or None
+    where it cannot be measured."""
+    if resource is None:
+        return None
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    # Bytes on macOS, KiB elsewhere
+    return peak // 1024 if sys.platform == "darwin" else peak
+
+def _supports(engine, heuristic):
+    """Returns True if an engine can run with a heuristic."""
+    if engine == "layered":
+        return HAVE_NUMPY and heuristic in LAYER_HEURISTICS
+
+    return True
+
+def _expansions(solution):
+    """Returns the nodes expanded by a solve (generated, for the solvers that
+    do not count expansions)."""
+    stats = solution.get("stats")
+    return stats.expanded if stats is not None else solution["cost"]
+
+def time_solves(engine, puzzle, heuristic, repeat=5, warmup=1):
+    """Times repeated solves of a puzzle, after some untimed solves.
+
+    Args:
+        engine (str): the name of the solver (see ENGINES).
+        puzzle (obj:`Puzzle`): the puzzle.
+        heuristic (int): the search heuristic to use.
+        repeat (int): the number of timed solves.
+        warmup (int): the number of solves before them.
+    Returns:
+        list of int: the nanoseconds of every timed solve.
+        int: the nodes expanded by a solve.
+    """
+    solve = ENGINES[engine]
 
-    # Solver for heuristic h1
-    for puzzle in filtered_cases:
-        solver = PuzzleSolver(puzzle, heuristic=1)
-
-        start_time = time.time()
-        solution = solver.find_solution()
-        end_time = time.time()
-
-        total_cost_h1 += solution["cost"]
-        total_time_h1 += end_time - start_time
-
-    # Solver for heuristic h2
-    for puzzle in filtered_cases:
-        solver = PuzzleSolver(puzzle, heuristic=2)
-
-        start_time = time.time()
-        solution = solver.find_solution()
-        end_time = time.time()
-
-        total_cost_h2 += solution["cost"]
-        total_time_h2 += end_time - start_time
-
-    return {
-        "cases_tested": total_cases,
-        "total_cost_h1": total_cost_h1,
-        "average_cost_h1": total_cost_h1 / total_cases,
-        "total_time_h1": total_time_h1,
-        "average_time_h1": total_time_h1 / total_cases,
-        "total_cost_h2": total_cost_h2,
-        "average_cost_h2": total_cost_h2 / total_cases,
-        "total_time_h2": total_time_h2,
-        "average_time_h2": total_time_h2 / total_cases
+    for _ in range(warmup):
+        solve(puzzle, heuristic)
+
+    times = []
+    gc_enabled = gc.isenabled()
+    gc.disable()
+
+    try:
+        for _ in range(repeat):
+            start_time = time.perf_counter_ns()
+            solution = solve(puzzle, heuristic)
+            times.append(time.perf_counter_ns() - start_time)
+    finally:
+        if gc_enabled:
+            gc.enable()
+
+    return times, _expansions(solution)
+
+def benchmark(cases, engines=("astar",), heuristics=(1, 2), repeat=5,
+              warmup=1):
+    """Benchmarks solvers on cases grouped by depth.
+
+    Args:
+        cases (dict): the list of puzzles of every depth (unsolvable puzzles
+            are left out).
+        engines (list of str): the solvers (see ENGINES).
+        heuristics (list of int): the search heuristics to use.
+        repeat (int): the number of timed solves of every case.
+        warmup (int): the number of untimed solves before them.
+    Returns:
+        list of dict: the result of every depth, engine and heuristic (the
+            engines that do not support a heuristic are skipped).
+    """
+    for engine in engines:
+        if engine not in ENGINES:
+            raise ValueError("Unknown engine: {}".format(engine))
+
+    if repeat < 1:
+        raise ValueError("At least one timed solve is needed")
+
+    results = []
+
+    for depth, puzzles in sorted(cases.items()):
+        puzzles = solvable_puzzles(puzzles)
+        if not puzzles:
+            continue
+
+        for engine in engines:
+            for heuristic in heuristics:
+                if not _supports(engine, heuristic):
+                    continue
+
+                times = []
+                expansions = 0
+
+                for puzzle in puzzles:
+                    run_times, nodes = time_solves(engine, puzzle, heuristic,
+                                                   repeat, warmup)
+                    times += run_times
+                    expansions += nodes * len(run_times)
+
+                seconds = sum(times) / 1e9
+
+                results.append({
+                    "depth": depth,
+                    "engine": engine,
+                    "heuristic": heuristic,
+                    "cases": len(puzzles),
+                    "runs": len(times),
+                    "median_ms": statistics.median(times) / 1e6,
+                    "p95_ms": percentile(times, 95) / 1e6,
+                    "p99_ms": percentile(times, 99) / 1e6,
+                    "mean_ms": statistics.mean(times) / 1e6,
+                    "expansions": expansions // len(times),
+                    "expansions_per_second":
+                        expansions / seconds if seconds else None,
+                    "peak_rss_kb": peak_rss_kb()
+                })
+
+    return results
+
+def sample_cases():
+    """Returns the sample cases in test/, by depth."""
+    return {depth: file_to_puzzle_list("test/Length{}.txt".format(depth))
+            for depth in SAMPLE_DEPTHS}
+
+def random_cases(count=10, seed=0):
+    """Returns seeded random solvable puzzles (see `generator.py`), grouped
+    by their optimal depth (from the distance table).
+
+    Args:
+        count (int): the number of puzzles.
+        seed (int): the seed of the random generator.
+    Returns:
+        dict: the list of puzzles of every depth.
+    """
+    table = DistanceTable.load_or_build()
+    cases = {}
+
+    for puzzle in generate_puzzles(count, seed=seed):
+        cases.setdefault(table.distance(puzzle.state), []).append(puzzle)
+
+    return cases
+
+def write_benchmark(filepath, results, settings):
+    """Writes benchmark results with the settings and environment they were
+    measured in.
+    """
+    data = {
+        "settings": settings,
+        "environment": {
+            "python": platform.python_version(),
+            "implementation": platform.python_implementation(),
+            "platform": platform.platform(),
+            "numpy": HAVE_NUMPY
+        },
+        "results": results
     }
 
+    with open(filepath, "w") as output:
+        json.dump(data, output, indent=4)
+
 
-def report_sample_cases(filepath):
-    """Writes report to file based on the sample cases provided."""
+def compare_results(baseline, current, threshold=REGRESSION_THRESHOLD):
+    """Compares benchmark results to baseline results.
+
+    Args:
+        baseline (dict): the baseline, as written by `write_benchmark`.
+        current (dict): the results to compare.
+        threshold (float): the slowdown of the median time (as a fraction)
+            reported as a regression.
+    Returns:
+        list of dict: for every depth, engine and heuristic in both, the
+            medians, their ratio (current / baseline), the nodes expanded and
+            whether the result regressed (slower than the threshold, or
+            expanding more nodes).
+    """
+    def key(result):
+        return result["depth"], result["engine"], result["heuristic"]
+
+    baseline_results = {key(result): result for result in baseline["results"]}
+    changes = []
+
+    for result in current["results"]:
+        base = baseline_results.get(key(result))
+        if base is None:
+            continue
+
+        ratio = result["median_ms"] / base["median_ms"] \
+            if base["median_ms"] else None
+        slower = ratio is not None and ratio > 1 + threshold
+
+        changes.append({
+            "depth": result["depth"],
+            "engine": result["engine"],
+            "heuristic": result["heuristic"],
+            "baseline_ms": base["median_ms"],
+            "median_ms": result["median_ms"],
+            "ratio": ratio,
+            "baseline_expansions": base["expansions"],
+            "expansions": result["expansions"],
+            "regression": slower or result["expansions"] > base["expansions"]
+        })
+
+    return changes
+
+
+def report_sample_cases(filepath, heuristics=(1, 2), baseline=None,
+                        workers=1):
+    """Writes report to file based on the sample cases provided. If a
+    baseline heuristic is given, the other heuristics are compared to it.
+    """
     length4 = file_to_puzzle_list("test/Length4.txt")
     length8 = file_to_puzzle_list("test/Length8.txt")
     length12 = file_to_puzzle_list("test/Length12.txt")
     length16 = file_to_puzzle_list("test/Length16.txt")
     length20 = file_to_puzzle_list("test/Length20.txt")
 
-    report4 = report(length4)
-    report8 = report(length8)
-    report12 = report(length12)
-    report16 = report(length16)
-    report20 = report(length20)
+    report4 = report(length4, heuristics, workers)
+    report8 = report(length8, heuristics, workers)
+    report12 = report(length12, heuristics, workers)
+    report16 = report(length16, heuristics, workers)
+    report20 = report(length20, heuristics, workers)
+
+    if baseline is not None:
+        for stats in [report4, report8, report12, report16, report20]:
+            compare_heuristics(stats, heuristics, baseline)
 
     data = [
         {"depth": 4, "stats": report4},
@@ -124,19 +388,111 @@ def report_sample_cases(filepath):
         json.dump(data, output, indent=4)
 
 
-if __name__ == '__main__':
-    if len(sys.argv) != 3:
-        print("USAGE: python report.py [report-mode] [output-file]")
+def _heuristic_list(text):
+    """Parses a list of heuristics, e.g. "1,2,3"."""
+    return [int(h) for h in text.split(",")]
+
+def report_main(args):
+    """Runs report modes 1 to 3 with their command-line arguments."""
+    parser = argparse.ArgumentParser(
+        prog="report.py",
+        description="Benchmarks the solvers (modes 1 and 2) or compares the "
+                    "heuristics to the Manhattan distance (mode 3).")
+    parser.add_argument("mode", type=int, choices=[1, 2, 3],
+                        help="1 = sample cases, 2 = random cases, "
+                             "3 = sample cases compared to h2")
+    parser.add_argument("output", help="the output JSON file")
+    parser.add_argument("heuristics", nargs="?", type=_heuristic_list,
+                        help="e.g. 1,2,3")
+    parser.add_argument("--engines", type=lambda text: text.split(","),
+                        default=["astar"],
+                        help="e.g. astar,idastar ({})".format(
+                            ", ".join(ENGINES)))
+    parser.add_argument("--repeat", type=int, default=5,
+                        help="timed solves of every case")
+    parser.add_argument("--warmup", type=int, default=1,
+                        help="untimed solves of every case before them")
+    parser.add_argument("--count", type=int, default=10,
+                        help="number of random cases (mode 2)")
+    parser.add_argument("--seed", type=int, default=0,
+                        help="seed of the random cases (mode 2)")
+    options = parser.parse_args(args)
+
+    # Report mode 3: sample cases, compared to the Manhattan distance
+    # (by default, the additive pattern database against it)
+    if options.mode == 3:
+        heuristics = options.heuristics or (2, 6)
+
+        if 2 not in heuristics:
+            heuristics = [2] + list(heuristics)
+
+        report_sample_cases(options.output, heuristics, baseline=2)
+        return
+
+    heuristics = options.heuristics or [1, 2]
+    settings = {
+        "mode": options.mode,
+        "engines": options.engines,
+        "heuristics": heuristics,
+        "repeat": options.repeat,
+        "warmup": options.warmup
+    }
+
+    # Report mode 1: sample cases
+    if options.mode == 1:
+        cases = sample_cases()
 
+    # Report mode 2: seeded random cases
     else:
-        report_mode = int(sys.argv[1])
-        report_file = sys.argv[2]
+        cases = random_cases(options.count, options.seed)
+        settings["count"] = options.count
+        settings["seed"] = options.seed
+
+    results = benchmark(cases, options.engines, heuristics, options.repeat,
+                        options.warmup)
+    write_benchmark(options.output, results, settings)
 
-        # Report mode 1: sample cases
-        if report_mode == 1:
-            report_sample_cases(report_file)
+def compare_main(args):
+    """Runs the `compare` mode with its command-line arguments.
 
-        # TODO: Finish report type 2
-        # Report mode 2: random cases
-        elif report_mode == 2:
-            pass
+    Returns:
+        int: the exit status (1 if any result regressed).
+    """
+    parser = argparse.ArgumentParser(
+        prog="report.py compare",
+        description="Compares benchmark results to baseline results.")
+    parser.add_argument("baseline", help="the baseline JSON file")
+    parser.add_argument("results", help="the JSON file to compare")
+    parser.add_argument("--threshold", type=float,
+                        default=REGRESSION_THRESHOLD,
+                        help="slowdown reported as a regression (0.1 = 10%%)")
+    options = parser.parse_args(args)
+
+    with open(options.baseline) as baseline_file:
+        baseline = json.load(baseline_file)
+    with open(options.results) as results_file:
+        current = json.load(results_file)
+
+    changes = compare_results(baseline, current, options.threshold)
+
+    for change in changes:
+        ratio = change["ratio"]
+        print("depth {:>2} {:<13} h{}  {:>10.3f} ms -> {:>10.3f} ms {:>7}  "
+              "{:>8} -> {:>8} nodes{}".format(
+                  change["depth"], change["engine"], change["heuristic"],
+                  change["baseline_ms"], change["median_ms"],
+                  "({:.2f}x)".format(ratio) if ratio is not None else "",
+                  change["baseline_expansions"], change["expansions"],
+                  "  REGRESSION" if change["regression"] else ""))
+
+    regressions = sum(change["regression"] for change in changes)
+    print("{} of {} results regressed".format(regressions, len(changes)))
+
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__' and sys.argv[1:2] == ["compare"]:
+    sys.exit(compare_main(sys.argv[2:]))
+
+elif __name__ == '__main__':
+    report_main(sys.argv[1:])
@@ -0,0 +1,304 @@
+"""service.py -- Asyncio solving service
+
+The service keeps the event loop free by solving puzzles in a pool of worker
+processes. Concurrent requests for the same puzzle share a single solve, every
+request can have a deadline, and the number of puzzles being solved is
+bounded (new puzzles are turned away while the service is full).
+
+It answers JSON lines over TCP: every request line is an object like
+
+    {"id": 1, "puzzle": "125340678", "deadline": 2.0}
+
+and is answered (in the order solves complete) by the result of
+`batch.solve_state`, with the same id:
+
+    {"id": 1, "status": "solved", "moves": [...], "depth": 3, ...}
+
+The status can also be "busy" (too many puzzles in flight), "timeout" (the
+deadline passed), "limit" (the search reached its node limits), "invalid"
+(the request could not be read, or its deadline is not a positive number) or
+"error" (the worker failed).
+
+Deadlines are capped at MAX_DEADLINE seconds. They also stop the search in
+the worker: a solve may run until the deadline of the request that started
+it, and never longer than the time limit of the service. Searches are also
+bounded in nodes, so a hard puzzle cannot hold a worker or its memory
+forever.
+
+    python service.py [port] [workers] [--timeout SECONDS]
+                      [--max-expansions N] [--max-frontier N]
+
+Author: Álex Filipe Santos
+Date: 19 July 2020
+"""
+import json
+import time
+import asyncio
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from batch import solve_state
+from heuristics import HEURISTICS
+from solve_puzzle import line_to_puzzle
+
+# Default port of the service.
+DEFAULT_PORT = 8815
+
+# Default largest number of distinct puzzles being solved at once.
+DEFAULT_MAX_PENDING = 256
+
+# Default limits of every search: seconds, nodes expanded and nodes in the
+# frontier (the 3x3 puzzles have 181440 states, far below them).
+DEFAULT_SOLVE_TIMEOUT = 10.0
+DEFAULT_MAX_EXPANSIONS = 1000000
+DEFAULT_MAX_FRONTIER = 1000000
+
+# Longest deadline of a request, in seconds (longer ones are capped).
+MAX_DEADLINE = 60.0
+
+
+def _status(status):
+    """Returns a result with no solution."""
+    return {"status": status, "moves": None, "depth": None, "cost": None,
+            "time": 0.0}
+
+def _solve_until(state, width, heuristic, end_time, max_expansions,
+                 max_frontier):
+    """Solves a packed state in a worker, stopping the search at a wall-clock
+    time (see `batch.solve_state`). The time the puzzle waited for a worker
+    counts, so a puzzle that waited past it is not searched at all."""
+    remaining = end_time - time.time()
+
+    if remaining <= 0:
+        return _status("timeout")
+
+    return solve_state(state, width, heuristic, remaining, max_expansions,
+                       max_frontier)
+
+
+class SolverService:
+    """Solves puzzles in worker processes for asyncio clients.
+    """
+    def __init__(self, heuristic=2, workers=None,
+                 max_pending=DEFAULT_MAX_PENDING,
+                 solve_timeout=DEFAULT_SOLVE_TIMEOUT,
+                 max_expansions=DEFAULT_MAX_EXPANSIONS,
+                 max_frontier=DEFAULT_MAX_FRONTIER):
+        if heuristic not in HEURISTICS:
+            raise ValueError("Unknown heuristic: {}".format(heuristic))
+
+        # Search heuristic used for every puzzle
+        self.heuristic = heuristic
+
+        # Worker processes (replaced if one of them dies)
+        self.workers = workers
+        self.executor = ProcessPoolExecutor(max_workers=workers)
+
+        # Largest number of distinct puzzles being solved at once
+        self.max_pending = max_pending
+
+        # Seconds a worker may spend on a puzzle (None for no limit, but for
+        # the deadline of the request), so that abandoned puzzles do not hold
+        # workers forever
+        self.solve_timeout = solve_timeout
+
+        # Nodes a search may expand and hold in its frontier (None for no
+        # limit), so that a hard puzzle cannot take all the memory of a worker
+        self.max_expansions = max_expansions
+        self.max_frontier = max_frontier
+
+        # Solves in flight and the executor solving them, by puzzle string
+        self.pending = {}
+
+        # Number of requests answered by a solve already in flight, and of
+        # times the worker processes were replaced
+        self.coalesced = 0
+        self.restarts = 0
+
+
+    async def solve(self, puzzle, deadline=None):
+        """Solves a puzzle, sharing the solve with concurrent requests for
+        the same puzzle.
+
+        Args:
+            puzzle (obj:`Puzzle`): the puzzle.
+            deadline (float): seconds the caller waits for the result (None
+                for no limit). The search stops once the deadline of the
+                request that started it passes.
+        Returns:
+            dict: the result (see `batch.solve_state`).
+        """
+        key = puzzle.string
+
+        if key in self.pending:
+            future, executor = self.pending[key]
+            self.coalesced += 1
+
+        elif len(self.pending) >= self.max_pending:
+            return _status("busy")
+
+        else:
+            loop = asyncio.get_running_loop()
+            executor = self.executor
+            limits = [limit for limit in (deadline, self.solve_timeout)
+                      if limit is not None]
+            end_time = time.time() + min(limits, default=float("inf"))
+
+            try:
+                future = loop.run_in_executor(
+                    executor, _solve_until, puzzle.state, puzzle.width,
+                    self.heuristic, end_time, self.max_expansions,
+                    self.max_frontier)
+
+            # The worker processes are gone
+            except Exception as exception:
+                self._replace_broken_pool(exception, executor)
+                return _status("error")
+
+            self.pending[key] = future, executor
+            future.add_done_callback(lambda done: self._forget(key, done))
+
+        try:
+            # Shielded, so that a request giving up does not cancel the
+            # solve for the other requests
+            result = await asyncio.wait_for(asyncio.shield(future), deadline)
+
+        except asyncio.TimeoutError:
+            return _status("timeout")
+
+        # The worker failed
+        except Exception as exception:
+            if future.done():
+                self._forget(key, future)
+                self._replace_broken_pool(exception, executor)
+            return _status("error")
+
+        return dict(result)
+
+    def _forget(self, key, future):
+        """Removes a solve from the solves in flight, unless another solve of
+        the same puzzle replaced it."""
+        if self.pending.get(key, (None,))[0] is future:
+            del self.pending[key]
+
+    def _replace_broken_pool(self, exception, executor):
+        """Starts new worker processes if a worker of an executor died (once,
+        even if several requests saw it die)."""
+        if isinstance(exception, BrokenProcessPool) and \
+                executor is self.executor:
+            executor.shutdown(wait=False)
+            self.executor = ProcessPoolExecutor(max_workers=self.workers)
+            self.restarts += 1
+
+    def close(self):
+        """Shuts the worker processes down."""
+        self.executor.shutdown(wait=False)
+
+
+    async def handle_request(self, line):
+        """Answers a request line.
+
+        Returns:
+            dict: the response.
+        """
+        try:
+            request = json.loads(line)
+            puzzle = line_to_puzzle(str(request["puzzle"]))
+            deadline = request.get("deadline")
+
+        except (ValueError, KeyError, TypeError, AttributeError):
+            return _status("invalid")
+
+        valid_deadline = deadline is None or (
+            isinstance(deadline, (int, float)) and
+            not isinstance(deadline, bool) and deadline > 0)
+
+        if puzzle is None or not valid_deadline:
+            response = _status("invalid")
+        else:
+            if deadline is not None:
+                deadline = float(min(deadline, MAX_DEADLINE))
+
+            response = await self.solve(puzzle, deadline)
+
+        response["id"] = request.get("id")
+        return response
+
+    async def handle_client(self, reader, writer):
+        """Answers the requests of a connection, solving them concurrently.
+        """
+        tasks = set()
+
+        async def answer(line):
+            response = await self.handle_request(line)
+            writer.write((json.dumps(response) + "\n").encode())
+            await writer.drain()
+
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+
+                # A line over the limit of the stream: the rest of the
+                # connection cannot be read
+                except (ValueError, asyncio.LimitOverrunError):
+                    writer.write((json.dumps(_status("invalid")) + "\n")
+                                 .encode())
+                    break
+
+                if not line:
+                    break
+
+                task = asyncio.ensure_future(answer(line))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+
+            if tasks:
+                await asyncio.wait(tasks)
+
+        # The client went away, or the server is shutting down
+        except (ConnectionError, asyncio.CancelledError):
+            pass
+
+        finally:
+            writer.close()
+
+    async def serve(self, host="127.0.0.1", port=DEFAULT_PORT):
+        """Starts the TCP server.
+
+        Returns:
+            obj:`asyncio.Server`: the server.
+        """
+        return await asyncio.start_server(self.handle_client, host, port)
+
+
+async def _main(options):
+    service = SolverService(workers=options.workers,
+                            solve_timeout=options.timeout,
+                            max_expansions=options.max_expansions,
+                            max_frontier=options.max_frontier)
+    server = await service.serve(port=options.port)
+    print("Solving service listening on port {}".format(options.port))
+
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        service.close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        prog="service.py", description="Runs the solving service.")
+    parser.add_argument("port", nargs="?", type=int, default=DEFAULT_PORT)
+    parser.add_argument("workers", nargs="?", type=int, default=None)
+    parser.add_argument("--timeout", type=float,
+                        default=DEFAULT_SOLVE_TIMEOUT,
+                        help="seconds a worker may spend on a puzzle")
+    parser.add_argument("--max-expansions", type=int,
+                        default=DEFAULT_MAX_EXPANSIONS,
+                        help="nodes a search may expand")
+    parser.add_argument("--max-frontier", type=int,
+                        default=DEFAULT_MAX_FRONTIER,
+                        help="nodes a search may hold in its frontier")
+    asyncio.run(_main(parser.parse_args()))
@@ -1,13 +1,26 @@
 """solve_puzzle.py -- Command-line interface for 8-puzzle solving.
 
+Without arguments, the solver runs interactively. With the `stream` command,
+it reads puzzles one per line (from a file or the standard input) and writes
+one JSON result per line as puzzles are solved:
+
+    python solve_puzzle.py stream [input-file] [--heuristic N] [--workers N]
+                                  [--ordered] [--timeout SECONDS]
+
 Author: Álex Filipe Santos
 Date: 19 July 2020
 """
-import re
+import sys
+import json
+import math
 import time
-from random import shuffle
-from puzzle import Puzzle, NotSolvableException
+import argparse
+from random import shuffle, getrandbits
+from puzzle import Puzzle, NotSolvableException, tiles_to_str
 from solver import PuzzleSolver
+from heuristics import HEURISTICS, describe_heuristic
+from batch import solve_stream
+from generator import fix_parity, generate_puzzles
 
 
 def generate_random_puzzle():
@@ -22,29 +35,124 @@ def generate_random_puzzle():
     return Puzzle(puzzle_str=puzzle_str)
 
 def generate_solvable_puzzle():
-    """Generates a solvable random puzzle.
+    """Generates a solvable random puzzle (a random puzzle, made solvable by
+    swapping two tiles if needed; see `generator.py`).
 
     Returns:
         obj:`Puzzle`: a solvable puzzle.
     """
-    puzzle = generate_random_puzzle()
-
-    while not puzzle.is_solvable():
-        puzzle = generate_random_puzzle()
-
-    return puzzle
+    tiles = list(range(9))
+    shuffle(tiles)
+    return Puzzle(puzzle_str=tiles_to_str(fix_parity(tiles)))
+
+def generate_solvable_puzzles(count, width=3):
+    """Generates many solvable random puzzles (see `generator.py`). The
+    generator is seeded from the `random` module, so `random.seed` makes the
+    puzzles reproducible.
+
+    Args:
+        count (int): the number of puzzles.
+        width (int): the width of the puzzles.
+    Returns:
+        list of obj:`Puzzle`: the solvable puzzles.
+    """
+    return generate_puzzles(count, width, seed=getrandbits(64))
 
 def input_to_puzzle(input_str):
     """Transforms an input string from the CLI into a Puzzle object.
 
+    Each row is either typed as single characters ("123") or as numbers
+    separated by spaces ("1 2 3", needed for tiles over 9 on larger boards).
+
     Returns:
         obj:`Puzzle`: a puzzle
     """
-    input_str = re.sub(r"[ \n]+", "", input_str)
-    return Puzzle(puzzle_str=input_str)
+    tiles = []
+    for row in input_str.splitlines():
+        tiles += _row_tiles(row)
 
+    return Puzzle(puzzle_str=tiles_to_str(tiles))
 
-if __name__ == '__main__':
+def _row_tiles(row_str):
+    """Returns the tiles of a row typed in the CLI."""
+    tokens = row_str.split()
+
+    if len(tokens) == 1:
+        return [int(char, 36) for char in tokens[0]]
+
+    return [int(token) for token in tokens]
+
+def line_to_puzzle(line):
+    """Reads a puzzle written in a single line ("123456780", or the numbers
+    of the tiles separated by spaces).
+
+    Returns:
+        obj:`Puzzle`: the puzzle, or None if the line is not a valid puzzle.
+    """
+    try:
+        tiles = _row_tiles(line)
+        width = math.isqrt(len(tiles))
+
+        # At least a 2x2 square board, with every tile once
+        if width < 2 or width * width != len(tiles) or \
+                sorted(tiles) != list(range(len(tiles))):
+            return None
+
+        return Puzzle(puzzle_str=tiles_to_str(tiles))
+
+    except ValueError:
+        return None
+
+def stream_puzzles(input_file, output_file, heuristic=2, workers=None,
+                   ordered=False, timeout=None):
+    """Solves the puzzles of a text stream, one per line, writing one JSON
+    result per line as they are solved (see `batch.solve_stream`).
+
+    Args:
+        input_file (file): the stream of puzzles.
+        output_file (file): the stream the results are written to.
+        heuristic (int): the search heuristic to use.
+        workers (int): the number of worker processes.
+        ordered (bool): whether to write the results in the input order.
+        timeout (float): seconds allowed for each puzzle.
+    """
+    puzzles = (line_to_puzzle(line) for line in input_file)
+
+    for result in solve_stream(puzzles, heuristic, workers=workers,
+                               ordered=ordered, timeout=timeout):
+        output_file.write(json.dumps(result) + "\n")
+        output_file.flush()
+
+def stream_main(args):
+    """Runs the `stream` command with its command-line arguments."""
+    parser = argparse.ArgumentParser(
+        prog="solve_puzzle.py stream",
+        description="Solves puzzles read one per line, writing JSON lines.")
+    parser.add_argument("input", nargs="?", default="-",
+                        help="file of puzzles (standard input by default)")
+    parser.add_argument("--heuristic", type=int, default=2,
+                        choices=sorted(HEURISTICS))
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--ordered", action="store_true",
+                        help="write the results in the input order")
+    parser.add_argument("--timeout", type=float, default=None,
+                        help="seconds allowed for each puzzle")
+    options = parser.parse_args(args)
+
+    if options.input == "-":
+        input_file = sys.stdin
+    else:
+        input_file = open(options.input)
+
+    with input_file:
+        stream_puzzles(input_file, sys.stdout, options.heuristic,
+                       options.workers, options.ordered, options.timeout)
+
+
+if __name__ == '__main__' and sys.argv[1:2] == ["stream"]:
+    stream_main(sys.argv[2:])
+
+elif __name__ == '__main__':
     print("CS 4200 Project 1")
     print("8-Puzzle Solver")
 
@@ -71,11 +179,13 @@ if __name__ == '__main__':
 
         # Input Puzzle
         elif input_mode == 2:
-            print("\nType in your puzzle in 3 lines:")
+            print("\nType in your puzzle, one row per line "
+                  "(e.g. 3 lines for the 8-puzzle):")
 
-            puzzle_input = ""
-            for _ in range(3):
-                puzzle_input += input()
+            # The first row gives the width of the board
+            puzzle_input = input()
+            for _ in range(len(_row_tiles(puzzle_input)) - 1):
+                puzzle_input += "\n" + input()
 
             puzzle = input_to_puzzle(puzzle_input)
 
@@ -93,12 +203,12 @@ if __name__ == '__main__':
 
         # Select type of heuristic
         print("\nSelect heuristic to solve:")
-        print("[1] h1 = Number of Misplaced Tiles")
-        print("[2] h2 = Manhattan Distance")
+        for number in HEURISTICS:
+            print("[{}] {} = {}".format(number, *describe_heuristic(number)))
 
         heuristic = int(input())
 
-        if heuristic not in [1, 2]:
+        if heuristic not in HEURISTICS:
             print("Invalid option")
             continue
 
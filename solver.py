@@ -3,23 +3,71 @@
 Author: Álex Filipe Santos
 Date: 19 July 2020
 """
-from queue import PriorityQueue
-from copy import deepcopy
-from puzzle import Puzzle, NotSolvableException
+import math
+import time
+from puzzle import Puzzle, SolutionSteps, NotSolvableException
+from state import INVERSE_MOVE, zero_index, encode_moves
+from heuristics import get_heuristic
+from frontier import FRONTIERS, make_frontier
+from stats import SearchStats
 
 # Standard cost of reaching a new node.
 STANDARD_COST = 1
 
+# Decreasing weights of the anytime search; the last one (1) makes the final
+# solution optimal.
+ANYTIME_WEIGHTS = (3, 2, 1.5, 1.25, 1)
+
+# Number of expansions between checks of the search time and frontier size.
+LIMIT_CHECK_INTERVAL = 256
+
+# Debug mode: when True, every incrementally updated heuristic is checked
+# against a full recomputation.
+CHECK_HEURISTICS = False
+
+class SearchLimitExceeded(Exception):
+    """Search stopped by one of its limits (see `PuzzleSolver`).
+
+    Attributes:
+        limit (str): the limit reached ("max_expansions", "max_seconds" or
+            "max_frontier").
+        stats (dict): statistics of the search so far.
+    """
+    def __init__(self, limit, stats):
+        super().__init__(limit, stats)
+        self.limit = limit
+        self.stats = stats
+
+    def __str__(self):
+        return "Search stopped by its {} limit after {} expansions".format(
+            self.limit, self.stats["expansions"])
+
+
 class PuzzleNode:
     """Represents a node in the search graph.
+
+    Nodes only keep the packed state of the puzzle (see `state.py`) and the
+    move that reached it; the `puzzle` property builds a `Puzzle` view on
+    demand.
     """
+    __slots__ = ("board", "state", "zero", "move", "parent", "cost",
+                 "cumulative_cost", "heuristic", "h", "evaluation")
+
     def __init__(self,
                  puzzle,
                  parent=None,
                  cost=0,
                  cumulative_cost=0,
                  heuristic=1):
-        self.puzzle = puzzle
+        # Board of the puzzle (see `state.py`)
+        self.board = puzzle.board
+
+        # Packed state of the puzzle and index of its empty tile.
+        self.state = puzzle.state
+        self.zero = zero_index(self.state, self.board)
+
+        # The last move made to reach this node.
+        self.move = puzzle.last_move
 
         # Pointer to the parent puzzle.
         self.parent = parent
@@ -30,11 +78,14 @@ class PuzzleNode:
         # Cumulative cost of reaching this node
         self.cumulative_cost = cumulative_cost
 
-        # Type of heuristic used for this node
-        self.heuristic = heuristic
+        # Heuristic used for this node (see `heuristics.py`)
+        self.heuristic = get_heuristic(heuristic, self.board)
+
+        # Heuristic value of the node (children update it incrementally)
+        self.h = self.heuristic.evaluate(self.state)
 
         # Evaluation function result for the node
-        self.evaluation = self._evaluation(heuristic)
+        self.evaluation = self._evaluation()
 
 
     # These comparison operators compare different evaluations (considering path
@@ -53,66 +104,162 @@ class PuzzleNode:
         return self.evaluation > other.evaluation
 
 
-    def next_moves(self):
+    @property
+    def puzzle(self):
+        """obj:`Puzzle`: a view of the puzzle state of this node."""
+        return Puzzle.from_state(self.state, last_move=self.move,
+                                 width=self.board.width)
+
+    def is_solved(self):
+        """Returns True if this node holds the puzzle goal.
+        """
+        return self.state == self.board.goal_state
+
+    def next_moves(self, weight=1):
         """Expands the current node, returning a list of next possible moves.
 
+        Args:
+            weight (float): the weight of the heuristic in the evaluation of
+                the children (f = g + weight * h).
         Returns:
-            list of obj:`Puzzle`: a list of all next state puzzles that have
+            list of obj:`PuzzleNode`: a list of all next state nodes that have
                 allowed moves.
         """
-        possible_moves = self.puzzle.allowed_moves
         nodes = []
-
-        for move in possible_moves:
-            child_puzzle = deepcopy(self.puzzle)
-            child_puzzle.move(move)
-
-            cumulative_cost = self.cumulative_cost + STANDARD_COST
-
-            child_node = PuzzleNode(child_puzzle,
-                                    parent=self,
-                                    cost=STANDARD_COST,
-                                    cumulative_cost=cumulative_cost,
-                                    heuristic=self.heuristic)
+        board = self.board
+        shifts = board.shifts
+        tile_mask = board.tile_mask
+        state = self.state
+        zero = self.zero
+        zero_shift = shifts[zero]
+        cumulative_cost = self.cumulative_cost + STANDARD_COST
+        heuristic = self.heuristic
+        table = heuristic.table
+
+        for move, target in board.move_table[zero]:
+            # Slide the tile at target into the empty space.
+            shift = shifts[target]
+            tile = (state >> shift) & tile_mask
+            child_state = state + (tile << zero_shift) - (tile << shift)
+
+            if table is not None:
+                # Only the moved tile changes place, so only its cost changes
+                tile_costs = table[tile]
+                h = self.h + tile_costs[zero] - tile_costs[target]
+            else:
+                h = heuristic.update(self.h, state, child_state,
+                                     tile, zero, target)
+
+            # Children bypass __init__, as there is no Puzzle to unpack.
+            child_node = PuzzleNode.__new__(PuzzleNode)
+            child_node.board = board
+            child_node.state = child_state
+            child_node.zero = target
+            child_node.move = move
+            child_node.parent = self
+            child_node.cost = STANDARD_COST
+            child_node.cumulative_cost = cumulative_cost
+            child_node.heuristic = heuristic
+            child_node.h = h
+            child_node.evaluation = cumulative_cost + weight * h
+
+            if CHECK_HEURISTICS:
+                child_node._check_heuristic()
 
             nodes.append(child_node)
 
         return nodes
 
-    def _evaluation(self, heuristic=1):
-        """Evaluation function for the node.
-
-        Args:
-            heuristic (int): The search heuristic to use.
-                1 = represents the misplaced tiles heuristic
-                2 = represents the Manhattan distance heuristic
+    def _evaluation(self):
+        """Evaluation function for the node (path cost plus heuristic value).
 
         Returns:
             int: the search heuristic result.
         """
-        h = 0
+        return self.cumulative_cost + self.h
 
-        # Misplaced heuristic
-        if heuristic == 1:
-            h = self.puzzle.misplaced_heuristic()
+    def _check_heuristic(self):
+        """Checks the heuristic value of the node against a full
+        recomputation (debug mode).
+        """
+        h = self.heuristic.evaluate(self.state)
 
-        # Manhattan heuristic
-        elif heuristic == 2:
-            h = self.puzzle.manhattan_heuristic()
+        if h != self.h:
+            raise AssertionError(
+                "Heuristic {} mismatch for {}: incremental {}, expected {}"
+                .format(self.heuristic.name, self.puzzle.string, self.h, h))
 
-        return self.cumulative_cost + h
+
+def _check_weight(weight):
+    """Raises ValueError unless a weight of the heuristic is a finite number
+    of at least 1 (the bound on the suboptimality of the solutions)."""
+    if not math.isfinite(weight) or weight < 1:
+        raise ValueError("The weight of the heuristic must be a finite number "
+                         "of at least 1")
 
 
 class PuzzleSolver:
     """Represents a puzzle tree with informed search method to find the goal.
     """
-    def __init__(self, puzzle, heuristic=1):
+    def __init__(self, puzzle, heuristic=1, frontier="heap",
+                 bidirectional=False, weight=1, max_expansions=None,
+                 max_seconds=None, max_frontier=None, hooks=None):
         if not puzzle.is_solvable():
             raise NotSolvableException("The puzzle provided is not solvable.")
 
+        if frontier not in FRONTIERS:
+            raise ValueError("Unknown frontier: {}".format(frontier))
+
+        _check_weight(weight)
+
+        if weight != int(weight) and frontier == "bucket":
+            raise ValueError("The bucket frontier needs an integer weight")
+
+        # Whole weights keep the evaluations integers (e.g. 2.0 is 2)
+        if weight == int(weight):
+            weight = int(weight)
+
+        if weight != 1 and bidirectional:
+            raise ValueError("The bidirectional search cannot be weighted")
+
+        for limit in (max_expansions, max_seconds, max_frontier):
+            if limit is not None and limit <= 0:
+                raise ValueError("Search limits must be positive")
+
         # Initial state of the puzzle
         self.tree_root = PuzzleNode(puzzle, heuristic=heuristic)
 
+        # Weight of the heuristic in the evaluation (f = g + weight * h).
+        # Weighted solutions cost at most weight times the optimal cost.
+        self.weight = weight
+        self.tree_root.evaluation = weight * self.tree_root.h
+
+        # Name of the open list implementation (see `frontier.py`)
+        self.frontier = frontier
+
+        # Whether to search from both the initial state and the goal
+        self.bidirectional = bidirectional
+
+        # Number of duplicate nodes suppressed in the last search
+        self.duplicates = 0
+
+        # Limits of the search (None for no limit): nodes expanded, seconds
+        # spent and nodes in the frontier. Past them, the search raises
+        # `SearchLimitExceeded`. The time and the frontier size are only
+        # checked every LIMIT_CHECK_INTERVAL expansions.
+        self.max_expansions = max_expansions
+        self.max_seconds = max_seconds
+        self.max_frontier = max_frontier
+
+        # Hooks of the searches (see `stats.py`), or None
+        self.hooks = hooks
+        if hooks is not None:
+            self.tree_root.heuristic = hooks.wrap_heuristic(
+                self.tree_root.heuristic)
+
+        # Statistics of the last search
+        self.stats = SearchStats()
+
 
     def find_solution(self):
         """Returns a list of steps to reach the solution, including some
@@ -120,67 +267,514 @@ class PuzzleSolver:
         expansions needed).
 
         Returns:
-            dict: statistics
+            dict: the steps of the solution (a lazy sequence of `Puzzle`
+                views, see `SolutionSteps`), its moves as a byte string and
+                statistics (including the number of duplicate nodes that were
+                not added to the frontier, and the `SearchStats` of the
+                search)
         """
-        steps = []
-        solution, cost = self.search_solution()
+        backward = None
+
+        if self.bidirectional:
+            solution, backward, cost = self.search_bidirectional()
+        else:
+            solution, cost = self.search_solution()
 
         if solution is None:
             raise NotSolvableException("Failed to find a solution.")
 
-        # Finds all previous node states.
-        node = solution
-        while node is not None:
-            steps.append(node.puzzle)
-            node = node.parent
-
-        steps.reverse()
+        steps = self._steps(solution, backward)
 
         return {
             "steps": steps,
+            "moves": steps.moves,
             "depth": len(steps) - 1,
-            "cost": cost
+            "cost": cost,
+            "duplicates": self.duplicates,
+            "stats": self.stats
         }
 
+    def _steps(self, solution, backward=None):
+        """Returns the steps from the initial state to the goal, through a
+        solution node (and a node of the backward search, if bidirectional).
+
+        Returns:
+            obj:`SolutionSteps`: the steps, built from the moves on demand.
+        """
+        moves = []
+
+        # Finds all previous moves.
+        node = solution
+        while node.parent is not None:
+            moves.append(node.move)
+            node = node.parent
+
+        moves.reverse()
+
+        # Finds all next moves of the backward search. Backward moves went
+        # from the goal toward this node, so they are reversed.
+        node = backward
+        while node is not None and node.parent is not None:
+            moves.append(INVERSE_MOVE[node.move])
+            node = node.parent
+
+        root = self.tree_root
+        return SolutionSteps(root.state, encode_moves(moves), root.board.width)
+
+    def _make_frontier(self):
+        """Returns an empty frontier for a search (wrapped by the hooks)."""
+        frontier = make_frontier(self.frontier)
+
+        if self.hooks is not None:
+            frontier = self.hooks.wrap_frontier(frontier)
+
+        return frontier
+
+    def _finish_search(self, expansions, search_cost, explored, start_time,
+                       peak_frontier):
+        """Records the statistics of the last search and passes them to the
+        hooks."""
+        stats = SearchStats()
+        stats.expanded = expansions
+        stats.generated = search_cost
+        stats.duplicates = self.duplicates
+        stats.peak_frontier = peak_frontier
+        stats.peak_explored = explored
+        stats.time = time.perf_counter() - start_time
+        self.stats = stats
+
+        if self.hooks is not None:
+            self.hooks.search_finished(stats)
+
+    @staticmethod
+    def _peak(peaks, frontiers):
+        """Returns the sum of the largest sizes of the frontiers of a
+        bidirectional search, counting the nodes pushed since their last
+        pop."""
+        return sum(max(peak, len(frontier))
+                   for peak, frontier in zip(peaks, frontiers))
+
+    def _next_check(self, expansions):
+        """Returns the number of expansions at which the limits of the search
+        are checked next."""
+        if self.max_expansions is None and self.max_seconds is None and \
+                self.max_frontier is None:
+            return float("inf")
+
+        check = expansions + LIMIT_CHECK_INTERVAL
+
+        if self.max_expansions is not None and self.max_expansions < check:
+            return self.max_expansions
+
+        return check
+
+    def _check_limits(self, expansions, start_time, frontier_size):
+        """Returns the first limit reached by the search, or None."""
+        if self.max_expansions is not None and \
+                expansions >= self.max_expansions:
+            return "max_expansions"
+
+        if self.max_seconds is not None and \
+                time.perf_counter() - start_time >= self.max_seconds:
+            return "max_seconds"
+
+        if self.max_frontier is not None and \
+                frontier_size >= self.max_frontier:
+            return "max_frontier"
+
+        return None
+
 
     def search_solution(self):
-        """Runs the A* search algorithm to find a solution.
+        """Runs the A* search algorithm to find a solution (weighted A* if the
+        weight is over 1).
 
         Returns:
             obj:`PuzzleNode`: the node representing the solution in the tree.
             int: the total cost to reach the solution.
+        Raises:
+            SearchLimitExceeded: when a limit of the search is reached. Its
+                statistics include the lowest evaluation in the frontier
+                (divided by the weight), a lower bound on the solution depth.
         """
 
         # Priority queue of best cost nodes
-        frontier = PriorityQueue()
+        frontier = self._make_frontier()
 
-        # Set of strings to remember if state was explored or not
-        explored = set()
+        # Best known cost of reaching each packed state (explored or still in
+        # the frontier)
+        best_cost = {self.tree_root.state: 0}
 
         # Put the root in the priority queue
-        # The PuzzleNode class implements heuristic comparison with Python
-        # rich comparison operators.
-        frontier.put(self.tree_root)
+        frontier.push(self.tree_root)
 
-        # Number of nodes generated
+        # Number of nodes generated and expanded
         search_cost = 1
+        expansions = 0
+        self.duplicates = 0
 
-        while not frontier.empty():
-            next_node = frontier.get()
+        # Largest number of nodes in the frontier (it only grows between
+        # pops, so its size before every pop is enough)
+        peak_frontier = 1
 
-            if next_node.puzzle.is_solved():
-                return next_node, search_cost
+        # Limits are checked once this many nodes are expanded
+        next_check = self._next_check(0)
+        start_time = time.perf_counter()
+
+        # Nodes in the frontier, counted here rather than asking the frontier
+        frontier_size = 1
 
-            explored.add(next_node.puzzle.string)
+        while frontier_size:
+            if frontier_size > peak_frontier:
+                peak_frontier = frontier_size
 
-            moves = next_node.next_moves()
+            next_node = frontier.pop()
+            frontier_size -= 1
+
+            # Stale entry: the state was reached again with a lower cost after
+            # this node was added, so it is skipped.
+            if next_node.cumulative_cost > best_cost[next_node.state]:
+                continue
+
+            if next_node.is_solved():
+                self._finish_search(expansions, search_cost, len(best_cost),
+                                    start_time, peak_frontier)
+                return next_node, search_cost
+
+            # The node just popped has the lowest evaluation of the frontier
+            if expansions >= next_check:
+                limit = self._check_limits(expansions, start_time,
+                                           frontier_size + 1)
+                if limit is not None:
+                    self._finish_search(expansions, search_cost,
+                                        len(best_cost), start_time,
+                                        peak_frontier)
+                    raise SearchLimitExceeded(limit, {
+                        "expansions": expansions,
+                        "cost": search_cost,
+                        "duplicates": self.duplicates,
+                        "frontier": frontier_size + 1,
+                        "explored": len(best_cost),
+                        "time": time.perf_counter() - start_time,
+                        "f_bound": next_node.evaluation / self.weight
+                    })
+                next_check = self._next_check(expansions)
+
+            expansions += 1
+            moves = next_node.next_moves(self.weight)
 
             for moved_node in moves:
-                # Add node to the frontier
-                if moved_node.puzzle.string not in explored:
-                    frontier.put(moved_node)
+                # Add node to the frontier, unless the state is already known
+                # with a lower or equal cost. A state reached with a lower
+                # cost is reopened.
+                state = moved_node.state
+                if moved_node.cumulative_cost < best_cost.get(state,
+                                                              float("inf")):
+                    best_cost[state] = moved_node.cumulative_cost
+                    frontier.push(moved_node)
+                    frontier_size += 1
                     search_cost += 1
+                else:
+                    self.duplicates += 1
 
         # Failed to find a solution
-        if frontier.empty():
-            return None, search_cost
+        self._finish_search(expansions, search_cost, len(best_cost),
+                            start_time, peak_frontier)
+        return None, search_cost
+
+
+    def search_bidirectional(self):
+        """Runs a front-to-end bidirectional A* search, from the initial
+        state toward the goal and from the goal toward the initial state.
+
+        The search stops once the best path found through a state reached by
+        both searches costs no more than the lowest evaluation in either
+        frontier, so the solution is still optimal.
+
+        Returns:
+            obj:`PuzzleNode`: the node of the forward search where the
+                searches met.
+            obj:`PuzzleNode`: the node of the backward search where the
+                searches met.
+            int: the total cost to reach the solution (nodes generated by
+                both searches).
+        Raises:
+            SearchLimitExceeded: when a limit of the search is reached (see
+                `search_solution`).
+        """
+        start_time = time.perf_counter()
+        root = self.tree_root
+        goal = PuzzleNode(Puzzle.goal(root.board.width),
+                          heuristic=root.heuristic.toward(root.state))
+
+        if root.is_solved():
+            self.duplicates = 0
+            self._finish_search(0, 1, 1, start_time, 1)
+            return root, goal, 1
+
+        # Forward (0) and backward (1) frontiers
+        frontiers = [self._make_frontier(), self._make_frontier()]
+        frontiers[0].push(root)
+        frontiers[1].push(goal)
+
+        # Best known node of each packed state, for each search
+        reached = [{root.state: root}, {goal.state: goal}]
+
+        # Number of nodes generated and expanded
+        search_cost = 2
+        expansions = 0
+        self.duplicates = 0
+
+        # Largest number of nodes in each frontier
+        peaks = [1, 1]
+
+        # Limits are checked once this many nodes are expanded
+        next_check = self._next_check(0)
+
+        # Cost of the best path found, through the meeting nodes
+        best_cost = float("inf")
+        meeting = None, None
+
+        while frontiers[0] and frontiers[1]:
+            # Lower bound on the cost of a path not found yet
+            f_bound = max(frontiers[0].min_evaluation(),
+                          frontiers[1].min_evaluation())
+
+            if best_cost <= f_bound:
+                break
+
+            if expansions >= next_check:
+                frontier_size = len(frontiers[0]) + len(frontiers[1])
+                limit = self._check_limits(expansions, start_time,
+                                           frontier_size)
+                if limit is not None:
+                    self._finish_search(expansions, search_cost,
+                                        len(reached[0]) + len(reached[1]),
+                                        start_time, self._peak(peaks,
+                                                               frontiers))
+                    raise SearchLimitExceeded(limit, {
+                        "expansions": expansions,
+                        "cost": search_cost,
+                        "duplicates": self.duplicates,
+                        "frontier": frontier_size,
+                        "explored": len(reached[0]) + len(reached[1]),
+                        "time": time.perf_counter() - start_time,
+                        "f_bound": f_bound
+                    })
+                next_check = self._next_check(expansions)
+
+            # Expand the search with the smaller frontier
+            side = 0 if len(frontiers[0]) <= len(frontiers[1]) else 1
+            frontier_size = len(frontiers[side])
+            if frontier_size > peaks[side]:
+                peaks[side] = frontier_size
+
+            next_node = frontiers[side].pop()
+
+            # Stale entry
+            if reached[side][next_node.state] is not next_node:
+                continue
+
+            expansions += 1
+
+            for moved_node in next_node.next_moves():
+                state = moved_node.state
+                known = reached[side].get(state)
+
+                if known is not None and \
+                        known.cumulative_cost <= moved_node.cumulative_cost:
+                    self.duplicates += 1
+                    continue
+
+                reached[side][state] = moved_node
+                frontiers[side].push(moved_node)
+                search_cost += 1
+
+                # Path through a state reached by the other search
+                other = reached[1 - side].get(state)
+                if other is not None and \
+                        moved_node.cumulative_cost + other.cumulative_cost \
+                        < best_cost:
+                    best_cost = moved_node.cumulative_cost + \
+                        other.cumulative_cost
+                    meeting = (moved_node, other) if side == 0 \
+                        else (other, moved_node)
+
+        self._finish_search(expansions, search_cost,
+                            len(reached[0]) + len(reached[1]), start_time,
+                            self._peak(peaks, frontiers))
+        forward, backward = meeting
+        return forward, backward, search_cost
+
+
+    def anytime_solutions(self, weights=ANYTIME_WEIGHTS):
+        """Runs an anytime repairing A* (ARA*) search, yielding a solution for
+        every weight, each at least as good as the previous one, until the
+        solution is proven optimal. Callers can stop whenever they are out of
+        time and keep the last solution.
+
+        Every search reuses the nodes of the previous one: the states whose
+        cost improved after they were expanded are kept aside and searched
+        again with the next (lower) weight, instead of being expanded twice
+        with the same weight.
+
+        The search uses the frontier, limits and hooks of the solver. Limits
+        apply to the whole run, and every weight is a search for the hooks
+        and the statistics.
+
+        Args:
+            weights (list of float): decreasing weights of the heuristic
+                (whole numbers with the bucket frontier).
+        Yields:
+            dict: the solution, as returned by `find_solution`, with the
+                weight of the search, the bound on its suboptimality (its cost
+                is at most bound times the optimal cost) and the number of
+                nodes expanded to find it.
+        Raises:
+            SearchLimitExceeded: when a limit of the search is reached (see
+                `search_solution`), even if solutions were already yielded.
+        """
+        if self.bidirectional:
+            raise ValueError("The anytime search cannot be bidirectional")
+
+        if not weights:
+            raise ValueError("The anytime search needs at least one weight")
+
+        for weight in weights:
+            _check_weight(weight)
+
+        if self.frontier == "bucket" and \
+                any(weight != int(weight) for weight in weights):
+            raise ValueError("The bucket frontier needs integer weights")
+
+        root = self.tree_root
+        goal_state = root.board.goal_state
+
+        # Lowest cost node of every state reached, the ones to expand and
+        # the ones improved after being expanded (inconsistent)
+        best = {root.state: root}
+        opened = {root.state: root}
+        inconsistent = {}
+
+        # Number of nodes generated and expanded
+        search_cost = 1
+        total_expansions = 0
+        self.duplicates = 0
+
+        # Limits are checked once this many nodes are expanded in the run
+        next_check = self._next_check(0)
+        run_start = time.perf_counter()
+
+        for weight in weights:
+            if weight == int(weight):
+                weight = int(weight)
+
+            opened.update(inconsistent)
+            inconsistent = {}
+
+            frontier = self._make_frontier()
+            for node in opened.values():
+                node.evaluation = node.cumulative_cost + weight * node.h
+                frontier.push(node)
+
+            expanded = set()
+            expansions = 0
+            generated = search_cost
+            peak_frontier = len(frontier)
+            start_time = time.perf_counter()
+
+            while frontier:
+                goal = best.get(goal_state)
+                if goal is not None and \
+                        goal.cumulative_cost <= frontier.min_evaluation():
+                    break
+
+                frontier_size = len(frontier)
+                if frontier_size > peak_frontier:
+                    peak_frontier = frontier_size
+
+                next_node = frontier.pop()
+
+                # Stale entry
+                if opened.get(next_node.state) is not next_node:
+                    continue
+
+                if total_expansions + expansions >= next_check:
+                    limit = self._check_limits(total_expansions + expansions,
+                                               run_start, len(frontier) + 1)
+                    if limit is not None:
+                        self._finish_search(expansions,
+                                            search_cost - generated,
+                                            len(best), start_time,
+                                            peak_frontier)
+                        raise SearchLimitExceeded(limit, {
+                            "expansions": total_expansions + expansions,
+                            "cost": search_cost,
+                            "duplicates": self.duplicates,
+                            "frontier": len(frontier) + 1,
+                            "explored": len(best),
+                            "time": time.perf_counter() - run_start,
+                            "f_bound": min(
+                                node.cumulative_cost + node.h for node in
+                                list(opened.values()) +
+                                list(inconsistent.values()))
+                        })
+                    next_check = self._next_check(total_expansions +
+                                                  expansions)
+
+                del opened[next_node.state]
+                expanded.add(next_node.state)
+                expansions += 1
+
+                for moved_node in next_node.next_moves(weight):
+                    state = moved_node.state
+                    known = best.get(state)
+
+                    if known is not None and \
+                            known.cumulative_cost <= moved_node.cumulative_cost:
+                        self.duplicates += 1
+                        continue
+
+                    best[state] = moved_node
+                    search_cost += 1
+
+                    if state in expanded:
+                        inconsistent[state] = moved_node
+                    else:
+                        opened[state] = moved_node
+                        frontier.push(moved_node)
+
+            self._finish_search(expansions, search_cost - generated,
+                                len(best), start_time,
+                                max(peak_frontier, len(frontier)))
+
+            goal = best.get(goal_state)
+            if goal is None:
+                raise NotSolvableException("Failed to find a solution.")
+
+            total_expansions += expansions
+
+            # The optimal cost is at least the lowest g + h of the nodes left
+            lowest = min((node.cumulative_cost + node.h for node in
+                          list(opened.values()) + list(inconsistent.values())),
+                         default=goal.cumulative_cost)
+            bound = min(weight, goal.cumulative_cost / lowest) if lowest \
+                else 1
+
+            steps = self._steps(goal)
+
+            yield {
+                "steps": steps,
+                "moves": steps.moves,
+                "depth": len(steps) - 1,
+                "cost": search_cost,
+                "duplicates": self.duplicates,
+                "stats": self.stats,
+                "weight": weight,
+                "bound": max(bound, 1),
+                "expansions": expansions,
+                "total_expansions": total_expansions
+            }
+
+            if bound <= 1:
+                return
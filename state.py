@@ -0,0 +1,249 @@
+"""state.py -- Compact integer encoding of puzzle states for searching.
+
+A state packs the whole board into a single integer, using a fixed number of
+bits per tile (4 bits up to the 15-puzzle): the tile at index i (board read
+left to right, top to bottom) is stored in bits b*i to b*i + b - 1. Together
+with the index of the empty tile, this is all the search needs to expand a
+node, so no matrices or strings are built while searching.
+
+The geometry of a board of a given width (bits per tile, move tables, goal) is
+held by a `Board`. The module constants describe the 3x3 board of the
+8-puzzle.
+
+Author: Álex Filipe Santos
+Date: 19 July 2020
+"""
+
+# Characters of the tiles in the string representation of a puzzle (one
+# character per tile, so boards up to 6x6 can be represented).
+TILE_CHARS = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+
+# Inverse of each move (the move that undoes it).
+INVERSE_MOVE = {
+    "up": "down",
+    "right": "left",
+    "down": "up",
+    "left": "right"
+}
+
+# One-byte code of each move, so that solutions are stored as byte strings
+# (see `encode_moves`).
+MOVE_CODES = {
+    "up": ord("U"),
+    "right": ord("R"),
+    "down": ord("D"),
+    "left": ord("L")
+}
+
+# Move of each code.
+CODE_MOVES = {code: move for move, code in MOVE_CODES.items()}
+
+
+def _build_move_table(width):
+    """Builds the table of moves available for every index of the empty tile.
+
+    Moves are named after the direction the neighboring tile slides into the
+    empty space, i.e. "up" takes the tile below the empty space.
+
+    Returns:
+        tuple of tuple: for every index of the empty tile, a tuple of
+            (move, target index) pairs, where target is the index of the tile
+            that slides into the empty space.
+    """
+    table = []
+
+    for zero in range(width * width):
+        i, j = divmod(zero, width)
+        moves = []
+
+        if i < width - 1:
+            moves.append(("up", zero + width))
+        if j > 0:
+            moves.append(("right", zero - 1))
+        if i > 0:
+            moves.append(("down", zero - width))
+        if j < width - 1:
+            moves.append(("left", zero + 1))
+
+        table.append(tuple(moves))
+
+    return tuple(table)
+
+
+class Board:
+    """Geometry of a width x width board, and its tables for packed states.
+    """
+    def __init__(self, width):
+        if not 2 <= width <= 6:
+            raise ValueError("Board width must be between 2 and 6")
+
+        # Width of the board and number of tiles (including the empty tile)
+        self.width = width
+        self.size = width * width
+
+        # Number of bits used to store each tile, and mask to extract one
+        self.tile_bits = max(4, (self.size - 1).bit_length())
+        self.tile_mask = (1 << self.tile_bits) - 1
+
+        # Bit shift of each index inside a state
+        self.shifts = tuple(self.tile_bits * i for i in range(self.size))
+
+        # move_table[zero] lists the (move, target) pairs allowed when the
+        # empty tile is at index zero
+        self.move_table = _build_move_table(width)
+
+        # The solved puzzle goal, as a string and as a packed state
+        self.goal_str = TILE_CHARS[:self.size]
+        self.goal_state = sum(tile << shift
+                              for tile, shift in enumerate(self.shifts))
+
+    def __repr__(self):
+        return "Board({})".format(self.width)
+
+
+# Boards created so far, by width.
+_boards = {}
+
+
+def get_board(width=3):
+    """Returns the (shared) board of a given width.
+    """
+    if width not in _boards:
+        _boards[width] = Board(width)
+
+    return _boards[width]
+
+def board_for_size(size):
+    """Returns the board with a given number of tiles (e.g. 9 or 16).
+    """
+    width = int(round(size ** 0.5))
+
+    if width * width != size:
+        raise ValueError("Puzzle not valid")
+
+    return get_board(width)
+
+
+# The 3x3 board of the 8-puzzle, and its geometry.
+BOARD = get_board(3)
+WIDTH = BOARD.width
+SIZE = BOARD.size
+TILE_BITS = BOARD.tile_bits
+TILE_MASK = BOARD.tile_mask
+SHIFTS = BOARD.shifts
+MOVE_TABLE = BOARD.move_table
+
+
+def encode(tiles, board=BOARD):
+    """Packs a sequence of tiles into a state.
+
+    Args:
+        tiles (iterable of int): the tiles of the board, read left to right
+            and top to bottom.
+        board (obj:`Board`): the board of the puzzle.
+    Returns:
+        int: the packed state.
+    """
+    state = 0
+
+    for shift, tile in zip(board.shifts, tiles):
+        state |= tile << shift
+
+    return state
+
+def decode(state, board=BOARD):
+    """Unpacks a state into a list of tiles.
+
+    Args:
+        state (int): the packed state.
+        board (obj:`Board`): the board of the puzzle.
+    Returns:
+        list of int: the tiles of the board, read left to right and top to
+            bottom.
+    """
+    mask = board.tile_mask
+    return [(state >> shift) & mask for shift in board.shifts]
+
+def str_to_state(puzzle_str, board=BOARD):
+    """Packs the string representation of a puzzle into a state.
+
+    Returns:
+        int: the packed state.
+    """
+    return encode((int(s, 36) for s in puzzle_str), board)
+
+def state_to_str(state, board=BOARD):
+    """Transforms a state into the string representation of the puzzle.
+
+    Returns:
+        str: the string representation of the puzzle.
+    """
+    return "".join(TILE_CHARS[tile] for tile in decode(state, board))
+
+def zero_index(state, board=BOARD):
+    """Returns the index of the empty tile of a state.
+    """
+    for index, shift in enumerate(board.shifts):
+        if (state >> shift) & board.tile_mask == 0:
+            return index
+
+    raise ValueError("State has no empty tile")
+
+def apply_move(state, zero, target, board=BOARD):
+    """Slides the tile at index target into the empty index zero.
+
+    Args:
+        state (int): the packed state.
+        zero (int): the index of the empty tile.
+        target (int): the index of the tile to slide (as in the move table).
+        board (obj:`Board`): the board of the puzzle.
+    Returns:
+        int: the new state, whose empty tile is at index target.
+    """
+    shifts = board.shifts
+    tile = (state >> shifts[target]) & board.tile_mask
+    return state + (tile << shifts[zero]) - (tile << shifts[target])
+
+def encode_moves(moves):
+    """Returns the compact form of a sequence of moves.
+
+    Args:
+        moves (iterable of str): the moves.
+    Returns:
+        bytes: the code of every move (see MOVE_CODES), e.g. b"ULDR".
+    """
+    return bytes(MOVE_CODES[move] for move in moves)
+
+def decode_moves(codes):
+    """Returns the moves of a compact sequence of moves.
+
+    Returns:
+        list of str: the moves.
+    """
+    return [CODE_MOVES[code] for code in codes]
+
+def path_states(state, moves, board=BOARD):
+    """Yields the states reached by applying a sequence of moves.
+
+    Args:
+        state (int): the packed initial state.
+        moves (iterable of str, or bytes): the moves to apply, in order
+            (encoded, if bytes).
+        board (obj:`Board`): the board of the puzzle.
+    Yields:
+        int: the packed state after each move.
+    """
+    if isinstance(moves, bytes):
+        moves = decode_moves(moves)
+
+    zero = zero_index(state, board)
+
+    for move in moves:
+        target = dict(board.move_table[zero])[move]
+        state = apply_move(state, zero, target, board)
+        zero = target
+        yield state
+
+
+# The solved puzzle goal, as a packed state.
+GOAL_STATE = BOARD.goal_state
@@ -0,0 +1,205 @@
+"""stats.py -- Statistics of the searches and hooks to profile them
+
+Every search of `PuzzleSolver` records a `SearchStats`: the nodes expanded,
+generated and pruned as duplicates, the largest frontier and explored set and
+the time spent. These cost at most a comparison per node popped.
+
+Search hooks (`SearchHooks`) receive the statistics of every search, to export
+them without changing the solver. The `Profiler` hooks also wrap the frontier
+and the heuristic of the search, to measure the number of nodes popped at
+every evaluation (f-layer, the distribution of f-values) and the time spent
+in the heuristic and the frontier:
+
+    profiler = Profiler()
+    solution = PuzzleSolver(puzzle, heuristic=2, hooks=profiler).find_solution()
+    print(solution["stats"].f_histogram)
+
+Without hooks, the search runs the unwrapped frontier and heuristic.
+`percentile` summarizes timings (see `report.py` and `loadgen.py`).
+
+Author: Álex Filipe Santos
+Date: 19 July 2020
+"""
+import time
+from frontier import Frontier
+from heuristics import Heuristic
+
+
+class SearchStats:
+    """Statistics of a search. The fields measured by a `Profiler` are None
+    when the search was not profiled.
+    """
+    def __init__(self):
+        # Nodes expanded, generated and pruned as duplicates
+        self.expanded = 0
+        self.generated = 0
+        self.duplicates = 0
+
+        # Largest number of nodes in the frontier (the sum of the peaks of
+        # both frontiers, if bidirectional) and of states reached by the
+        # search
+        self.peak_frontier = 0
+        self.peak_explored = 0
+
+        # Number of nodes popped from the frontier at every evaluation
+        # (profiled)
+        self.f_histogram = None
+
+        # Seconds spent in the search, and the part of them spent expanding
+        # nodes (anything but the heuristic and the frontier), computing the
+        # heuristic and in frontier operations (profiled)
+        self.time = 0.0
+        self.time_expansion = None
+        self.time_heuristic = None
+        self.time_queue = None
+
+
+    def as_dict(self):
+        """Returns the statistics as a dict (for JSON output)."""
+        return dict(vars(self))
+
+    def __repr__(self):
+        return "SearchStats({})".format(", ".join(
+            "{}={!r}".format(name, value) for name, value in vars(self).items()
+            if name != "f_histogram"))
+
+
+class SearchHooks:
+    """Interface of the hooks of a search. Subclasses override the methods
+    they need; the default hooks change nothing.
+    """
+    def wrap_frontier(self, frontier):
+        """Returns the frontier used by the search, given its frontier."""
+        return frontier
+
+    def wrap_heuristic(self, heuristic):
+        """Returns the heuristic used by the search, given its heuristic."""
+        return heuristic
+
+    def search_finished(self, stats):
+        """Called at the end of every search, including searches stopped by
+        a limit.
+
+        Args:
+            stats (obj:`SearchStats`): the statistics of the search.
+        """
+        pass
+
+
+class _TimedFrontier(Frontier):
+    """Frontier measuring the time spent in another frontier and the
+    evaluations of the nodes popped from it."""
+
+    def __init__(self, frontier):
+        self.frontier = frontier
+        self.time = 0.0
+        self.histogram = {}
+
+    def push(self, node):
+        start = time.perf_counter()
+        self.frontier.push(node)
+        self.time += time.perf_counter() - start
+
+    def pop(self):
+        start = time.perf_counter()
+        node = self.frontier.pop()
+        self.time += time.perf_counter() - start
+
+        self.histogram[node.evaluation] = \
+            self.histogram.get(node.evaluation, 0) + 1
+        return node
+
+    def min_evaluation(self):
+        start = time.perf_counter()
+        evaluation = self.frontier.min_evaluation()
+        self.time += time.perf_counter() - start
+        return evaluation
+
+    def __len__(self):
+        return len(self.frontier)
+
+
+class _TimedHeuristic(Heuristic):
+    """Heuristic measuring the time spent in another heuristic. It has no
+    table, so the solvers call its `update` instead of inlining it."""
+
+    def __init__(self, heuristic, profiler):
+        self.heuristic = heuristic
+        self.profiler = profiler
+        self.name = heuristic.name
+        self.description = heuristic.description
+        self.board = heuristic.board
+
+    def evaluate(self, state):
+        start = time.perf_counter()
+        h = self.heuristic.evaluate(state)
+        self.profiler.time_heuristic += time.perf_counter() - start
+        return h
+
+    def update(self, h, state, child, tile, zero, target):
+        start = time.perf_counter()
+        table = self.heuristic.table
+
+        if table is not None:
+            tile_costs = table[tile]
+            h = h + tile_costs[zero] - tile_costs[target]
+        else:
+            h = self.heuristic.update(h, state, child, tile, zero, target)
+
+        self.profiler.time_heuristic += time.perf_counter() - start
+        return h
+
+    def toward(self, goal_state):
+        return _TimedHeuristic(self.heuristic.toward(goal_state),
+                               self.profiler)
+
+
+class Profiler(SearchHooks):
+    """Hooks measuring the f-layers and time split of the searches. Timing
+    every operation slows the search down, so the times are only meaningful
+    relative to each other.
+    """
+    def __init__(self):
+        # Frontiers of the current search (two, if bidirectional)
+        self.frontiers = []
+
+        # Seconds spent in the heuristics of the current search
+        self.time_heuristic = 0.0
+
+        # Statistics of every search profiled, in order
+        self.searches = []
+
+
+    def wrap_frontier(self, frontier):
+        frontier = _TimedFrontier(frontier)
+        self.frontiers.append(frontier)
+        return frontier
+
+    def wrap_heuristic(self, heuristic):
+        return _TimedHeuristic(heuristic, self)
+
+    def search_finished(self, stats):
+        frontiers = self.frontiers
+        histogram = {}
+        for frontier in frontiers:
+            for evaluation, count in frontier.histogram.items():
+                histogram[evaluation] = histogram.get(evaluation, 0) + count
+
+        stats.f_histogram = dict(sorted(histogram.items()))
+        stats.time_queue = sum(frontier.time for frontier in frontiers)
+        stats.time_heuristic = self.time_heuristic
+        stats.time_expansion = max(
+            0.0, stats.time - stats.time_queue - stats.time_heuristic)
+        self.searches.append(stats)
+
+        # Ready for the next search
+        self.frontiers = []
+        self.time_heuristic = 0.0
+
+
+def percentile(values, p):
+    """Returns the p-th percentile (0-100) of a list of values, by the
+    nearest-rank method."""
+    values = sorted(values)
+    rank = max(1, -(-len(values) * p // 100))
+    return values[int(rank) - 1]
@@ -0,0 +1,94 @@
+"""symmetry.py -- Canonical puzzles under the transposition of the board
+
+Transposing the board (swapping rows and columns) and renaming every tile
+after its transposed goal position maps the goal to itself, so a puzzle and
+its transposed puzzle are solved by the same number of moves. A solution of
+one is a solution of the other once its moves are transposed too: the tile
+below the empty space becomes the tile to its right, so "up" and "left" are
+swapped, and so are "down" and "right".
+
+The canonical puzzle is the one of the smaller packed state, and caches of
+solutions or distances to the goal only need to store canonical puzzles.
+
+Author: Álex Filipe Santos
+Date: 19 July 2020
+"""
+from puzzle import Puzzle
+from state import BOARD
+
+# Move of the transposed puzzle for every move.
+TRANSPOSED_MOVE = {
+    "up": "left",
+    "right": "down",
+    "down": "right",
+    "left": "up"
+}
+
+# Transposed index of every index, by board width.
+_transpositions = {}
+
+
+def _transposition(board):
+    """Returns the transposed index of every index of a board (tile t is also
+    renamed to the transposed index of t)."""
+    if board.width not in _transpositions:
+        width = board.width
+        _transpositions[width] = tuple(
+            (index % width) * width + index // width
+            for index in range(board.size)
+        )
+
+    return _transpositions[board.width]
+
+
+def transpose_state(state, board=BOARD):
+    """Returns the transposed state, with every tile renamed.
+
+    Args:
+        state (int): the packed state.
+        board (obj:`Board`): the board of the puzzle.
+    Returns:
+        int: the packed transposed state.
+    """
+    transposed = _transposition(board)
+    shifts, mask = board.shifts, board.tile_mask
+    result = 0
+
+    for index, shift in enumerate(shifts):
+        tile = (state >> shift) & mask
+        result |= transposed[tile] << shifts[transposed[index]]
+
+    return result
+
+def transpose_moves(moves):
+    """Returns the moves that solve the transposed puzzle."""
+    return [TRANSPOSED_MOVE[move] for move in moves]
+
+def canonical_state(state, board=BOARD):
+    """Returns the canonical state of a state.
+
+    Returns:
+        int: the canonical state (the smaller one).
+        bool: True if the canonical state is the transposed state.
+    """
+    transposed = transpose_state(state, board)
+
+    if transposed < state:
+        return transposed, True
+
+    return state, False
+
+def canonical(puzzle):
+    """Returns the canonical puzzle of a puzzle.
+
+    Returns:
+        obj:`Puzzle`: the canonical puzzle.
+        bool: True if the canonical puzzle is the transposed puzzle (so its
+            solution moves must be transposed to solve the puzzle).
+    """
+    state, transposed = canonical_state(puzzle.state, puzzle.board)
+
+    if not transposed:
+        return puzzle, False
+
+    return Puzzle.from_state(state, width=puzzle.width), True
@@ -0,0 +1,272 @@
+"""table.py -- Precomputed distances of every solvable 8-puzzle state
+
+The 8-puzzle only has 9!/2 = 181,440 solvable states, so a breadth-first
+search from the goal can record the exact solution depth of all of them in a
+byte array of that size. Solving a puzzle is then a walk downhill through the
+neighbors of each state, with no search at all.
+
+States are indexed by the position of the empty tile and the Lehmer code
+(rank) of the order of the other 8 tiles. Only even permutations of those
+tiles are solvable and ranks 2k and 2k + 1 always differ in parity, so the
+rank is halved:
+
+    index = zero * 8!/2 + rank // 2
+
+Author: Álex Filipe Santos
+Date: 19 July 2020
+"""
+import os
+import sys
+from collections import deque
+from puzzle import SolutionSteps, NotSolvableException
+from mapped import map_file, write_file
+from state import (BOARD, MOVE_TABLE, GOAL_STATE, WIDTH, SIZE, apply_move,
+                   decode, zero_index, encode_moves)
+from vectorized import np, solvable
+from layered import bfs_layers, unpack
+
+# Number of permutations of the 8 numbered tiles with even parity (8!/2).
+HALF_PERMUTATIONS = 20160
+
+# Number of solvable states (9!/2).
+TABLE_SIZE = SIZE * HALF_PERMUTATIONS
+
+# Distance stored for states that were not reached.
+UNKNOWN_DISTANCE = 0xFF
+
+# Default location of the distance table file.
+DEFAULT_TABLE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                  "tables", "distances.bin")
+
+
+def state_index(state):
+    """Returns the index of a solvable packed state in the distance table.
+    """
+    tiles = decode(state)
+    zero = tiles.index(0)
+    tiles.remove(0)
+
+    # Lehmer code of the numbered tiles, in the factorial number system
+    rank = 0
+    for i, tile in enumerate(tiles):
+        smaller = 0
+        for other in tiles[i + 1:]:
+            if other < tile:
+                smaller += 1
+        rank = rank * (8 - i) + smaller
+
+    return zero * HALF_PERMUTATIONS + rank // 2
+
+def state_indices(states):
+    """Returns the index of every state of a NumPy array of solvable packed
+    states (see `state_index`).
+    """
+    tiles = unpack(states, BOARD)
+    zero = np.argmin(tiles, axis=1)
+
+    # Numbered tiles, in order (every row has a single empty tile)
+    tiles = tiles[tiles != 0].reshape(len(states), SIZE - 1)
+
+    rank = np.zeros(len(states), dtype=np.int64)
+    for i in range(SIZE - 1):
+        smaller = (tiles[:, i + 1:] < tiles[:, i:i + 1]).sum(axis=1)
+        rank = rank * (SIZE - 1 - i) + smaller
+
+    return zero * HALF_PERMUTATIONS + rank // 2
+
+def index_boards(indices):
+    """Returns the tiles of the states at a NumPy array of table indices (the
+    inverse of `state_indices`).
+
+    Returns:
+        obj:`numpy.ndarray`: the (N, 9) uint8 array of their tiles.
+    """
+    count = len(indices)
+    rows = np.arange(count)
+    zero, rank = np.divmod(np.asarray(indices, dtype=np.int64),
+                           HALF_PERMUTATIONS)
+    rank = rank * 2
+
+    # Digits of the Lehmer code (tiles lower than each tile, after it)
+    smaller = np.zeros((count, SIZE - 1), dtype=np.int64)
+    for i in reversed(range(SIZE - 1)):
+        rank, smaller[:, i] = np.divmod(rank, SIZE - 1 - i)
+
+    # Every digit picks a tile among the tiles not used yet
+    tiles = np.zeros((count, SIZE - 1), dtype=np.uint8)
+    unused = np.ones((count, SIZE - 1), dtype=bool)
+    for i in range(SIZE - 1):
+        position = np.argmax(np.cumsum(unused, axis=1) > smaller[:, i:i + 1],
+                             axis=1)
+        tiles[:, i] = position + 1
+        unused[rows, position] = False
+
+    boards = np.zeros((count, SIZE), dtype=np.uint8)
+    columns = np.arange(SIZE - 1) + (np.arange(SIZE - 1) >= zero[:, None])
+    boards[rows[:, None], columns] = tiles
+
+    # The halved rank stands for two codes, which only differ by a swap of
+    # the last two tiles; the solvable one is kept
+    rows = np.nonzero(~solvable(boards))[0]
+    last, before = columns[rows, -1], columns[rows, -2]
+    boards[rows, last], boards[rows, before] = \
+        boards[rows, before], boards[rows, last]
+
+    return boards
+
+
+class DistanceTable:
+    """Exact solution depths of all solvable puzzle states.
+    """
+    def __init__(self, data):
+        if len(data) != TABLE_SIZE:
+            raise ValueError("Distance table must have {} entries"
+                             .format(TABLE_SIZE))
+
+        # One byte per state, indexed by `state_index` (bytes, bytearray or a
+        # memoryview of a mapped file)
+        self.data = data
+
+
+    @classmethod
+    def build(cls):
+        """Builds the table with a breadth-first search from the goal (a
+        layer at a time, if NumPy is installed; see `layered.py`).
+
+        Returns:
+            obj:`DistanceTable`: the table.
+        """
+        if np is not None:
+            data = np.full(TABLE_SIZE, UNKNOWN_DISTANCE, dtype=np.uint8)
+
+            for distance, layer in enumerate(bfs_layers([GOAL_STATE])):
+                data[state_indices(layer)] = distance
+
+            return cls(bytearray(data.tobytes()))
+
+        data = bytearray([UNKNOWN_DISTANCE]) * TABLE_SIZE
+        data[state_index(GOAL_STATE)] = 0
+
+        queue = deque([(GOAL_STATE, zero_index(GOAL_STATE), 0)])
+
+        while queue:
+            state, zero, distance = queue.popleft()
+
+            for _, target in MOVE_TABLE[zero]:
+                child = apply_move(state, zero, target)
+                index = state_index(child)
+
+                if data[index] == UNKNOWN_DISTANCE:
+                    data[index] = distance + 1
+                    queue.append((child, target, distance + 1))
+
+        return cls(data)
+
+    @classmethod
+    def load(cls, filepath=DEFAULT_TABLE_PATH, mapped=True):
+        """Loads a table written by `save`.
+
+        Args:
+            filepath (str): the path of the table file.
+            mapped (bool): if True, the file is memory-mapped (see
+                `mapped.py`) instead of read into memory.
+        Returns:
+            obj:`DistanceTable`: the table.
+        """
+        if mapped:
+            return cls(map_file(filepath))
+
+        with open(filepath, "rb") as fp:
+            return cls(fp.read())
+
+    @classmethod
+    def load_or_build(cls, filepath=DEFAULT_TABLE_PATH):
+        """Loads (memory-maps) the table file, building and saving it on
+        first use.
+        """
+        if os.path.exists(filepath):
+            return cls.load(filepath)
+
+        table = cls.build()
+        table.save(filepath)
+        return table
+
+    def save(self, filepath=DEFAULT_TABLE_PATH):
+        """Writes the table as a raw byte file (atomically, see
+        `mapped.write_file`).
+        """
+        write_file(filepath, self.data)
+
+
+    def distance(self, state):
+        """Returns the exact solution depth of a solvable packed state.
+        """
+        return self.data[state_index(state)]
+
+
+class TableSolver:
+    """Solves puzzles by looking up distances, with the same interface as
+    `PuzzleSolver`.
+    """
+    def __init__(self, puzzle, table=None):
+        if puzzle.width != WIDTH:
+            raise ValueError("The distance table only covers 3x3 puzzles.")
+
+        if not puzzle.is_solvable():
+            raise NotSolvableException("The puzzle provided is not solvable.")
+
+        # Initial state of the puzzle
+        self.puzzle = puzzle
+
+        # Distance table of all states
+        self.table = table or DistanceTable.load_or_build()
+
+
+    def find_solution(self):
+        """Returns a list of steps to reach the solution, including some
+        statistics (depth of solution and cost of solution - number of table
+        lookups needed).
+
+        Returns:
+            dict: statistics
+        """
+        state = self.puzzle.state
+        zero = zero_index(state)
+        distance = self.table.distance(state)
+        moves = []
+
+        # Number of table lookups
+        cost = 1
+
+        while distance > 0:
+            # Move to a neighbor one step closer to the goal
+            for move, target in MOVE_TABLE[zero]:
+                child = apply_move(state, zero, target)
+                cost += 1
+
+                if self.table.distance(child) == distance - 1:
+                    break
+            else:
+                raise NotSolvableException("Failed to find a solution.")
+
+            state, zero, distance = child, target, distance - 1
+            moves.append(move)
+
+        moves = encode_moves(moves)
+
+        return {
+            "steps": SolutionSteps(self.puzzle.state, moves),
+            "moves": moves,
+            "depth": len(moves),
+            "cost": cost
+        }
+
+
+if __name__ == '__main__':
+    if len(sys.argv) not in [2, 3] or sys.argv[1] != "build":
+        print("USAGE: python table.py build [output-file]")
+
+    else:
+        table_file = sys.argv[2] if len(sys.argv) == 3 else DEFAULT_TABLE_PATH
+        DistanceTable.build().save(table_file)
+        print("Distance table written to {}".format(table_file))
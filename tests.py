@@ -3,9 +3,37 @@
 Author: Álex Filipe Santos
 Date: 19 July 2020
 """
+import io
+import os
+import json
 import random
-from puzzle import Puzzle
-from solver import PuzzleNode, PuzzleSolver
+import asyncio
+import pytest
+import solver
+from concurrent.futures import ThreadPoolExecutor
+from puzzle import Puzzle, SolutionSteps, tiles_to_str
+from solver import PuzzleNode, PuzzleSolver, SearchLimitExceeded
+from idastar import IDAStarSolver
+from batch import solve_state, solve_many, solve_stream
+from cache import SolutionCache
+from service import SolverService
+from stats import SearchHooks, Profiler
+from vectorized import boards_array, evaluate_boards, solvable_puzzles
+from solve_puzzle import generate_solvable_puzzles, stream_puzzles
+from layered import bfs_layers, solve_layered, solve_layered_batch
+from generator import (fix_parity, generate_puzzles, generate_puzzles_at_depth,
+                       write_cases)
+from report import file_to_puzzle_list, benchmark, compare_results
+from symmetry import canonical, transpose_state, transpose_moves
+from frontier import FRONTIERS
+from table import DistanceTable, TableSolver
+from pattern_db import PatternDatabase, PatternDatabaseHeuristic
+from heuristics import (MISPLACED_TABLE, MANHATTAN_TABLE, HEURISTICS,
+                        heuristic_value, get_heuristic, register_heuristic,
+                        describe_heuristic)
+from state import (MOVE_TABLE, GOAL_STATE, str_to_state, state_to_str,
+                   apply_move, zero_index, get_board, encode_moves,
+                   decode_moves)
 
 puzzle1 = [
     [1, 8, 2],
@@ -56,7 +84,7 @@ def test_allowed_moves():
         print("----")
         print("Allowed moves:", p1.allowed_moves)
 
-        move = random.sample(p1.allowed_moves, 1)[0]
+        move = random.choice(sorted(p1.allowed_moves))
 
         print("Moving", move)
         p1.move(move)
@@ -73,7 +101,7 @@ def random_moves():
     count = 0
 
     while not p1.is_solved():
-        move = random.sample(p1.allowed_moves, 1)[0]
+        move = random.choice(sorted(p1.allowed_moves))
         p1.move(move)
         count += 1
 
@@ -112,8 +140,738 @@ def test_next_moves():
         print(f"Puzzle #{i}:")
         print(n.puzzle)
         print("Cumulative cost:", n.cumulative_cost)
-        print("f1 = ", n.evaluation(1))
-        print("f2 = ", n.evaluation(2))
+        print("f = ", n.evaluation)
+
+
+def test_packed_state():
+    """Tests that moves on packed states match the moves on a Puzzle."""
+    p1 = Puzzle(puzzle3)
+    state = p1.state
+
+    assert state_to_str(state) == p1.string
+    assert str_to_state("012345678") == GOAL_STATE
+
+    for _ in range(50):
+        zero = zero_index(state)
+        assert set(m for m, _ in MOVE_TABLE[zero]) == p1.allowed_moves
+
+        move, target = random.choice(MOVE_TABLE[zero])
+        state = apply_move(state, zero, target)
+        p1.move(move)
+
+        assert state == p1.state
+        assert Puzzle.from_state(state).string == p1.string
+
+
+def test_solution_steps():
+    """Tests that solutions are compact move strings whose steps are built on
+    demand."""
+    solution = PuzzleSolver(Puzzle(puzzle8), heuristic=2).find_solution()
+    moves, steps = solution["moves"], solution["steps"]
+
+    assert isinstance(moves, bytes) and len(moves) == 20
+    assert encode_moves(decode_moves(moves)) == moves
+    assert isinstance(steps, SolutionSteps) and steps._states is None
+
+    replay = Puzzle(puzzle_str=Puzzle(puzzle8).string)
+    assert steps[0] == replay and steps[0].last_move is None
+
+    for step, move in zip(steps[1:], decode_moves(moves)):
+        replay.move(move)
+        assert step == replay and step.last_move == move
+
+    assert steps[-1].is_solved() and len(list(steps)) == 21
+    assert steps == list(steps) and list(steps) == steps
+    assert steps == SolutionSteps(steps.state, moves)
+    assert steps != list(steps)[:-1] and steps != "steps"
+    with pytest.raises(TypeError):
+        hash(steps)
+
+    # Nodes only hold a packed state and a move, no puzzle
+    assert "puzzle" not in PuzzleNode.__slots__
+
+
+def test_incremental_heuristics():
+    """Tests incremental heuristics against the Puzzle heuristics."""
+    p1 = Puzzle(puzzle3)
+    assert heuristic_value(p1.state, MISPLACED_TABLE) == \
+        p1.misplaced_heuristic()
+    assert heuristic_value(p1.state, MANHATTAN_TABLE) == \
+        p1.manhattan_heuristic()
+
+    solver.CHECK_HEURISTICS = True
+    try:
+        for heuristic in HEURISTICS:
+            PuzzleSolver(Puzzle(puzzle5), heuristic=heuristic).find_solution()
+        for heuristic in (4, 5):
+            PuzzleSolver(Puzzle(puzzle8), heuristic=heuristic).find_solution()
+    finally:
+        solver.CHECK_HEURISTICS = False
+
+    # Heuristics are described without being built
+    def unbuilt(board):
+        raise AssertionError("built to be described")
+
+    register_heuristic(99, unbuilt, description="Never built")
+    try:
+        assert describe_heuristic(99) == ("h99", "Never built")
+        assert describe_heuristic(6) == ("h6", "Additive Pattern Database")
+    finally:
+        register_heuristic(99, unbuilt)
+        del HEURISTICS[99]
+
+    # Updates from values without their carried keys are the same
+    walking = get_heuristic(5)
+    node = PuzzleNode(Puzzle(puzzle8), heuristic=5)
+    for child in node.next_moves():
+        zero, target = node.zero, child.zero
+        tile = (node.state >> node.board.shifts[target]) & node.board.tile_mask
+        assert walking.update(int(node.h), node.state, child.state, tile,
+                              zero, target) == child.h
+
+
+def test_frontiers():
+    """Tests that every frontier finds an optimal solution."""
+    for name in FRONTIERS:
+        solution = PuzzleSolver(Puzzle(puzzle8), heuristic=2,
+                                frontier=name).find_solution()
+        assert solution["depth"] == 20
+        assert solution["steps"][-1].is_solved()
+
+
+def test_duplicate_detection():
+    """Tests that duplicate states are suppressed and counted."""
+    solution = PuzzleSolver(Puzzle(puzzle8), heuristic=1).find_solution()
+    states = [p.string for p in solution["steps"]]
+
+    assert solution["depth"] == 20
+    assert solution["duplicates"] > 0
+    assert len(set(states)) == len(states)
+
+
+def test_bidirectional():
+    """Tests that bidirectional search finds optimal solutions whose moves
+    replay correctly."""
+    for matrix, depth in [(puzzle4, 4), (puzzle5, 8), (puzzle8, 20)]:
+        for heuristic in [1, 2, 3]:
+            solution = PuzzleSolver(Puzzle(matrix), heuristic=heuristic,
+                                    bidirectional=True).find_solution()
+            steps = solution["steps"]
+
+            assert solution["depth"] == depth
+            assert len(steps) == depth + 1
+
+            puzzle = Puzzle(puzzle_str=steps[0].string)
+            for step in steps[1:]:
+                puzzle.move(step.last_move)
+                assert puzzle.string == step.string
+
+            assert puzzle.is_solved()
+
+
+def test_weighted_search():
+    """Tests that weighted and anytime searches stay within their bounds, and
+    that the anytime search ends with the optimal solution."""
+    for matrix, depth in [(puzzle1, 21), (puzzle8, 20)]:
+        weighted = PuzzleSolver(Puzzle(matrix), heuristic=2,
+                                weight=2).find_solution()
+        assert depth <= weighted["depth"] <= 2 * depth
+
+        solutions = list(PuzzleSolver(Puzzle(matrix),
+                                      heuristic=2).anytime_solutions())
+        assert solutions[-1]["depth"] == depth
+        assert solutions[-1]["bound"] == 1
+
+        for previous, solution in zip(solutions, solutions[1:]):
+            assert solution["depth"] <= previous["depth"]
+            assert solution["bound"] <= previous["bound"]
+
+        for solution in solutions:
+            assert solution["depth"] <= solution["bound"] * depth
+            assert solution["steps"][-1].is_solved()
+
+    # Whole float weights, and the frontier, limits and hooks of the solver
+    weighted = PuzzleSolver(Puzzle(puzzle8), heuristic=2, frontier="bucket",
+                            weight=2.0).find_solution()
+    assert 20 <= weighted["depth"] <= 40
+
+    profiler = Profiler()
+    solutions = list(PuzzleSolver(Puzzle(puzzle8), heuristic=2,
+                                  frontier="bucket", hooks=profiler)
+                     .anytime_solutions(weights=(3, 2.0, 1)))
+    assert [s["weight"] for s in solutions][-1] == 1
+    assert solutions[-1]["depth"] == 20
+    assert len(profiler.searches) == len(solutions)
+    assert all(s["stats"].expanded == s["expansions"] for s in solutions)
+
+    with pytest.raises(ValueError):
+        list(PuzzleSolver(Puzzle(puzzle8), heuristic=2,
+                          frontier="bucket").anytime_solutions())
+
+    for weights in [(2, 0.5), (float("inf"), 1), (float("nan"),), ()]:
+        with pytest.raises(ValueError):
+            list(PuzzleSolver(Puzzle(puzzle8), heuristic=2)
+                 .anytime_solutions(weights))
+
+    with pytest.raises(ValueError):
+        list(PuzzleSolver(Puzzle(puzzle8), heuristic=2,
+                          bidirectional=True).anytime_solutions())
+
+    with pytest.raises(ValueError):
+        PuzzleSolver(Puzzle(puzzle8), heuristic=2, weight=float("inf"))
+
+    with pytest.raises(SearchLimitExceeded):
+        list(PuzzleSolver(Puzzle(puzzle8), heuristic=1,
+                          max_expansions=50).anytime_solutions(weights=(1,)))
+
+
+def test_search_limits():
+    """Tests that searches stop at their limits with partial statistics."""
+    for bidirectional in (False, True):
+        solver = PuzzleSolver(Puzzle(puzzle8), heuristic=1,
+                              bidirectional=bidirectional, max_expansions=100)
+        with pytest.raises(SearchLimitExceeded) as stopped:
+            solver.find_solution()
+
+        assert stopped.value.limit == "max_expansions"
+        assert stopped.value.stats["expansions"] == 100
+        assert stopped.value.stats["f_bound"] <= 20
+
+    solver = PuzzleSolver(Puzzle(puzzle8), heuristic=1, max_frontier=1000)
+    with pytest.raises(SearchLimitExceeded) as stopped:
+        solver.find_solution()
+    assert stopped.value.limit == "max_frontier"
+    assert stopped.value.stats["frontier"] >= 1000
+
+    # Limits far from the solution do not change it
+    solution = PuzzleSolver(Puzzle(puzzle8), heuristic=2, max_expansions=10**6,
+                            max_seconds=60).find_solution()
+    assert solution["depth"] == 20
+
+    result = solve_state(Puzzle(puzzle8).state, 3, heuristic=1,
+                         max_expansions=50)
+    assert result["status"] == "limit"
+    assert result["stats"]["expansions"] == 50
+
+
+def test_search_stats():
+    """Tests the statistics of a search, with and without profiling hooks."""
+    plain = PuzzleSolver(Puzzle(puzzle8), heuristic=2).find_solution()
+    stats = plain["stats"]
+    assert stats.generated == plain["cost"]
+    assert stats.duplicates == plain["duplicates"]
+    assert 0 < stats.expanded < stats.peak_explored <= stats.generated
+    assert 0 < stats.peak_frontier <= stats.generated
+    assert stats.f_histogram is None
+
+    class Recorder(SearchHooks):
+        def __init__(self):
+            self.searches = []
+            self.sizes = []
+        def wrap_frontier(self, frontier):
+            push = frontier.push
+            def measured_push(node):
+                push(node)
+                self.sizes.append(len(frontier))
+            frontier.push = measured_push
+            return frontier
+        def search_finished(self, stats):
+            self.searches.append(stats)
+
+    recorder = Recorder()
+    PuzzleSolver(Puzzle(puzzle8), heuristic=2, hooks=recorder).find_solution()
+    assert recorder.searches[0].expanded == stats.expanded
+    assert max(recorder.sizes) == stats.peak_frontier
+
+    for bidirectional in (False, True):
+        profiler = Profiler()
+        profiled = PuzzleSolver(Puzzle(puzzle8), heuristic=2, hooks=profiler,
+                                bidirectional=bidirectional).find_solution()
+        stats = profiled["stats"]
+        assert profiled["depth"] == 20
+        assert profiler.searches == [stats]
+        assert stats.peak_frontier > 0
+        assert sum(stats.f_histogram.values()) >= stats.expanded
+        assert stats.time_queue > 0 and stats.time_heuristic > 0
+
+    assert max(PuzzleSolver(Puzzle(puzzle8), heuristic=2, hooks=Profiler())
+               .find_solution()["stats"].f_histogram) == 20
+
+
+def test_idastar():
+    """Tests that IDA* finds solutions as deep as the A* ones."""
+    cases = [(puzzle4, 4), (puzzle5, 8), (puzzle8, 20)]
+
+    for (matrix, depth), heuristic in zip(cases * 2, [2] * 3 + [3] * 3):
+        solution = IDAStarSolver(Puzzle(matrix),
+                                 heuristic=heuristic).find_solution()
+        steps = solution["steps"]
+
+        assert solution["depth"] == depth
+        assert steps[-1].is_solved()
+
+        # Replaying the moves on the initial puzzle reaches the goal
+        puzzle = Puzzle(puzzle_str=steps[0].string)
+        for step in steps[1:]:
+            puzzle.move(step.last_move)
+            assert puzzle.string == step.string
+
+
+# Distance table shared by the tests (built once, in memory)
+distance_table = None
+
+def get_distance_table():
+    global distance_table
+    if distance_table is None:
+        distance_table = DistanceTable.build()
+    return distance_table
+
+
+def test_parallel_idastar():
+    """Tests that parallel IDA* finds the same solution as IDA* in a single
+    process, and reports the nodes generated by every worker."""
+    sequential = IDAStarSolver(Puzzle(puzzle8), heuristic=2).find_solution()
+    parallel = IDAStarSolver(Puzzle(puzzle8), heuristic=2,
+                             workers=2).find_solution()
+
+    assert [s.string for s in parallel["steps"]] == \
+        [s.string for s in sequential["steps"]]
+    assert 1 <= len(parallel["worker_costs"]) <= 2
+    assert sum(parallel["worker_costs"]) < parallel["cost"]
+
+
+def test_table_solver():
+    """Tests that table lookups give the same depths as A*."""
+    table = get_distance_table()
+
+    for matrix in [puzzle1, puzzle3, puzzle4, puzzle5, puzzle8]:
+        puzzle = Puzzle(matrix)
+        solution = TableSolver(puzzle, table=table).find_solution()
+        expected = PuzzleSolver(puzzle, heuristic=2).find_solution()
+
+        assert solution["depth"] == expected["depth"]
+        assert solution["steps"][-1].is_solved()
+
+
+def test_mapped_table(tmp_path):
+    """Tests that a memory-mapped table gives the same distances."""
+    table = get_distance_table()
+    filepath = str(tmp_path / "distances.bin")
+    table.save(filepath)
+
+    mapped = DistanceTable.load(filepath, mapped=True)
+    assert isinstance(mapped.data, memoryview)
+    assert mapped.data == table.data
+
+    solution = TableSolver(Puzzle(puzzle8), table=mapped).find_solution()
+    assert solution["depth"] == 20
+
+    # Saving again replaces the file without touching the mapped one
+    DistanceTable(bytes(len(table.data))).save(filepath)
+    assert mapped.data == table.data
+    assert DistanceTable.load(filepath).distance(GOAL_STATE) == 0
+    assert [path.name for path in tmp_path.iterdir()] == ["distances.bin"]
+
+
+def test_pattern_database(tmp_path):
+    """Tests that additive pattern databases dominate the Manhattan
+    distance and solve puzzles optimally."""
+    databases = []
+    for pattern in [(1, 2, 3, 4), (5, 6, 7, 8)]:
+        filepath = str(tmp_path / "pdb-{}.bin".format(pattern[0]))
+        PatternDatabase.build(pattern).save(filepath)
+        databases.append(PatternDatabase.load(pattern, filepath))
+
+    heuristic = PatternDatabaseHeuristic("h", "PDB", databases)
+    manhattan = get_heuristic(2)
+
+    for matrix in [puzzle1, puzzle3, puzzle4, puzzle5, puzzle8]:
+        state = Puzzle(matrix).state
+        assert heuristic.evaluate(state) >= manhattan.evaluate(state)
+
+    solution = PuzzleSolver(Puzzle(puzzle8),
+                            heuristic=heuristic).find_solution()
+    assert solution["depth"] == 20
+    assert sorted(path.name for path in tmp_path.iterdir()) == \
+        ["pdb-1.bin", "pdb-5.bin"]
+
+
+def test_heuristics_admissible():
+    """Tests that the heuristics never overestimate the exact distance."""
+    table = get_distance_table()
+    puzzle = Puzzle(puzzle_str="012345678")
+
+    for _ in range(500):
+        puzzle.move(random.choice(sorted(puzzle.allowed_moves)))
+        distance = table.distance(puzzle.state)
+
+        assert puzzle.misplaced_heuristic() <= distance
+        assert puzzle.manhattan_heuristic() <= distance
+
+        for heuristic in HEURISTICS:
+            assert get_heuristic(heuristic).evaluate(puzzle.state) <= distance
+
+
+def test_vectorized():
+    """Tests that batch solvability and heuristics match the puzzle methods
+    and the heuristics, on 3x3 and 4x4 boards."""
+    pytest.importorskip("numpy")
+    random.seed(4)
+
+    for width in (3, 4):
+        board = get_board(width)
+        puzzles = []
+        for _ in range(300):
+            tiles = list(range(board.size))
+            random.shuffle(tiles)
+            puzzles.append(Puzzle(puzzle_str=tiles_to_str(tiles)))
+
+        values = evaluate_boards(boards_array(puzzles))
+
+        for i, puzzle in enumerate(puzzles):
+            assert values["solvable"][i] == puzzle.is_solvable()
+            for heuristic in (1, 2, 3):
+                assert values["h{}".format(heuristic)][i] == \
+                    get_heuristic(heuristic, board).evaluate(puzzle.state)
+
+        assert solvable_puzzles(puzzles) == \
+            [puzzle for puzzle in puzzles if puzzle.is_solvable()]
+
+    puzzles = generate_solvable_puzzles(200)
+    assert len(puzzles) == 200
+    assert all(puzzle.is_solvable() for puzzle in puzzles)
+
+
+def test_generator(tmp_path):
+    """Tests that generated puzzles are solvable, reproducible from a seed and
+    of the requested depth."""
+    for tiles in [[1, 0, 2, 3, 4, 5, 6, 7, 8], [0, 2, 1, 3, 4, 5, 6, 7, 8]]:
+        fixed = fix_parity(list(tiles))
+        assert Puzzle(puzzle_str=tiles_to_str(fixed)).is_solvable()
+        assert fixed.index(0) == tiles.index(0)
+
+    for width in (3, 4):
+        puzzles = generate_puzzles(100, width, seed=7)
+        assert all(puzzle.is_solvable() for puzzle in puzzles)
+        assert puzzles == generate_puzzles(100, width, seed=7)
+
+    pytest.importorskip("numpy")
+    table = DistanceTable.build()
+    puzzles = generate_puzzles_at_depth(50, 20, seed=7, table=table)
+    assert all(table.distance(puzzle.state) == 20 for puzzle in puzzles)
+    assert PuzzleSolver(puzzles[0], heuristic=2).find_solution()["depth"] == 20
+
+    filepath = str(tmp_path / "Length20.txt")
+    write_cases(filepath, puzzles)
+    assert file_to_puzzle_list(filepath) == puzzles
+
+
+def test_layered_search():
+    """Tests that the layer-synchronous searches enumerate the state space and
+    find optimal solutions, on 3x3 and 4x4 boards."""
+    pytest.importorskip("numpy")
+
+    layers = [len(layer) for layer in bfs_layers([GOAL_STATE])]
+    assert sum(layers) == 181440 and len(layers) == 32
+
+    rng = random.Random(5)
+    fifteen = Puzzle.goal(4)
+    for _ in range(30):
+        fifteen.move(rng.choice(sorted(fifteen.allowed_moves)))
+
+    for puzzle in [Puzzle(puzzle8), Puzzle(puzzle1), fifteen]:
+        depth = PuzzleSolver(Puzzle(puzzle_str=puzzle.string),
+                             heuristic=3).find_solution()["depth"]
+
+        for heuristic in (1, 2, 3):
+            if heuristic == 1 and puzzle is fifteen:
+                continue
+
+            solution = solve_layered(puzzle, heuristic)
+            assert solution["depth"] == depth
+            assert solution["steps"][-1].is_solved()
+
+    # A batch search gives every puzzle the solution of its own search
+    puzzles = [Puzzle(m) for m in [puzzle8, puzzle1, puzzle2, puzzle4,
+                                   puzzle8]]
+    batch = solve_layered_batch(puzzles, heuristic=2)
+    assert batch[2] is None
+
+    for puzzle, solution in zip(puzzles, batch):
+        if solution is not None:
+            single = solve_layered(puzzle, heuristic=2)
+            assert (solution["depth"], solution["cost"],
+                    solution["iterations"]) == \
+                (single["depth"], single["cost"], single["iterations"])
+            assert solution["steps"][-1].is_solved()
+
+    assert solve_layered_batch([fifteen], heuristic=3)[0]["steps"][-1] \
+        .is_solved()
+
+
+def test_benchmark():
+    """Tests the benchmark results of report.py and their comparison."""
+    cases = {
+        4: file_to_puzzle_list("test/Length4.txt")[:2],
+        8: file_to_puzzle_list("test/Length8.txt")[:2]
+    }
+    results = benchmark(cases, ["astar", "idastar"], [2], repeat=3, warmup=1)
+
+    assert [(r["depth"], r["engine"]) for r in results] == \
+        [(4, "astar"), (4, "idastar"), (8, "astar"), (8, "idastar")]
+
+    for result in results:
+        assert result["runs"] == 6
+        assert result["median_ms"] <= result["p95_ms"] <= result["p99_ms"]
+        assert result["expansions"] > 0
+
+    with pytest.raises(ValueError):
+        benchmark(cases, ["unknown"])
+
+    baseline = {"results": results}
+    assert not any(change["regression"]
+                   for change in compare_results(baseline, baseline))
+
+    slower = [dict(result, median_ms=result["median_ms"] * 1.5)
+              for result in results]
+    changes = compare_results(baseline, {"results": slower}, threshold=0.1)
+    assert all(change["regression"] for change in changes)
+    assert compare_results(baseline, {"results": slower}, threshold=1.0) \
+        == [dict(change, regression=False) for change in changes]
+
+
+def test_fifteen_puzzle():
+    """Tests solvability and optimal solutions on the 4x4 board."""
+    board = get_board(4)
+    swapped = list(board.goal_str)
+    swapped[1], swapped[2] = swapped[2], swapped[1]
+    assert Puzzle.goal(4).is_solvable()
+    assert not Puzzle(puzzle_str="".join(swapped)).is_solvable()
+
+    rng = random.Random(4)
+    puzzle = Puzzle.goal(4)
+    for _ in range(40):
+        puzzle.move(rng.choice(sorted(puzzle.allowed_moves)))
+    assert puzzle.is_solvable()
+
+    database = PatternDatabase.build((1, 2, 3), board)
+    heuristics = [2, 3, 4, 5, PatternDatabaseHeuristic("h", "PDB", [database])]
+    depth = None
+
+    for heuristic in heuristics:
+        for solver_class in [PuzzleSolver, IDAStarSolver]:
+            solution = solver_class(Puzzle(puzzle_str=puzzle.string),
+                                    heuristic=heuristic).find_solution()
+            depth = depth or solution["depth"]
+            assert solution["depth"] == depth
+
+            replay = Puzzle(puzzle_str=puzzle.string)
+            for step in solution["steps"][1:]:
+                replay.move(step.last_move)
+            assert replay.is_solved()
+
+
+def test_solve_many():
+    """Tests that batch solving keeps the input order and reports unsolvable
+    puzzles and timeouts."""
+    puzzles = [Puzzle(m) for m in [puzzle8, puzzle4, puzzle2, puzzle5]]
+    results = solve_many(puzzles, heuristic=2, workers=2, chunk_size=1)
+
+    assert [r["depth"] for r in results] == [20, 4, None, 8]
+    assert results[2]["status"] == "unsolvable"
+
+    for puzzle, result in zip(puzzles, results):
+        if result["status"] == "solved":
+            replay = Puzzle(puzzle_str=puzzle.string)
+            for move in result["moves"]:
+                replay.move(move)
+            assert replay.is_solved()
+
+    results = solve_many([Puzzle(puzzle8)], heuristic=1, workers=1,
+                         timeout=0.001)
+    assert results[0]["status"] == "timeout"
+
+    # No default pattern database for 5x5 boards: only that puzzle fails
+    results = solve_many([Puzzle(puzzle4), Puzzle.goal(5)], heuristic=6,
+                         workers=2, chunk_size=1)
+    assert [r["status"] for r in results] == ["solved", "invalid"]
+    assert "5x5" in results[1]["error"]
+
+
+def test_solve_stream():
+    """Tests that streamed puzzles are read lazily and their results come
+    back in the input order when asked."""
+    consumed = []
+
+    def puzzles():
+        for i in range(12):
+            consumed.append(i)
+            yield Puzzle([puzzle4, puzzle5, puzzle1][i % 3]) if i != 7 \
+                else None
+
+    stream = solve_stream(puzzles(), heuristic=2, workers=2, ordered=True,
+                          chunk_size=2, max_pending=1)
+    first = next(stream)
+    assert first["index"] == 0 and len(consumed) <= 4
+
+    results = [first] + list(stream)
+    assert [r["index"] for r in results] == list(range(12))
+    assert [r["depth"] for r in results[:3]] == [4, 8, 21]
+    assert results[7]["status"] == "invalid"
+
+    unordered = solve_stream(puzzles(), heuristic=2, workers=2)
+    assert sorted(r["index"] for r in unordered) == list(range(12))
+
+    # Blank lines and boards that are not square are invalid
+    output = io.StringIO()
+    stream_puzzles(io.StringIO("125340678\n\n  \n1 2 3\n0\n3120\n"), output,
+                   workers=1, ordered=True)
+    statuses = [json.loads(line)["status"] for line in output.getvalue()
+                .splitlines()]
+    assert statuses == ["solved", "invalid", "invalid", "invalid", "invalid",
+                        "unsolvable"]
+
+
+def test_service():
+    """Tests the solving service over a loopback socket: identical requests
+    share a solve, deadlines expire and a full service turns puzzles away."""
+    async def request(port, **fields):
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        writer.write((json.dumps(fields) + "\n").encode())
+        response = json.loads(await reader.readline())
+        writer.close()
+        await writer.wait_closed()
+        return response
+
+    async def run():
+        service = SolverService(heuristic=1, workers=1, max_pending=1)
+        server = await service.serve(port=0)
+        port = server.sockets[0].getsockname()[1]
+        hard = Puzzle(puzzle8).string
+
+        try:
+            responses = await asyncio.gather(
+                *[request(port, id=i, puzzle=hard) for i in range(4)],
+                request(port, id=4, puzzle=hard, deadline=0.001),
+                request(port, id=5, puzzle=Puzzle(puzzle4).string),
+                request(port, id=6, puzzle="12345"),
+                request(port, id=7, puzzle=hard, deadline="soon"),
+                request(port, id=8, puzzle=hard, deadline=-1))
+        finally:
+            server.close()
+            await server.wait_closed()
+            service.close()
+
+        return service, responses
+
+    service, responses = asyncio.run(run())
+
+    assert [r["id"] for r in responses] == list(range(9))
+    assert all(r["depth"] == 20 for r in responses[:4])
+    assert service.coalesced >= 3
+    assert [r["status"] for r in responses[4:]] == \
+        ["timeout", "busy", "invalid", "invalid", "invalid"]
+
+    # A failed worker answers "error", and later requests solve again. A
+    # broken pool is replaced once, however many requests shared the solve.
+    async def fail():
+        service = SolverService(workers=1)
+        easy = Puzzle(puzzle4)
+        service.executor.shutdown()
+        failed = await service.solve(easy)
+
+        loop = asyncio.get_running_loop()
+        executor = service.executor = ThreadPoolExecutor(max_workers=1)
+        service.pending[easy.string] = loop.run_in_executor(
+            executor, Puzzle.from_state, None), executor
+        broken = await service.solve(easy)
+        executor.shutdown()
+
+        service.executor = SolverService(workers=1).executor
+        service.pending[easy.string] = loop.run_in_executor(
+            service.executor, os._exit, 1), service.executor
+        dead = await asyncio.gather(service.solve(easy), service.solve(easy))
+        solved = await service.solve(easy)
+        service.close()
+        return service, [failed, broken] + dead + [solved]
+
+    service, responses = asyncio.run(fail())
+    assert [r["status"] for r in responses] == ["error"] * 4 + ["solved"]
+    assert service.restarts == 1 and not service.pending
+
+    # A deadline also stops the search, so a hard puzzle does not hold the
+    # only worker; long deadlines are capped and long lines are invalid
+    async def deadlines():
+        service = SolverService(heuristic=1, workers=1)
+        server = await service.serve(port=0)
+        port = server.sockets[0].getsockname()[1]
+
+        try:
+            hard = request(port, id=0, puzzle="C17AE458092DB63F", deadline=0.5)
+            easy = request(port, id=1, puzzle="125340678", deadline=3)
+            capped = request(port, id=2, puzzle="125340678",
+                             deadline=10 ** 400)
+            responses = await asyncio.gather(hard, easy, capped)
+
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.write(b"x" * 100000 + b"\n")
+            responses.append(json.loads(await reader.readline()))
+            assert await reader.read() == b""
+            writer.close()
+        finally:
+            server.close()
+            await server.wait_closed()
+            service.close()
+
+        return service, responses
+
+    service, responses = asyncio.run(deadlines())
+    assert [r["status"] for r in responses] == \
+        ["timeout", "solved", "solved", "invalid"]
+    assert not service.pending
+
+
+def test_solution_cache():
+    """Tests that states along a cached solution are answered without search,
+    and that the least recently used states are evicted."""
+    cache = SolutionCache(max_size=10)
+    solution = cache.find_solution(Puzzle(puzzle8), heuristic=2)
+    assert not solution["cached"] and len(cache) == 10
+
+    # The states closest to the goal were used least recently
+    steps = [Puzzle(puzzle_str=step.string) for step in solution["steps"]]
+    assert cache.get(steps[10]) is None
+
+    cached = cache.find_solution(steps[5], heuristic=2)
+    assert cached["cached"] and cached["depth"] == 15
+    assert set(cached) == set(solution) and cached["stats"].expanded == 0
+    assert cached["steps"][-1].is_solved()
+    assert (cache.hits, cache.misses) == (1, 2)
+
+def test_symmetry():
+    """Tests that transposed puzzles are solved by the transposed moves, and
+    share their entries in the solution cache."""
+    for width in [3, 4]:
+        board = get_board(width)
+        assert transpose_state(board.goal_state, board) == board.goal_state
+
+    puzzle = Puzzle(puzzle8)
+    transposed = Puzzle.from_state(transpose_state(puzzle.state))
+    assert canonical(puzzle)[0].string == canonical(transposed)[0].string
+
+    cache = SolutionCache()
+    solution = cache.find_solution(puzzle, heuristic=2)
+    moves = [step.last_move for step in solution["steps"][1:]]
+
+    replay = Puzzle(puzzle_str=transposed.string)
+    for move in transpose_moves(moves):
+        replay.move(move)
+    assert replay.is_solved()
+
+    cached = cache.find_solution(transposed, heuristic=2)
+    assert cached["cached"] and cached["depth"] == 20
+    assert cached["steps"][-1].is_solved()
+    assert len(cache) == 20
 
 
 def test_search():
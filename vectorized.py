@@ -0,0 +1,196 @@
+"""vectorized.py -- Batch solvability and heuristics of many boards with NumPy
+
+Boards are given as an (N, size) array of tiles (uint8), one board per row,
+read left to right and top to bottom like puzzle strings. Every function looks
+up precomputed tables for all the boards at once, with a Python loop over the
+indices of the board rather than over the boards:
+
+    boards = boards_array(puzzles)
+    values = evaluate_boards(boards)
+    values["solvable"], values["h1"], values["h2"], values["h3"]
+
+NumPy is an optional dependency: HAVE_NUMPY tells whether it is installed, and
+callers fall back to the methods of `Puzzle` without it.
+
+Author: Álex Filipe Santos
+Date: 19 July 2020
+"""
+from heuristics import get_heuristic
+from state import TILE_CHARS, board_for_size
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Whether NumPy is installed (the functions of this module need it).
+HAVE_NUMPY = np is not None
+
+# Largest number of boards evaluated at once, to bound the memory of the
+# intermediate arrays.
+BATCH_SIZE = 1 << 16
+
+# Tables of the heuristics as NumPy arrays, by (heuristic number, width).
+_tables = {}
+
+
+def require_numpy():
+    if np is None:
+        raise ImportError("Batch evaluation needs NumPy (pip install numpy)")
+
+def _tile_table(heuristic, board):
+    """Returns the [tile][index] table of a tile heuristic as an array."""
+    key = (heuristic, board.width)
+
+    if key not in _tables:
+        table = get_heuristic(heuristic, board).table
+        _tables[key] = np.array(table, dtype=np.int32)
+
+    return _tables[key]
+
+
+def boards_array(puzzles):
+    """Returns the tiles of puzzles as an array.
+
+    Args:
+        puzzles (list of obj:`Puzzle`): puzzles of the same width.
+    Returns:
+        obj:`numpy.ndarray`: the (N, size) uint8 array of their tiles.
+    """
+    require_numpy()
+
+    if not puzzles:
+        return np.zeros((0, 9), dtype=np.uint8)
+
+    # Value of every tile character, by character code
+    values = np.zeros(256, dtype=np.uint8)
+    for value, char in enumerate(TILE_CHARS):
+        values[ord(char)] = value
+
+    size = puzzles[0].board.size
+    text = "".join(puzzle.string for puzzle in puzzles).encode("ascii")
+    return values[np.frombuffer(text, dtype=np.uint8)].reshape(-1, size)
+
+def solvable(boards):
+    """Returns whether every board is solvable (see `Puzzle.is_solvable`).
+
+    Args:
+        boards (obj:`numpy.ndarray`): the (N, size) array of boards.
+    Returns:
+        obj:`numpy.ndarray`: N booleans.
+    """
+    require_numpy()
+    board = board_for_size(boards.shape[1])
+    inversions = np.zeros(len(boards), dtype=np.int32)
+
+    # Pairs of tiles in reversed order (the empty tile is never counted, as
+    # no tile is lower than it)
+    for i in range(board.size - 1):
+        first = boards[:, i:i + 1]
+        later = boards[:, i + 1:]
+        inversions += ((first > later) & (later > 0)).sum(axis=1)
+
+    zero_row = np.argmin(boards, axis=1) // board.width
+    return (inversions + zero_row * (board.width - 1)) % 2 == 0
+
+def tile_heuristic(boards, heuristic=2):
+    """Returns the value of a tile heuristic (h1 or h2) for every board.
+
+    Args:
+        boards (obj:`numpy.ndarray`): the (N, size) array of boards.
+        heuristic (int): the number of the heuristic (1 or 2).
+    Returns:
+        obj:`numpy.ndarray`: N values.
+    """
+    require_numpy()
+    table = _tile_table(heuristic, board_for_size(boards.shape[1]))
+    h = np.zeros(len(boards), dtype=np.int32)
+
+    for index in range(boards.shape[1]):
+        h += table[boards[:, index], index]
+
+    return h
+
+def linear_conflict(boards, manhattan=None):
+    """Returns the Manhattan distance plus linear conflicts (h3) of every
+    board, from the tables of `LinearConflictHeuristic`.
+
+    Args:
+        boards (obj:`numpy.ndarray`): the (N, size) array of boards.
+        manhattan (obj:`numpy.ndarray`): their Manhattan distances, if
+            already computed.
+    Returns:
+        obj:`numpy.ndarray`: N values.
+    """
+    require_numpy()
+    board = board_for_size(boards.shape[1])
+    heuristic = get_heuristic(3, board)
+    key = (3, board.width)
+
+    if key not in _tables:
+        _tables[key] = (
+            np.array(heuristic.conflicts, dtype=np.int32),
+            [([board.shifts.index(shift) for shift in shifts],
+              np.array(weighted_codes, dtype=np.int32))
+             for shifts, weighted_codes in heuristic.lines]
+        )
+
+    conflicts, lines = _tables[key]
+
+    if manhattan is None:
+        manhattan = tile_heuristic(boards, 2)
+
+    h = manhattan.copy()
+
+    for indices, weighted_codes in lines:
+        line_key = np.zeros(len(boards), dtype=np.int32)
+
+        for position, index in enumerate(indices):
+            line_key += weighted_codes[position][boards[:, index]]
+
+        h += 2 * conflicts[line_key]
+
+    return h
+
+def evaluate_boards(boards):
+    """Returns the solvability and the h1, h2 and h3 heuristics of every
+    board, in batches of BATCH_SIZE boards.
+
+    Args:
+        boards (obj:`numpy.ndarray`): the (N, size) array of boards.
+    Returns:
+        dict: arrays of N values, by name ("solvable", "h1", "h2" and "h3").
+    """
+    require_numpy()
+    values = {"solvable": [], "h1": [], "h2": [], "h3": []}
+
+    for start in range(0, len(boards), BATCH_SIZE):
+        batch = boards[start:start + BATCH_SIZE]
+        manhattan = tile_heuristic(batch, 2)
+
+        values["solvable"].append(solvable(batch))
+        values["h1"].append(tile_heuristic(batch, 1))
+        values["h2"].append(manhattan)
+        values["h3"].append(linear_conflict(batch, manhattan))
+
+    return {
+        name: np.concatenate(arrays) if arrays else
+        np.zeros(0, dtype=bool if name == "solvable" else np.int32)
+        for name, arrays in values.items()
+    }
+
+
+def solvable_puzzles(puzzles):
+    """Returns the solvable puzzles of a list, checked in one batch if NumPy
+    is installed (one by one otherwise).
+
+    Args:
+        puzzles (list of obj:`Puzzle`): puzzles of the same width.
+    Returns:
+        list of obj:`Puzzle`: the solvable puzzles, in order.
+    """
+    if np is None or not puzzles:
+        return [puzzle for puzzle in puzzles if puzzle.is_solvable()]
+
+    flags = solvable(boards_array(puzzles))
+    return [puzzle for puzzle, flag in zip(puzzles, flags) if flag]